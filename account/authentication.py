@@ -0,0 +1,136 @@
+"""
+Token authentication with cached token lookups.
+"""
+
+import copy
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from device.cache import MISSING, LRUCache
+
+from .models import User
+
+TOKEN_CACHE_DEFAULTS = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 60.0,
+    'CACHE': None,
+    'LOCAL_TTL': 1.0,
+}
+
+
+def get_token_cache_settings():
+    return {
+        **TOKEN_CACHE_DEFAULTS,
+        **getattr(settings, 'AUTH_TOKEN_CACHE', {}),
+    }
+
+
+class TokenCache:
+    """
+    (user, token) per token, as returned by ``authenticate_credentials()``.
+
+    Entries live in an in-process LRU for TTL seconds. When
+    AUTH_TOKEN_CACHE['CACHE'] names a Django cache alias, that cache is shared
+    between processes and local entries only live for LOCAL_TTL seconds.
+    Entries are dropped when the token is deleted or its user is saved, e.g.
+    deactivated.
+    """
+
+    key_prefix = 'auth:'
+
+    def __init__(self):
+        self._local = None
+
+    @property
+    def local(self):
+        if self._local is None:
+            config = get_token_cache_settings()
+            ttl = config['LOCAL_TTL'] if config['CACHE'] else config['TTL']
+            self._local = LRUCache(config['MAX_ENTRIES'], ttl=ttl)
+        return self._local
+
+    @property
+    def shared(self):
+        alias = get_token_cache_settings()['CACHE']
+        return caches[alias] if alias else None
+
+    def make_key(self, key):
+        return f'{self.key_prefix}{key}'
+
+    def clear(self):
+        """Forget every local entry; the settings are read again on next use."""
+        if self._local is not None:
+            self._local.clear()
+        self._local = None
+
+    def get(self, key):
+        entry = self.local.get(key)
+        shared = self.shared
+        if entry is MISSING and shared is not None:
+            entry = shared.get(self.make_key(key), MISSING)
+            if entry is not MISSING:
+                self.local.set(key, entry)
+        return entry
+
+    def set(self, key, entry):
+        self.local.set(key, entry)
+        shared = self.shared
+        if shared is not None:
+            shared.set(
+                self.make_key(key), entry, timeout=get_token_cache_settings()['TTL']
+            )
+
+    def delete(self, keys):
+        for key in keys:
+            self.local.delete(key)
+        shared = self.shared
+        if shared is not None and keys:
+            shared.delete_many([self.make_key(key) for key in keys])
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that looks each token up in the database only once
+    per AUTH_TOKEN_CACHE['TTL'] seconds. Invalid tokens are not cached.
+
+    Every request gets its own copy of the cached user and token, so that
+    changes one request makes to them are not seen by the others.
+    """
+
+    def get_cache_key(self, key):
+        return f'{self.keyword.lower()}:{key}'
+
+    def authenticate_credentials(self, key):
+        cache_key = self.get_cache_key(key)
+        entry = token_cache.get(cache_key)
+        if entry is MISSING:
+            entry = self.lookup_credentials(key)
+            token_cache.set(cache_key, entry)
+        return copy.deepcopy(entry)
+
+    def lookup_credentials(self, key):
+        """Return (user, token) for ``key`` from the database."""
+        return super().authenticate_credentials(key)
+
+
+def token_cache_key(key):
+    return CachedTokenAuthentication().get_cache_key(key)
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    token_cache.delete([token_cache_key(instance.key)])
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    token_cache.delete([token_cache_key(key) for key in keys])
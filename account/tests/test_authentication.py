@@ -0,0 +1,77 @@
+"""
+Test for cached token authentication.
+"""
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from account.authentication import CachedTokenAuthentication, token_cache
+
+from .factories import UserFactory
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    """Test CachedTokenAuthentication."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = UserFactory()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('device:device-list')
+
+    def token_lookups(self, queries):
+        return [query for query in queries if 'authtoken_token' in query['sql']]
+
+    def test_token_is_looked_up_once(self):
+        """Test a known token authenticates without a query."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.token_lookups(queries)), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertListEqual(self.token_lookups(queries), [])
+
+    def test_requests_do_not_share_the_user(self):
+        """Test each request gets its own copy of the cached user."""
+        authentication = CachedTokenAuthentication()
+        user, token = authentication.authenticate_credentials(self.token.key)
+        user.name = 'changed'
+
+        other_user, other_token = authentication.authenticate_credentials(
+            self.token.key
+        )
+        self.assertIsNot(other_user, user)
+        self.assertIsNot(other_token, token)
+        self.assertEqual(other_user.name, self.user.name)
+
+    def test_revoked_token_is_rejected(self):
+        """Test a deleted token stops working at once."""
+        self.client.get(self.url)
+        self.token.delete()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        """Test the token of a deactivated user stops working at once."""
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_token_is_rejected(self):
+        """Test an unknown token is rejected."""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,181 @@
+"""
+Absence-of-data rules: fire when a device stops sending readings.
+"""
+
+import heapq
+import threading
+from datetime import timedelta
+
+from django.db.models import Max
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from device.models import DeviceData
+from device.workers import BackgroundWorker, register
+from device_group.models import DeviceGroup
+
+from .models import AlertRule
+from .rules import (
+    CompiledRule,
+    Trigger,
+    get_alert_rule_settings,
+    report,
+    target_devices,
+)
+
+# Devices per SELECT statement
+SWEEP_BATCH_SIZE = 500
+
+
+def last_readings(rule, device_ids):
+    """Return the time of the last reading ``rule`` looks at per device."""
+    last = {}
+    for offset in range(0, len(device_ids), SWEEP_BATCH_SIZE):
+        readings = DeviceData.objects.filter(
+            device_id__in=device_ids[offset : offset + SWEEP_BATCH_SIZE]
+        )
+        if rule.metric:
+            readings = readings.filter(metric=rule.metric)
+        last.update(
+            readings.values('device_id')
+            .annotate(last=Max('created_at'))
+            .values_list('device_id', 'last')
+        )
+    return last
+
+
+class AbsenceSweeper(BackgroundWorker):
+    """
+    Keep the deadline of every (absence rule, device) pair in a min-heap
+    and, every TICK seconds, fire the rules whose device sent no reading they
+    look at for a whole window. A tick costs O(expired log n), like
+    device.liveness.OfflineSweeper.
+
+    Ingested readings push a later deadline (see alert_rule/evaluator.py);
+    the entries they replace are skipped when popped. Expired pairs are
+    checked against DeviceData first, since other processes ingest readings
+    this one never sees. A rule fires again every window for as long as the
+    device stays silent.
+
+    Rule and group changes reload every pair on the next tick. When the
+    worker thread is not running, nothing is tracked.
+    """
+
+    name = 'alert-absence-sweeper'
+    drain_on_stop = False
+
+    def __init__(self):
+        super().__init__()
+        self._heap = []
+        self._deadlines = {}
+        self._rules = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return get_alert_rule_settings()['ENABLED']
+
+    @property
+    def interval(self):
+        return get_alert_rule_settings()['TICK']
+
+    @property
+    def tracked(self):
+        return len(self._deadlines)
+
+    def schedule(self, rule, device_id, seen_at):
+        """Expect the next reading of ``device_id`` for ``rule`` after ``seen_at``."""
+        deadline = seen_at + timedelta(seconds=rule.window)
+        key = (rule.id, device_id)
+        with self._lock:
+            current = self._deadlines.get(key)
+            if current is not None and deadline <= current:
+                return
+            self._rules[rule.id] = rule
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, key))
+
+    def touch(self, rule, device_id, seen_at):
+        """Note that ``device_id`` sent a reading ``rule`` looks at."""
+        if not self.running or not self._loaded:
+            return
+        self.schedule(rule, device_id, seen_at)
+
+    def rules_changed(self):
+        """Drop every deadline; they are loaded again on the next tick."""
+        with self._lock:
+            self._heap = []
+            self._deadlines = {}
+            self._rules = {}
+            self._loaded = False
+
+    def load(self, now=None):
+        """Schedule every enabled absence rule for each of its devices."""
+        now = now or timezone.now()
+        rules = list(
+            AlertRule.objects.filter(enabled=True, kind=AlertRule.Kind.ABSENCE)
+        )
+        targets = target_devices(rules)
+        for rule in rules:
+            compiled = CompiledRule(rule)
+            device_ids = targets[rule.pk]
+            last = last_readings(compiled, device_ids)
+            for device_id in device_ids:
+                # Devices without readings get a full window from now
+                self.schedule(compiled, device_id, last.get(device_id, now))
+        self._loaded = True
+
+    def _pop_expired(self, now):
+        expired = {}
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, key = heapq.heappop(self._heap)
+                # Entries replaced by a later deadline are skipped here
+                if self._deadlines.get(key) == deadline:
+                    del self._deadlines[key]
+                    rule_id, device_id = key
+                    expired.setdefault(rule_id, []).append(device_id)
+            return {
+                self._rules[rule_id]: device_ids
+                for rule_id, device_ids in expired.items()
+            }
+
+    def run_once(self, now=None):
+        """Fire the absence rules whose deadline passed; return the triggers."""
+        now = now or timezone.now()
+        if not self._loaded:
+            self.load(now)
+        triggers = []
+        for rule, device_ids in self._pop_expired(now).items():
+            last = last_readings(rule, device_ids)
+            for device_id in device_ids:
+                seen_at = last.get(device_id)
+                if (
+                    seen_at is not None
+                    and seen_at + timedelta(seconds=rule.window) > now
+                ):
+                    # Seen by another process since this one scheduled it
+                    self.schedule(rule, device_id, seen_at)
+                else:
+                    triggers.append(Trigger(rule.id, device_id, None, now))
+                    self.schedule(rule, device_id, now)
+        report(triggers)
+        return triggers
+
+
+absence_sweeper = register(AbsenceSweeper())
+
+
+@receiver(post_save, sender=AlertRule)
+@receiver(post_delete, sender=AlertRule)
+@receiver(post_delete, sender=DeviceGroup)
+def reload_deadlines(sender, **kwargs):
+    absence_sweeper.rules_changed()
+
+
+@receiver(m2m_changed, sender=DeviceGroup.devices.through)
+def reload_group_deadlines(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        absence_sweeper.rules_changed()
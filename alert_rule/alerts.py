@@ -0,0 +1,364 @@
+"""
+Alert instances and the digests that notify about them.
+
+Triggers and clears sent by alert_rule.rules.report() are folded into one
+Alert row per (rule, device). A trigger opens the alert, or counts one more
+firing while it is open. A clear resolves it; rules only clear past their
+hysteresis, so values hovering around the threshold do not flap. A rule that
+fires again within its cooldown after resolving reopens the same alert
+instead of starting a new one.
+
+Every NOTIFY_INTERVAL seconds the changes are written with a single upsert,
+and the alerts whose state differs from the one last notified are sent in one
+digest, grouped by the grouping key of their rule. An alert is notified at
+most once per cooldown; a change within it is sent once the cooldown is
+over, if the state still differs then.
+"""
+
+import json
+import logging
+import threading
+from datetime import timedelta
+from urllib.request import Request, urlopen
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from device.models import Device
+from device.workers import BackgroundWorker, register
+
+from .models import Alert, AlertRule
+from .rules import get_alert_rule_settings
+from .signals import firing_changed, rule_cleared, rule_triggered
+
+logger = logging.getLogger(__name__)
+
+UPSERT_BATCH_SIZE = 500
+UPSERT_FIELDS = [
+    'group_key',
+    'state',
+    'value',
+    'count',
+    'started_at',
+    'last_fired_at',
+    'resolved_at',
+    'notified_state',
+    'notified_at',
+    'updated_at',
+]
+
+
+def upsert_alerts(alerts):
+    """Insert ``alerts``, or update the rows of their (rule, device) pairs."""
+    Alert.objects.bulk_create(
+        alerts,
+        batch_size=UPSERT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['rule', 'device'],
+        update_fields=UPSERT_FIELDS,
+    )
+
+
+def build_digest(alerts, rules, now):
+    """Return the notification body for ``alerts``, grouped by their key."""
+    groups = {}
+    for alert in alerts:
+        rule = rules[alert.rule_id]
+        groups.setdefault(alert.group_key, []).append(
+            {
+                'rule': rule.pk,
+                'rule_name': rule.name,
+                'device': alert.device_id,
+                'state': alert.state,
+                'value': alert.value,
+                'count': alert.count,
+                'started_at': alert.started_at,
+                'resolved_at': alert.resolved_at,
+            }
+        )
+    return {
+        'sent_at': now,
+        'groups': [{'key': key, 'alerts': items} for key, items in groups.items()],
+    }
+
+
+def send_digest(digest):
+    """Send ``digest`` to the configured sink; return whether it was sent."""
+    config = get_alert_rule_settings()
+    if config['NOTIFY_SINK'] != 'webhook':
+        for group in digest['groups']:
+            logger.warning(
+                'Alerts of %s: %s',
+                group['key'],
+                ', '.join(
+                    f'{item["rule_name"]} {item["state"]} on device {item["device"]}'
+                    for item in group['alerts']
+                ),
+            )
+        return True
+    request = Request(
+        config['WEBHOOK_URL'],
+        data=json.dumps(digest, cls=DjangoJSONEncoder).encode(),
+        headers={'Content-Type': 'application/json'},
+        method='POST',
+    )
+    try:
+        with urlopen(request, timeout=config['WEBHOOK_TIMEOUT']) as response:
+            response.read()
+    except (OSError, ValueError):
+        logger.exception('Alert digest could not be sent to the webhook')
+        return False
+    return True
+
+
+class AlertTracker(BackgroundWorker):
+    """
+    Queue triggers and clears in memory and fold them into Alert rows every
+    NOTIFY_INTERVAL seconds, then send one digest for the alerts to notify.
+    The rules with a firing alert are kept per device and updated as events
+    arrive, so that the evaluator can tell which rules to watch for clears
+    without a query.
+
+    When the worker thread is not running, events are folded in as they
+    arrive and notifications put off by a cooldown go out with the next
+    event. Webhook digests are never sent inline, so that a slow endpoint
+    cannot hold up ingest; they wait for the next pass of the worker thread
+    or the final one of ``stop()``.
+    """
+
+    name = 'alert-notifier'
+    drain_on_stop = True
+
+    def __init__(self):
+        super().__init__()
+        self._events = []
+        self._deferred = {}
+        self._firing = None
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return get_alert_rule_settings()['ENABLED']
+
+    @property
+    def interval(self):
+        return get_alert_rule_settings()['NOTIFY_INTERVAL']
+
+    @property
+    def pending(self):
+        return len(self._events)
+
+    def clear(self):
+        """Drop every queued event and what is known about firing alerts."""
+        with self._lock:
+            self._events = []
+            self._deferred = {}
+            self._firing = None
+            self._latest = {}
+
+    def _load_firing(self):
+        if self._firing is not None:
+            return
+        firing = {}
+        for rule_id, device_id in Alert.objects.filter(
+            state=Alert.State.FIRING
+        ).values_list('rule_id', 'device_id'):
+            firing.setdefault(device_id, set()).add(rule_id)
+        with self._lock:
+            if self._firing is None:
+                self._firing = firing
+
+    def firing(self, device_id):
+        """Return the ids of the rules with a firing alert for ``device_id``."""
+        self._load_firing()
+        return set(self._firing.get(device_id, ()))
+
+    def record(self, events, firing):
+        """Queue triggers, or clears when ``firing`` is False."""
+        self._load_firing()
+        changed = set()
+        with self._lock:
+            for event in events:
+                key = (event.rule_id, event.device_id)
+                # Only the newest event decides, whatever order they arrive in
+                latest = self._latest.get(key)
+                if latest is None or event.at >= latest:
+                    self._latest[key] = event.at
+                    rule_ids = self._firing.setdefault(event.device_id, set())
+                    if firing != (event.rule_id in rule_ids):
+                        changed.add(event.device_id)
+                    if firing:
+                        rule_ids.add(event.rule_id)
+                    else:
+                        rule_ids.discard(event.rule_id)
+                self._events.append((event, firing))
+        if changed:
+            firing_changed.send(sender=AlertTracker, device_ids=changed)
+        if not self.running:
+            self.run_once(send=get_alert_rule_settings()['NOTIFY_SINK'] != 'webhook')
+
+    def rule_disabled(self, rule_id):
+        """Resolve the firing alerts of a rule that no longer fires."""
+        Alert.objects.filter(rule_id=rule_id, state=Alert.State.FIRING).update(
+            state=Alert.State.RESOLVED, resolved_at=timezone.now()
+        )
+        self.forget_rule(rule_id)
+
+    def forget_rule(self, rule_id):
+        """Stop counting the alerts of ``rule_id`` as firing."""
+        changed = set()
+        with self._lock:
+            for device_id, rule_ids in (self._firing or {}).items():
+                if rule_id in rule_ids:
+                    rule_ids.discard(rule_id)
+                    changed.add(device_id)
+        if changed:
+            firing_changed.send(sender=AlertTracker, device_ids=changed)
+
+    def run_once(self, now=None, send=True):
+        """
+        Store the queued events and send the digest; return the alerts sent.
+        With ``send`` False the alerts due are kept for the next pass instead.
+        """
+        now = now or timezone.now()
+        with self._lock:
+            events, self._events = self._events, []
+            deferred, self._deferred = self._deferred, {}
+        if not events and not deferred:
+            return []
+        # Stable, so a trigger and a clear at the same time keep their order
+        events.sort(key=lambda item: item[0].at)
+        keys = {(event.rule_id, event.device_id) for event, _ in events}
+        rules = AlertRule.objects.in_bulk(
+            {rule_id for rule_id, _ in keys | {*deferred}}
+        )
+        alerts = {**self._load(keys - deferred.keys()), **deferred}
+
+        changed = {}
+        for event, firing in events:
+            key = (event.rule_id, event.device_id)
+            rule = rules.get(event.rule_id)
+            if rule is None:
+                # Deleted since
+                continue
+            if firing:
+                alerts[key] = changed[key] = self._fire(alerts.get(key), rule, event)
+            elif key in alerts and alerts[key].state == Alert.State.FIRING:
+                alert = changed[key] = alerts[key]
+                alert.state = Alert.State.RESOLVED
+                alert.resolved_at = event.at
+                alert.value = event.value
+
+        due, later = {}, {}
+        for key, alert in {**deferred, **changed}.items():
+            rule = rules.get(key[0])
+            if rule is None or alert.state == alert.notified_state:
+                continue
+            if alert.notified_at and now < alert.notified_at + timedelta(
+                seconds=rule.cooldown
+            ):
+                later[key] = alert
+            else:
+                due[key] = alert
+        if due and send and send_digest(build_digest(due.values(), rules, now)):
+            for key, alert in due.items():
+                alert.notified_state = alert.state
+                alert.notified_at = now
+                changed[key] = alert
+        else:
+            later.update(due)
+            due = {}
+        with self._lock:
+            self._deferred = {**later, **self._deferred}
+        self._upsert(list(changed.values()))
+        return list(due.values())
+
+    def _load(self, keys):
+        if not keys:
+            return {}
+        alerts = Alert.objects.filter(
+            rule_id__in={rule_id for rule_id, _ in keys},
+            device_id__in={device_id for _, device_id in keys},
+        )
+        return {
+            (alert.rule_id, alert.device_id): alert
+            for alert in alerts
+            if (alert.rule_id, alert.device_id) in keys
+        }
+
+    def _fire(self, alert, rule, trigger):
+        if alert is not None and alert.state == Alert.State.FIRING:
+            alert.count += 1
+        elif (
+            alert is not None
+            and alert.resolved_at
+            and trigger.at < alert.resolved_at + timedelta(seconds=rule.cooldown)
+        ):
+            # Flapping: the alert that just resolved is reopened
+            alert.count += 1
+        else:
+            if alert is None:
+                alert = Alert(rule_id=rule.pk, device_id=trigger.device_id)
+            alert.started_at = trigger.at
+            alert.count = 1
+        alert.state = Alert.State.FIRING
+        alert.resolved_at = None
+        alert.value = trigger.value
+        alert.group_key = rule.group_key(trigger.device_id)
+        if alert.last_fired_at is None or trigger.at > alert.last_fired_at:
+            alert.last_fired_at = trigger.at
+        return alert
+
+    def _upsert(self, alerts):
+        if not alerts:
+            return
+        try:
+            upsert_alerts(alerts)
+        except IntegrityError:
+            # A rule or device was deleted since its events were queued
+            device_ids = set(
+                Device.objects.filter(
+                    pk__in={alert.device_id for alert in alerts}
+                ).values_list('pk', flat=True)
+            )
+            rule_ids = set(
+                AlertRule.objects.filter(
+                    pk__in={alert.rule_id for alert in alerts}
+                ).values_list('pk', flat=True)
+            )
+            upsert_alerts(
+                [
+                    alert
+                    for alert in alerts
+                    if alert.device_id in device_ids and alert.rule_id in rule_ids
+                ]
+            )
+
+
+alerts = register(AlertTracker())
+
+
+@receiver(rule_triggered)
+def record_triggers(sender, triggers, **kwargs):
+    alerts.record(triggers, firing=True)
+
+
+@receiver(rule_cleared)
+def record_clears(sender, clears, **kwargs):
+    alerts.record(clears, firing=False)
+
+
+@receiver(post_save, sender=AlertRule)
+def resolve_disabled_rule(sender, instance, created, **kwargs):
+    if not created and not instance.enabled:
+        alerts.rule_disabled(instance.pk)
+
+
+@receiver(post_delete, sender=AlertRule)
+def forget_deleted_rule(sender, instance, **kwargs):
+    # Its alerts were deleted along with it
+    alerts.forget_rule(instance.pk)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AlertRulesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'alert_rule'
+
+    def ready(self):
+        # Register background workers and signal receivers
+        from . import absence, alerts, evaluator, index  # noqa: F401
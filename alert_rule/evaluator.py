@@ -0,0 +1,154 @@
+"""
+Evaluation of alert rules at ingest.
+
+Every batch stored by device.ingest.write_readings() is checked against the
+enabled rules of its devices once ``data_ingested`` is sent. The rules of a
+device come from alert_rule.index as a RulePlan. Threshold rules on the last
+value judge each reading on its own, by bisecting the sorted thresholds of
+the plan, so a reading costs O(log rules) plus one step per rule it fires.
+Windowed rules keep a SlidingWindow per (rule, device) that is filled from
+DeviceData once and then updated with each reading, so they never scan
+DeviceData either. Rules that fire are passed to alert_rule.rules.report(),
+along with the rules with a firing alert (see alert_rule/alerts.py) that
+values past their hysteresis clear.
+"""
+
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.dispatch import receiver
+
+from device.cache import MISSING, LRUCache
+from device.models import DeviceData
+from device.signals import data_ingested
+
+from .absence import absence_sweeper
+from .alerts import alerts
+from .index import rule_index
+from .rules import Clear, SlidingWindow, Trigger, get_alert_rule_settings, report
+
+
+def load_window(rule, device_id, before):
+    """Return the window of ``rule`` for ``device_id`` up to ``before``."""
+    window = SlidingWindow(rule.window)
+    readings = DeviceData.objects.filter(
+        device_id=device_id,
+        created_at__gte=before - timedelta(seconds=rule.window),
+        created_at__lt=before,
+        value__isnull=False,
+    )
+    if rule.metric:
+        readings = readings.filter(metric=rule.metric)
+    for created_at, value in readings.order_by('created_at', 'id').values_list(
+        'created_at', 'value'
+    ):
+        window.push(created_at.timestamp(), value)
+    return window
+
+
+class RuleEvaluator:
+    """
+    The sliding windows of the windowed rules, at most MAX_WINDOWS of them.
+    An evicted window is filled from DeviceData again on its next reading.
+
+    Windows are per process: when the readings of a device are ingested by
+    several processes, each judges them against the readings it saw since it
+    filled its window.
+    """
+
+    def __init__(self):
+        self._windows = None
+        self._lock = threading.Lock()
+
+    @property
+    def windows(self):
+        if self._windows is None:
+            self._windows = LRUCache(get_alert_rule_settings()['MAX_WINDOWS'])
+        return self._windows
+
+    def clear(self):
+        """Forget every rule and window; the settings are read again on next use."""
+        rule_index.clear()
+        alerts.clear()
+        self._windows = None
+
+    def window(self, rule, device_id, before):
+        key = (device_id, *rule.window_key)
+        window = self.windows.get(key)
+        if window is MISSING:
+            window = load_window(rule, device_id, before)
+            self.windows.set(key, window)
+        return window
+
+    def evaluate(self, readings):
+        """Check stored ``readings`` against their rules; return the triggers."""
+        if not readings or not get_alert_rule_settings()['ENABLED']:
+            return []
+        by_device = defaultdict(list)
+        for reading in readings:
+            by_device[reading.device_id].append(reading)
+        plans = rule_index.plans_for(list(by_device))
+
+        triggers = []
+        clears = []
+        for device_id, batch in by_device.items():
+            plan = plans[device_id]
+            if plan is None:
+                continue
+            batch.sort(key=lambda reading: (reading.created_at, reading.pk))
+            fired = plan.fired_thresholds(device_id, batch)
+            # Rules that may clear: those firing before or within this batch
+            firing = alerts.firing(device_id) | {t.rule_id for t in fired}
+            triggers += fired
+            clears += plan.cleared_thresholds(device_id, batch, firing)
+            for rule in plan.windowed:
+                rule_triggers, rule_clears = self.evaluate_rule(
+                    rule, device_id, batch, rule.id in firing
+                )
+                triggers += rule_triggers
+                clears += rule_clears
+            for rule in plan.absence:
+                seen = [reading for reading in batch if rule.accepts(reading)]
+                if not seen:
+                    continue
+                absence_sweeper.touch(rule, device_id, seen[-1].created_at)
+                if rule.id in firing:
+                    clears.append(Clear(rule.id, device_id, None, seen[-1].created_at))
+        report(triggers, clears)
+        return triggers
+
+    def evaluate_rule(self, rule, device_id, readings, firing=False):
+        """
+        Push ``readings`` into the window of ``rule``; return its triggers and,
+        when it is ``firing`` or fires, its clears.
+        """
+        accepted = [reading for reading in readings if rule.accepts(reading)]
+        if not accepted:
+            return [], []
+        window = self.window(rule, device_id, accepted[0].created_at)
+        triggers = []
+        clears = []
+        with self._lock:
+            for reading in accepted:
+                # Backfilled readings older than the newest one are not judged
+                if not window.push(reading.created_at.timestamp(), reading.value):
+                    continue
+                value = rule.measure(window)
+                if rule.fires(value):
+                    triggers.append(
+                        Trigger(rule.id, device_id, value, reading.created_at)
+                    )
+                    firing = True
+                elif firing and rule.clears(value):
+                    clears.append(Clear(rule.id, device_id, value, reading.created_at))
+                    firing = False
+        return triggers, clears
+
+
+evaluator = RuleEvaluator()
+
+
+@receiver(data_ingested)
+def evaluate_readings(sender, readings, **kwargs):
+    evaluator.evaluate(readings)
@@ -0,0 +1,305 @@
+"""
+In-memory index from devices to the alert rules that apply to them.
+
+The index maps each device id to the enabled rules aimed at it directly and
+through the DeviceGroups it belongs to, and hands out a RulePlan per device
+for alert_rule.evaluator. It is loaded from the database once, with at most
+two queries, and then kept current by the receivers below as rules, groups,
+group memberships and devices change, so looking up the rules of a batch
+costs O(devices in the batch) whatever the number of rules and devices.
+
+Changes made by other processes reach the index when it is rebuilt, every
+INDEX_REFRESH seconds while the workers run.
+"""
+
+import threading
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from device.models import Device
+from device.workers import BackgroundWorker, register
+from device_group.models import DeviceGroup
+
+from .models import AlertRule
+from .rules import CompiledRule, RulePlan, get_alert_rule_settings
+
+
+def group_members(group_ids=None):
+    """
+    Return a dict mapping group ids to their device ids, for ``group_ids`` or
+    for every group some enabled rule is aimed at.
+    """
+    memberships = DeviceGroup.devices.through.objects.all()
+    if group_ids is None:
+        memberships = memberships.filter(
+            devicegroup_id__in=AlertRule.objects.filter(
+                enabled=True, device_group__isnull=False
+            ).values('device_group_id')
+        )
+    else:
+        memberships = memberships.filter(devicegroup_id__in=group_ids)
+    members = {}
+    for group_id, device_id in memberships.values_list('devicegroup_id', 'device_id'):
+        members.setdefault(group_id, set()).add(device_id)
+    return members
+
+
+class IndexState:
+    """
+    The tables of a RuleIndex. Memberships are only held for groups with
+    rules; plans are memoized per device and shared between devices with the
+    same rules.
+    """
+
+    def __init__(self):
+        self.rules = {}
+        # rule id -> (device id, None) or (None, group id)
+        self.targets = {}
+        self.device_rules = {}
+        self.group_rules = {}
+        self.members = {}
+        self.device_groups = {}
+        self.plans = {}
+        self.shared = {}
+
+    @classmethod
+    def build(cls):
+        state = cls()
+        rules = list(AlertRule.objects.filter(enabled=True))
+        members = group_members() if any(rule.device_group_id for rule in rules) else {}
+        for rule in rules:
+            state.add_rule(rule, members.get(rule.device_group_id, ()))
+        return state
+
+    def forget_plans(self, device_ids):
+        for device_id in device_ids:
+            self.plans.pop(device_id, None)
+
+    def add_rule(self, rule, members=()):
+        """
+        Index ``rule``, replacing its previous version; ``members`` are the
+        devices of its group when the group has no other rule.
+        """
+        self.remove_rule(rule.pk)
+        if not rule.enabled:
+            return
+        self.rules[rule.pk] = CompiledRule(rule)
+        self.targets[rule.pk] = (rule.device_id, rule.device_group_id)
+        if rule.device_id:
+            self.device_rules.setdefault(rule.device_id, set()).add(rule.pk)
+            self.forget_plans([rule.device_id])
+            return
+        group_id = rule.device_group_id
+        self.group_rules.setdefault(group_id, set()).add(rule.pk)
+        if group_id not in self.members:
+            self.members[group_id] = set()
+            self.add_members(group_id, members)
+        self.forget_plans(self.members[group_id])
+
+    def remove_rule(self, rule_id):
+        if rule_id not in self.rules:
+            return
+        del self.rules[rule_id]
+        # Plans hold compiled rules, so shared ones may hold this one
+        self.shared.clear()
+        device_id, group_id = self.targets.pop(rule_id)
+        if device_id:
+            self._discard(self.device_rules, device_id, rule_id)
+            self.forget_plans([device_id])
+            return
+        self._discard(self.group_rules, group_id, rule_id)
+        members = self.members.get(group_id, set())
+        self.forget_plans(members)
+        if group_id not in self.group_rules:
+            self.remove_members(group_id, members)
+
+    def add_members(self, group_id, device_ids):
+        """Add ``device_ids`` to the group ``group_id``, if it has rules."""
+        members = self.members.get(group_id)
+        if members is None:
+            return
+        for device_id in device_ids:
+            members.add(device_id)
+            self.device_groups.setdefault(device_id, set()).add(group_id)
+        self.forget_plans(device_ids)
+
+    def remove_members(self, group_id, device_ids=None):
+        """Drop ``device_ids``, or every device, from the group ``group_id``."""
+        members = self.members.get(group_id)
+        if members is None:
+            return
+        device_ids = set(members if device_ids is None else device_ids)
+        for device_id in device_ids:
+            members.discard(device_id)
+            self._discard(self.device_groups, device_id, group_id)
+        if not members and group_id not in self.group_rules:
+            del self.members[group_id]
+        self.forget_plans(device_ids)
+
+    def remove_group(self, group_id):
+        for rule_id in list(self.group_rules.get(group_id, ())):
+            self.remove_rule(rule_id)
+        self.remove_members(group_id)
+        self.members.pop(group_id, None)
+
+    def leave_groups(self, device_id):
+        for group_id in list(self.device_groups.get(device_id, ())):
+            self.remove_members(group_id, [device_id])
+
+    def remove_device(self, device_id):
+        for rule_id in list(self.device_rules.get(device_id, ())):
+            self.remove_rule(rule_id)
+        self.leave_groups(device_id)
+        self.plans.pop(device_id, None)
+
+    def plan(self, device_id):
+        """Return the RulePlan of ``device_id``, or None when no rule applies."""
+        try:
+            return self.plans[device_id]
+        except KeyError:
+            pass
+        rule_ids = set(self.device_rules.get(device_id, ()))
+        for group_id in self.device_groups.get(device_id, ()):
+            rule_ids |= self.group_rules.get(group_id, set())
+        plan = None
+        if rule_ids:
+            key = frozenset(rule_ids)
+            plan = self.shared.get(key)
+            if plan is None:
+                plan = self.shared[key] = RulePlan(
+                    [self.rules[rule_id] for rule_id in key]
+                )
+        self.plans[device_id] = plan
+        return plan
+
+    @staticmethod
+    def _discard(table, key, value):
+        values = table.get(key)
+        if values is not None:
+            values.discard(value)
+            if not values:
+                del table[key]
+
+
+class RuleIndex:
+    """
+    An IndexState loaded on first use and updated in place by the receivers
+    below. A rebuild loads a new state without holding the lock and records
+    the changes made meanwhile, which are replayed on the new state before it
+    replaces the current one.
+    """
+
+    def __init__(self):
+        self._state = None
+        self._journal = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._state is not None
+
+    def clear(self):
+        with self._lock:
+            self._state = None
+            self._journal = None
+
+    def rebuild(self):
+        with self._lock:
+            self._journal = []
+        state = IndexState.build()
+        with self._lock:
+            for method, args in self._journal or ():
+                getattr(state, method)(*args)
+            self._state = state
+            self._journal = None
+
+    def plans_for(self, device_ids):
+        """Return a dict mapping each of ``device_ids`` to its plan or None."""
+        if self._state is None:
+            self.rebuild()
+        with self._lock:
+            return {device_id: self._state.plan(device_id) for device_id in device_ids}
+
+    def apply(self, method, *args):
+        """Call ``method`` of the state with ``args``, if the index is loaded."""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((method, args))
+            if self._state is not None:
+                getattr(self._state, method)(*args)
+
+    def rule_saved(self, rule):
+        members = ()
+        if rule.enabled and rule.device_group_id:
+            with self._lock:
+                tracked = self._state is not None and (
+                    rule.device_group_id in self._state.members
+                )
+            if not tracked and (self.loaded or self._journal is not None):
+                members = group_members([rule.device_group_id]).get(
+                    rule.device_group_id, ()
+                )
+        self.apply('add_rule', rule, members)
+
+
+rule_index = RuleIndex()
+
+
+class RuleIndexRefresher(BackgroundWorker):
+    """Rebuild the rule index to pick up changes made by other processes."""
+
+    name = 'alert-rule-index'
+    drain_on_stop = False
+
+    @property
+    def enabled(self):
+        return get_alert_rule_settings()['ENABLED']
+
+    @property
+    def interval(self):
+        return get_alert_rule_settings()['INDEX_REFRESH']
+
+    def run_once(self):
+        if rule_index.loaded:
+            rule_index.rebuild()
+
+
+rule_index_refresher = register(RuleIndexRefresher())
+
+
+@receiver(post_save, sender=AlertRule)
+def index_rule(sender, instance, **kwargs):
+    rule_index.rule_saved(instance)
+
+
+@receiver(post_delete, sender=AlertRule)
+def unindex_rule(sender, instance, **kwargs):
+    rule_index.apply('remove_rule', instance.pk)
+
+
+@receiver(post_delete, sender=DeviceGroup)
+def unindex_group(sender, instance, **kwargs):
+    rule_index.apply('remove_group', instance.pk)
+
+
+@receiver(post_delete, sender=Device)
+def unindex_device(sender, instance, **kwargs):
+    rule_index.apply('remove_device', instance.pk)
+
+
+@receiver(m2m_changed, sender=DeviceGroup.devices.through)
+def index_group_members(sender, instance, action, reverse, pk_set, **kwargs):
+    """Follow DeviceGroup.devices, changed from either side."""
+    if action == 'post_clear':
+        if reverse:
+            rule_index.apply('leave_groups', instance.pk)
+        else:
+            rule_index.apply('remove_members', instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        method = 'add_members' if action == 'post_add' else 'remove_members'
+        if reverse:
+            for group_id in pk_set:
+                rule_index.apply(method, group_id, [instance.pk])
+        else:
+            rule_index.apply(method, instance.pk, pk_set)
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('device', '0010_device_data_version'),
+        ('device_group', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('kind', models.CharField(choices=[('threshold', 'Threshold'), ('rate', 'Rate of change'), ('absence', 'Absence of data')], db_comment='"threshold" compares an aggregate of the window; "rate" the change per second across the window; "absence" fires when no reading arrives for a whole window', default='threshold', max_length=16)),
+                ('metric', models.CharField(blank=True, db_comment='Only readings of this metric are evaluated; blank for all', max_length=32)),
+                ('operator', models.CharField(choices=[('gt', '>'), ('gte', '>='), ('lt', '<'), ('lte', '<=')], default='gt', max_length=3)),
+                ('threshold', models.FloatField(blank=True, db_comment='Value compared against; per second for rate rules', null=True)),
+                ('aggregate', models.CharField(choices=[('last', 'Last value'), ('avg', 'Average'), ('min', 'Minimum'), ('max', 'Maximum')], default='last', max_length=4)),
+                ('window', models.PositiveIntegerField(db_comment='Seconds of readings the rule looks at; for absence rules, the longest silence allowed', default=0)),
+                ('enabled', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('device', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alert_rules', to='device.device')),
+                ('device_group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alert_rules', to='device_group.devicegroup')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_rules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('device__isnull', False), ('device_group__isnull', True)), models.Q(('device__isnull', True), ('device_group__isnull', False)), _connector='OR'), name='alertrule_single_target')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:56
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alert_rule', '0001_initial'),
+        ('device', '0010_device_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertrule',
+            name='cooldown',
+            field=models.PositiveIntegerField(db_comment='Seconds within which a resolved alert that fires again is reopened, and between two notifications about the same alert', default=300),
+        ),
+        migrations.AddField(
+            model_name='alertrule',
+            name='group_by',
+            field=models.CharField(choices=[('rule', 'Rule'), ('device', 'Device'), ('owner', 'Owner')], db_comment='Alerts with the same grouping key are notified together', default='rule', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='alertrule',
+            name='hysteresis',
+            field=models.FloatField(db_comment='How far past the threshold, back on the quiet side, a value must be to resolve a firing alert', default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group_key', models.CharField(max_length=32)),
+                ('state', models.CharField(choices=[('firing', 'Firing'), ('resolved', 'Resolved')], default='firing', max_length=8)),
+                ('value', models.FloatField(blank=True, db_comment='Value of the last trigger or clear; null for absence rules', null=True)),
+                ('count', models.PositiveIntegerField(db_comment='Triggers folded into the alert since it started', default=0)),
+                ('started_at', models.DateTimeField()),
+                ('last_fired_at', models.DateTimeField()),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('notified_state', models.CharField(blank=True, choices=[('firing', 'Firing'), ('resolved', 'Resolved')], max_length=8)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='device.device')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='alert_rule.alertrule')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state'], name='alert_state_idx')],
+                'constraints': [models.UniqueConstraint(fields=('rule', 'device'), name='alert_rule_device_unique')],
+            },
+        ),
+    ]
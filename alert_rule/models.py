@@ -1,3 +1,178 @@
+"""
+AlertRule models.
+"""
+
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Q
+
+from account.models import User
+from device.models import Device
+from device_group.models import DeviceGroup
+
+
+class AlertRule(models.Model):
+    """
+    Condition on the readings of one device, or of every device in a group,
+    evaluated as readings are ingested (see alert_rule/evaluator.py).
+    """
+
+    class Kind(models.TextChoices):
+        THRESHOLD = 'threshold', 'Threshold'
+        RATE = 'rate', 'Rate of change'
+        ABSENCE = 'absence', 'Absence of data'
+
+    class Operator(models.TextChoices):
+        GT = 'gt', '>'
+        GTE = 'gte', '>='
+        LT = 'lt', '<'
+        LTE = 'lte', '<='
+
+    class Aggregate(models.TextChoices):
+        LAST = 'last', 'Last value'
+        AVG = 'avg', 'Average'
+        MIN = 'min', 'Minimum'
+        MAX = 'max', 'Maximum'
+
+    class GroupBy(models.TextChoices):
+        RULE = 'rule', 'Rule'
+        DEVICE = 'device', 'Device'
+        OWNER = 'owner', 'Owner'
+
+    name = models.CharField(max_length=50)
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='alert_rules'
+    )
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='alert_rules',
+    )
+    device_group = models.ForeignKey(
+        DeviceGroup,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='alert_rules',
+    )
+    kind = models.CharField(
+        max_length=16,
+        choices=Kind,
+        default=Kind.THRESHOLD,
+        db_comment=(
+            '"threshold" compares an aggregate of the window; "rate" the change '
+            'per second across the window; "absence" fires when no reading '
+            'arrives for a whole window'
+        ),
+    )
+    metric = models.CharField(
+        max_length=32,
+        blank=True,
+        db_comment='Only readings of this metric are evaluated; blank for all',
+    )
+    operator = models.CharField(max_length=3, choices=Operator, default=Operator.GT)
+    threshold = models.FloatField(
+        null=True,
+        blank=True,
+        db_comment='Value compared against; per second for rate rules',
+    )
+    aggregate = models.CharField(
+        max_length=4, choices=Aggregate, default=Aggregate.LAST
+    )
+    window = models.PositiveIntegerField(
+        default=0,
+        db_comment=(
+            'Seconds of readings the rule looks at; for absence rules, the '
+            'longest silence allowed'
+        ),
+    )
+    hysteresis = models.FloatField(
+        default=0,
+        validators=[MinValueValidator(0)],
+        db_comment=(
+            'How far past the threshold, back on the quiet side, a value must '
+            'be to resolve a firing alert'
+        ),
+    )
+    cooldown = models.PositiveIntegerField(
+        default=300,
+        db_comment=(
+            'Seconds within which a resolved alert that fires again is reopened, '
+            'and between two notifications about the same alert'
+        ),
+    )
+    group_by = models.CharField(
+        max_length=8,
+        choices=GroupBy,
+        default=GroupBy.RULE,
+        db_comment='Alerts with the same grouping key are notified together',
+    )
+    enabled = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    Q(device__isnull=False, device_group__isnull=True)
+                    | Q(device__isnull=True, device_group__isnull=False)
+                ),
+                name='alertrule_single_target',
+            )
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def group_key(self, device_id):
+        """Return the key of the notification group of its alert for ``device_id``."""
+        if self.group_by == self.GroupBy.DEVICE:
+            return f'device:{device_id}'
+        if self.group_by == self.GroupBy.OWNER:
+            return f'owner:{self.owner_id}'
+        return f'rule:{self.pk}'
+
+
+class Alert(models.Model):
+    """
+    State of an AlertRule for one device. Each (rule, device) pair has a
+    single row that is updated in place as the rule fires and clears (see
+    alert_rule/alerts.py).
+    """
+
+    class State(models.TextChoices):
+        FIRING = 'firing', 'Firing'
+        RESOLVED = 'resolved', 'Resolved'
+
+    rule = models.ForeignKey(AlertRule, on_delete=models.CASCADE, related_name='alerts')
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='alerts')
+    group_key = models.CharField(max_length=32)
+    state = models.CharField(max_length=8, choices=State, default=State.FIRING)
+    value = models.FloatField(
+        null=True,
+        blank=True,
+        db_comment='Value of the last trigger or clear; null for absence rules',
+    )
+    count = models.PositiveIntegerField(
+        default=0, db_comment='Triggers folded into the alert since it started'
+    )
+    started_at = models.DateTimeField()
+    last_fired_at = models.DateTimeField()
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    notified_state = models.CharField(max_length=8, choices=State, blank=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['rule', 'device'], name='alert_rule_device_unique'
+            )
+        ]
+        indexes = [models.Index(fields=['state'], name='alert_state_idx')]
 
-# Create your models here.
+    def __str__(self):
+        return f'{self.rule_id}/{self.device_id} {self.state}'
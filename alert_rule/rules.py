@@ -0,0 +1,305 @@
+"""
+Compiled alert rules and the sliding windows they are evaluated over.
+"""
+
+import logging
+import operator
+from bisect import bisect_left, bisect_right
+from collections import deque, namedtuple
+
+from django.conf import settings
+
+from device_group.models import DeviceGroup
+
+from .models import AlertRule
+from .signals import rule_cleared, rule_triggered
+
+logger = logging.getLogger(__name__)
+
+ALERT_RULES_DEFAULTS = {
+    'ENABLED': True,
+    # Seconds between rebuilds of the rule index; rule and group changes made
+    # by other processes are seen after at most this long
+    'INDEX_REFRESH': 60.0,
+    'MAX_WINDOWS': 100000,
+    'TICK': 1.0,
+    # Seconds between passes that store alert changes and send one digest
+    'NOTIFY_INTERVAL': 30.0,
+    # 'log' or 'webhook'
+    'NOTIFY_SINK': 'log',
+    'WEBHOOK_URL': None,
+    'WEBHOOK_TIMEOUT': 5.0,
+}
+
+# Operators on the quiet side of each operator, for the value that clears
+CLEAR_OPERATORS = {
+    AlertRule.Operator.GT: operator.le,
+    AlertRule.Operator.GTE: operator.lt,
+    AlertRule.Operator.LT: operator.ge,
+    AlertRule.Operator.LTE: operator.gt,
+}
+
+OPERATORS = {
+    AlertRule.Operator.GT: operator.gt,
+    AlertRule.Operator.GTE: operator.ge,
+    AlertRule.Operator.LT: operator.lt,
+    AlertRule.Operator.LTE: operator.le,
+}
+
+# One firing of a rule for a device. ``value`` is what was compared against
+# the threshold, None for absence rules; ``at`` is the time of the reading
+# that fired it, or of the check for absence rules.
+Trigger = namedtuple('Trigger', ['rule_id', 'device_id', 'value', 'at'])
+# A value on the quiet side of a rule for a device, past its hysteresis.
+# Only sent for rules with a firing alert, or that fired in the same batch.
+Clear = namedtuple('Clear', ['rule_id', 'device_id', 'value', 'at'])
+
+
+def get_alert_rule_settings():
+    return {
+        **ALERT_RULES_DEFAULTS,
+        **getattr(settings, 'ALERT_RULES', {}),
+    }
+
+
+class SlidingWindow:
+    """
+    Numeric readings of the last ``span`` seconds, as (timestamp, value)
+    pairs pushed in time order. The running sum and the monotonic min and
+    max deques make push() and every aggregate O(1) amortized.
+    """
+
+    __slots__ = ('_first', '_maxs', '_mins', '_next', '_points', '_total', 'span')
+
+    def __init__(self, span):
+        self.span = span
+        self._points = deque()
+        # (sequence number, value), increasing resp. decreasing by value
+        self._mins = deque()
+        self._maxs = deque()
+        self._total = 0.0
+        # Sequence numbers of the oldest point held and of the next one
+        self._first = 0
+        self._next = 0
+
+    def __len__(self):
+        return len(self._points)
+
+    def push(self, at, value):
+        """
+        Add a reading taken at ``at`` seconds since the epoch and drop the
+        ones that fell out of the window. Readings older than the newest one
+        held are ignored; return whether it was added.
+        """
+        if self._points and at < self._points[-1][0]:
+            return False
+        seq = self._next
+        self._next += 1
+        self._points.append((at, value))
+        self._total += value
+        while self._mins and self._mins[-1][1] >= value:
+            self._mins.pop()
+        self._mins.append((seq, value))
+        while self._maxs and self._maxs[-1][1] <= value:
+            self._maxs.pop()
+        self._maxs.append((seq, value))
+
+        cutoff = at - self.span
+        while self._points[0][0] < cutoff:
+            _, expired = self._points.popleft()
+            self._total -= expired
+            self._first += 1
+            if self._mins[0][0] < self._first:
+                self._mins.popleft()
+            if self._maxs[0][0] < self._first:
+                self._maxs.popleft()
+        return True
+
+    def last(self):
+        return self._points[-1][1] if self._points else None
+
+    def avg(self):
+        return self._total / len(self._points) if self._points else None
+
+    def min(self):
+        return self._mins[0][1] if self._mins else None
+
+    def max(self):
+        return self._maxs[0][1] if self._maxs else None
+
+    def rate(self):
+        """Change per second from the oldest to the newest reading held."""
+        if len(self._points) < 2:
+            return None
+        (start, first), (end, last) = self._points[0], self._points[-1]
+        if end == start:
+            return None
+        return (last - first) / (end - start)
+
+
+class CompiledRule:
+    """The parts of an AlertRule needed to evaluate it, resolved once."""
+
+    __slots__ = (
+        'aggregate',
+        'clear',
+        'compare',
+        'id',
+        'kind',
+        'metric',
+        'operator',
+        'threshold',
+        'window',
+    )
+
+    def __init__(self, rule):
+        self.id = rule.pk
+        self.kind = rule.kind
+        self.metric = rule.metric
+        self.operator = rule.operator
+        self.compare = OPERATORS[rule.operator]
+        self.threshold = rule.threshold
+        # The value that clears a firing alert, ``hysteresis`` further back
+        self.clear = None
+        if rule.threshold is not None:
+            if rule.operator in (AlertRule.Operator.GT, AlertRule.Operator.GTE):
+                self.clear = rule.threshold - rule.hysteresis
+            else:
+                self.clear = rule.threshold + rule.hysteresis
+        self.aggregate = rule.aggregate
+        self.window = rule.window
+
+    @property
+    def window_key(self):
+        """What the window of readings held for this rule depends on."""
+        return self.id, self.metric, self.window
+
+    @property
+    def stateless(self):
+        """True when each reading is judged on its own, without a window."""
+        return self.kind == AlertRule.Kind.THRESHOLD and (
+            self.aggregate == AlertRule.Aggregate.LAST or not self.window
+        )
+
+    def accepts(self, reading):
+        """True when ``reading`` is one this rule looks at."""
+        if self.metric and reading.metric != self.metric:
+            return False
+        # Any reading breaks a silence, the other kinds need a number
+        return self.kind == AlertRule.Kind.ABSENCE or reading.value is not None
+
+    def measure(self, window):
+        """Return the value of ``window`` that is compared to the threshold."""
+        if self.kind == AlertRule.Kind.RATE:
+            return window.rate()
+        return getattr(window, self.aggregate)()
+
+    def fires(self, value):
+        return value is not None and self.compare(value, self.threshold)
+
+    def clears(self, value):
+        return value is not None and CLEAR_OPERATORS[self.operator](value, self.clear)
+
+
+class RulePlan:
+    """
+    The compiled rules of a device, arranged for a pass over a batch of its
+    readings. Threshold rules judged on single readings are grouped by
+    (metric, operator) into arrays sorted by threshold, so a reading finds
+    every rule it fires with one bisection per group instead of comparing
+    against each rule. Devices with the same set of rules share one plan.
+    """
+
+    __slots__ = ('absence', 'rules', 'thresholds', 'windowed')
+
+    def __init__(self, rules):
+        groups = {}
+        self.rules = {rule.id: rule for rule in rules}
+        self.windowed = []
+        self.absence = []
+        for rule in sorted(rules, key=lambda rule: rule.id):
+            if rule.kind == AlertRule.Kind.ABSENCE:
+                self.absence.append(rule)
+            elif rule.stateless:
+                key = (rule.metric, rule.operator)
+                groups.setdefault(key, []).append((rule.threshold, rule.id))
+            else:
+                self.windowed.append(rule)
+        # metric ('' for any) -> [(operator, thresholds, rule ids)]
+        self.thresholds = {}
+        for (metric, op), pairs in groups.items():
+            pairs.sort()
+            self.thresholds.setdefault(metric, []).append(
+                (op, [pair[0] for pair in pairs], [pair[1] for pair in pairs])
+            )
+
+    def fired_thresholds(self, device_id, readings):
+        """Return the triggers of the threshold rules for ``readings``."""
+        triggers = []
+        any_metric = self.thresholds.get('')
+        for reading in readings:
+            value = reading.value
+            if value is None:
+                continue
+            tables = any_metric or ()
+            if reading.metric and reading.metric in self.thresholds:
+                tables = [*tables, *self.thresholds[reading.metric]]
+            for op, thresholds, rule_ids in tables:
+                if op == AlertRule.Operator.GT:
+                    fired = rule_ids[: bisect_left(thresholds, value)]
+                elif op == AlertRule.Operator.GTE:
+                    fired = rule_ids[: bisect_right(thresholds, value)]
+                elif op == AlertRule.Operator.LT:
+                    fired = rule_ids[bisect_right(thresholds, value) :]
+                else:
+                    fired = rule_ids[bisect_left(thresholds, value) :]
+                triggers += [
+                    Trigger(rule_id, device_id, value, reading.created_at)
+                    for rule_id in fired
+                ]
+        return triggers
+
+    def cleared_thresholds(self, device_id, readings, rule_ids):
+        """Return the clears of the threshold rules among ``rule_ids``."""
+        clears = []
+        for rule_id in rule_ids:
+            rule = self.rules.get(rule_id)
+            if rule is None or not rule.stateless:
+                continue
+            clears += [
+                Clear(rule_id, device_id, reading.value, reading.created_at)
+                for reading in readings
+                if rule.accepts(reading) and rule.clears(reading.value)
+            ]
+        return clears
+
+
+def report(triggers, clears=()):
+    """Send ``rule_triggered`` for ``triggers`` and ``rule_cleared`` for ``clears``."""
+    for trigger in triggers:
+        # Notifications go out as digests, see alert_rule/alerts.py
+        logger.debug(
+            'Alert rule %s fired for device %s (value %s)',
+            trigger.rule_id,
+            trigger.device_id,
+            trigger.value,
+        )
+    if triggers:
+        rule_triggered.send(sender=AlertRule, triggers=triggers)
+    if clears:
+        rule_cleared.send(sender=AlertRule, clears=clears)
+
+
+def target_devices(rules):
+    """Return a dict mapping the id of each of ``rules`` to its device ids."""
+    group_ids = {rule.device_group_id for rule in rules if rule.device_group_id}
+    members = {group_id: [] for group_id in group_ids}
+    memberships = DeviceGroup.devices.through.objects.filter(
+        devicegroup_id__in=group_ids
+    ).values_list('devicegroup_id', 'device_id')
+    for group_id, device_id in memberships:
+        members[group_id].append(device_id)
+    return {
+        rule.pk: [rule.device_id] if rule.device_id else members[rule.device_group_id]
+        for rule in rules
+    }
@@ -0,0 +1,17 @@
+"""
+Signals sent by the alert_rule app.
+"""
+
+from django.dispatch import Signal
+
+# Sent by alert_rule.rules.report() when rules fire, with ``triggers``, a list
+# of alert_rule.rules.Trigger.
+rule_triggered = Signal()
+
+# Sent by alert_rule.rules.report() when values clear rules with firing alerts,
+# with ``clears``, a list of alert_rule.rules.Clear.
+rule_cleared = Signal()
+
+# Sent by alert_rule.alerts.AlertTracker with ``device_ids`` when the rules with
+# a firing alert change for those devices; see AlertTracker.firing().
+firing_changed = Signal()
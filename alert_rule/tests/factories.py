@@ -0,0 +1,18 @@
+import factory
+
+from account.tests.factories import UserFactory
+from device.tests.factories import DeviceFactory
+
+from ..models import AlertRule
+
+
+class AlertRuleFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = AlertRule
+
+    name = factory.Sequence(lambda n: f'rule_{n}')
+    owner = factory.SubFactory(UserFactory)
+    device = factory.SubFactory(DeviceFactory, owner=factory.SelfAttribute('..owner'))
+    kind = AlertRule.Kind.THRESHOLD
+    operator = AlertRule.Operator.GT
+    threshold = 30.0
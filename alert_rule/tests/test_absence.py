@@ -0,0 +1,126 @@
+"""
+Tests for absence-of-data rules.
+"""
+
+from datetime import datetime, timedelta
+from unittest.mock import PropertyMock, patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from device.ingest import write_readings
+from device.models import DeviceData
+from device.tests.factories import DeviceFactory
+from device_group.tests.factories import DeviceGroupFactory
+
+from ..absence import AbsenceSweeper, absence_sweeper
+from ..evaluator import evaluator
+from ..models import AlertRule
+from .factories import AlertRuleFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+
+class AbsenceSweeperTests(TestCase):
+    """Tests for AbsenceSweeper."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = DeviceFactory()
+        cls.rule = AlertRuleFactory(
+            owner=cls.device.owner,
+            device=cls.device,
+            kind=AlertRule.Kind.ABSENCE,
+            threshold=None,
+            window=300,
+        )
+
+    def setUp(self):
+        evaluator.clear()
+        absence_sweeper.rules_changed()
+        # Digests are covered by test_alerts.py
+        patcher = patch('alert_rule.alerts.send_digest', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(evaluator.clear)
+        self.addCleanup(absence_sweeper.rules_changed)
+        self.write(START)
+
+    def write(self, at, device=None, data='21.5'):
+        write_readings(
+            [DeviceData(device=device or self.device, data=data, created_at=at)]
+        )
+
+    def fired(self, now):
+        triggers = absence_sweeper.run_once(now=now)
+        return [(t.rule_id, t.device_id, t.value, t.at) for t in triggers]
+
+    def test_silent_device_fires_once_per_window(self):
+        """
+        A rule fires when its device sent nothing for a window, then again
+        after every further window of silence.
+        """
+        late = START + timedelta(seconds=301)
+        self.assertListEqual(self.fired(START + timedelta(seconds=299)), [])
+        self.assertListEqual(
+            self.fired(late), [(self.rule.pk, self.device.pk, None, late)]
+        )
+        self.assertListEqual(self.fired(late + timedelta(seconds=299)), [])
+        self.assertEqual(len(self.fired(late + timedelta(seconds=300))), 1)
+
+    def test_readings_stored_elsewhere_postpone_the_deadline(self):
+        absence_sweeper.load(now=START)
+        # Written while the sweeper is not running, as by another process
+        self.write(START + timedelta(seconds=200))
+
+        self.assertListEqual(self.fired(START + timedelta(seconds=301)), [])
+        self.assertEqual(len(self.fired(START + timedelta(seconds=501))), 1)
+
+    def test_ingested_readings_push_the_deadline(self):
+        absence_sweeper.load(now=START)
+        with patch.object(
+            AbsenceSweeper, 'running', new_callable=PropertyMock, return_value=True
+        ):
+            self.write(START + timedelta(seconds=200))
+
+        # The deadline moved without looking at DeviceData
+        with self.assertNumQueries(0):
+            self.assertListEqual(self.fired(START + timedelta(seconds=301)), [])
+
+    def test_metric_and_group_rules(self):
+        """
+        Readings of other metrics do not count, and devices of a group
+        without any reading get a full window from the first check.
+        """
+        silent = DeviceFactory(owner=self.device.owner)
+        group = DeviceGroupFactory(
+            owner=self.device.owner, devices=[self.device, silent]
+        )
+        rule = AlertRuleFactory(
+            owner=self.device.owner,
+            device=None,
+            device_group=group,
+            kind=AlertRule.Kind.ABSENCE,
+            metric='temperature',
+            threshold=None,
+            window=60,
+        )
+        self.write(START + timedelta(seconds=30), data='temperature=20')
+        self.write(START + timedelta(seconds=80), data='humidity=40')
+
+        absence_sweeper.load(now=START + timedelta(seconds=60))
+        fired = self.fired(START + timedelta(seconds=125))
+
+        self.assertListEqual(
+            [(rule_id, device_id) for rule_id, device_id, *_ in fired],
+            [(rule.pk, self.device.pk), (rule.pk, silent.pk)],
+        )
+
+    def test_rule_changes_reload(self):
+        absence_sweeper.load(now=START)
+        self.assertEqual(absence_sweeper.tracked, 1)
+
+        self.rule.enabled = False
+        self.rule.save()
+        self.assertEqual(absence_sweeper.tracked, 0)
+        self.assertListEqual(self.fired(START + timedelta(days=1)), [])
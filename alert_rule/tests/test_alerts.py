@@ -0,0 +1,314 @@
+"""
+Tests for alert instances and their notification digests.
+"""
+
+import json
+from datetime import datetime, timedelta
+from unittest.mock import PropertyMock, patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from device.ingest import write_readings
+from device.models import DeviceData
+from device.tests.factories import DeviceFactory
+
+from ..alerts import AlertTracker, alerts
+from ..evaluator import evaluator
+from ..models import Alert, AlertRule
+from ..rules import Trigger
+from .factories import AlertRuleFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+
+class AlertTests(TestCase):
+    """Tests for the Alert rows kept by AlertTracker."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = DeviceFactory()
+        cls.other_device = DeviceFactory(owner=cls.device.owner)
+
+    def setUp(self):
+        evaluator.clear()
+        self.addCleanup(evaluator.clear)
+        self.digests = []
+
+        def collect(digest):
+            self.digests.append(digest)
+            return True
+
+        patcher = patch('alert_rule.alerts.send_digest', side_effect=collect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.at = START
+
+    def rule(self, **kwargs):
+        return AlertRuleFactory(
+            owner=self.device.owner, device=kwargs.pop('device', self.device), **kwargs
+        )
+
+    def write(self, values, device=None):
+        readings = []
+        for value in values:
+            readings.append(
+                DeviceData(
+                    device=device or self.device, data=str(value), created_at=self.at
+                )
+            )
+            self.at += timedelta(seconds=10)
+        write_readings(readings)
+
+    def notified(self):
+        return [
+            (item['rule'], item['device'], item['state'])
+            for digest in self.digests
+            for group in digest['groups']
+            for item in group['alerts']
+        ]
+
+    def test_flapping_updates_one_alert(self):
+        """
+        A value hovering around the threshold keeps one alert firing and
+        sends one notification.
+        """
+        rule = self.rule(threshold=30, hysteresis=5)
+        for _ in range(20):
+            self.write([31, 28])
+
+        alert = Alert.objects.get()
+        self.assertEqual(alert.state, Alert.State.FIRING)
+        self.assertEqual(alert.count, 20)
+        self.assertEqual(alert.started_at, START)
+        self.assertEqual(alert.value, 31)
+        self.assertListEqual(
+            self.notified(), [(rule.pk, self.device.pk, Alert.State.FIRING)]
+        )
+
+    def test_resolves_past_the_hysteresis(self):
+        rule = self.rule(threshold=30, hysteresis=5, cooldown=0)
+        self.write([40, 28, 26])
+        self.assertEqual(Alert.objects.get().state, Alert.State.FIRING)
+
+        self.write([25])
+        alert = Alert.objects.get()
+        self.assertEqual(alert.state, Alert.State.RESOLVED)
+        self.assertEqual(alert.resolved_at, START + timedelta(seconds=30))
+        self.assertListEqual(
+            self.notified(),
+            [
+                (rule.pk, self.device.pk, Alert.State.FIRING),
+                (rule.pk, self.device.pk, Alert.State.RESOLVED),
+            ],
+        )
+        self.assertEqual(alerts.firing(self.device.pk), set())
+
+    def test_fire_and_clear_in_one_batch(self):
+        self.rule(threshold=30)
+        self.write([40, 10])
+        self.assertEqual(Alert.objects.get().state, Alert.State.RESOLVED)
+
+    def test_cooldown(self):
+        """
+        Firing again within the cooldown reopens the alert, and changes
+        within the cooldown of the last notification are held back until
+        it is over.
+        """
+        rule = self.rule(threshold=30, cooldown=300)
+        self.write([40, 10])
+        self.write([45])
+
+        alert = Alert.objects.get()
+        self.assertEqual(alert.started_at, START)
+        self.assertEqual(alert.count, 2)
+        # Resolved and firing again: nothing new to say
+        self.assertEqual(len(self.notified()), 1)
+
+        self.write([10])
+        self.assertEqual(len(self.notified()), 1)
+        later = timezone.now() + timedelta(seconds=301)
+        self.assertEqual(len(alerts.run_once(now=later)), 1)
+        self.assertListEqual(
+            self.notified()[1:], [(rule.pk, self.device.pk, Alert.State.RESOLVED)]
+        )
+
+        # Long after resolving, firing starts a new alert in the same row
+        self.at += timedelta(seconds=600)
+        self.write([50])
+        alert = Alert.objects.get()
+        self.assertEqual(alert.count, 1)
+        self.assertEqual(alert.started_at, self.at - timedelta(seconds=10))
+
+    def test_windowed_and_absence_rules_clear(self):
+        avg = self.rule(
+            aggregate=AlertRule.Aggregate.AVG, window=20, threshold=30, cooldown=0
+        )
+        absence = self.rule(
+            kind=AlertRule.Kind.ABSENCE, threshold=None, window=60, cooldown=0
+        )
+        self.write([40, 40, 10, 10, 10])
+        # As fired by the absence sweeper
+        alerts.record([Trigger(absence.pk, self.device.pk, None, self.at)], firing=True)
+        self.write([10])
+
+        states = dict(Alert.objects.values_list('rule_id', 'state'))
+        self.assertDictEqual(
+            states,
+            {avg.pk: Alert.State.RESOLVED, absence.pk: Alert.State.RESOLVED},
+        )
+
+    def test_batched_by_the_worker(self):
+        """
+        While the worker runs, triggers are queued and a pass stores them
+        with one upsert and sends one digest, grouped by key.
+        """
+        rule = self.rule(threshold=30, group_by=AlertRule.GroupBy.OWNER)
+        other = self.rule(threshold=30, device=self.other_device)
+        with patch.object(
+            AlertTracker, 'running', new_callable=PropertyMock, return_value=True
+        ):
+            for _ in range(50):
+                self.write([40])
+                self.write([40], device=self.other_device)
+        self.assertFalse(Alert.objects.exists())
+        self.assertEqual(alerts.pending, 100)
+
+        # Rules, stored alerts, upsert
+        with self.assertNumQueries(3):
+            sent = alerts.run_once()
+
+        self.assertEqual(len(sent), 2)
+        self.assertEqual(len(self.digests), 1)
+        self.assertListEqual(
+            [group['key'] for group in self.digests[0]['groups']],
+            [f'owner:{self.device.owner_id}', f'rule:{other.pk}'],
+        )
+        self.assertDictEqual(
+            dict(Alert.objects.values_list('rule_id', 'count')),
+            {rule.pk: 50, other.pk: 50},
+        )
+
+    def test_disabling_a_rule_resolves_its_alerts(self):
+        rule = self.rule(threshold=30)
+        self.write([40])
+        rule.enabled = False
+        rule.save()
+
+        self.assertEqual(Alert.objects.get().state, Alert.State.RESOLVED)
+        self.assertEqual(alerts.firing(self.device.pk), set())
+
+
+class WebhookTests(TestCase):
+    """Tests for the webhook sink."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rule = AlertRuleFactory(threshold=30)
+
+    def setUp(self):
+        evaluator.clear()
+        self.addCleanup(evaluator.clear)
+
+    def write(self, value):
+        write_readings([DeviceData(device=self.rule.device, data=str(value))])
+
+    @override_settings(
+        ALERT_RULES={'NOTIFY_SINK': 'webhook', 'WEBHOOK_URL': 'http://127.0.0.1:9/'}
+    )
+    def test_posts_the_digest(self):
+        with patch('alert_rule.alerts.urlopen') as urlopen:
+            self.write(40)
+            # Not from within ingest
+            urlopen.assert_not_called()
+            self.assertEqual(len(alerts.run_once()), 1)
+
+        request = urlopen.call_args.args[0]
+        self.assertEqual(request.full_url, 'http://127.0.0.1:9/')
+        body = json.loads(request.data)
+        self.assertEqual(body['groups'][0]['key'], f'rule:{self.rule.pk}')
+        self.assertEqual(body['groups'][0]['alerts'][0]['state'], 'firing')
+
+    @override_settings(
+        ALERT_RULES={'NOTIFY_SINK': 'webhook', 'WEBHOOK_URL': 'http://127.0.0.1:9/'}
+    )
+    def test_failed_posts_are_retried(self):
+        self.write(40)
+        with (
+            patch('alert_rule.alerts.urlopen', side_effect=OSError),
+            self.assertLogs('alert_rule.alerts', 'ERROR'),
+        ):
+            self.assertListEqual(alerts.run_once(), [])
+        alert = Alert.objects.get()
+        self.assertEqual(alert.state, Alert.State.FIRING)
+        self.assertIsNone(alert.notified_at)
+
+        with patch('alert_rule.alerts.urlopen') as urlopen:
+            self.assertEqual(len(alerts.run_once()), 1)
+        urlopen.assert_called_once()
+        self.assertEqual(Alert.objects.get().notified_state, Alert.State.FIRING)
+
+
+class AlertAPITests(TestCase):
+    """Tests for GET /api/alerts/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rule = AlertRuleFactory(threshold=30)
+        cls.other_rule = AlertRuleFactory(threshold=30)
+        for rule, state in [
+            (cls.rule, Alert.State.FIRING),
+            (cls.other_rule, Alert.State.FIRING),
+        ]:
+            Alert.objects.create(
+                rule=rule,
+                device=rule.device,
+                group_key=rule.group_key(rule.device_id),
+                state=state,
+                started_at=START,
+                last_fired_at=START,
+            )
+        cls.resolved_rule = AlertRuleFactory(
+            owner=cls.rule.owner, device=cls.rule.device, threshold=10
+        )
+        Alert.objects.create(
+            rule=cls.resolved_rule,
+            device=cls.rule.device,
+            group_key='rule',
+            state=Alert.State.RESOLVED,
+            started_at=START,
+            last_fired_at=START - timedelta(hours=1),
+            resolved_at=START,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.rule.owner)
+        self.url = reverse('alert_rule:alert-list')
+
+    def test_list_alerts(self):
+        """
+        GET /api/alerts/ return 200 + the alerts of the user's rules.
+        """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(
+            [item['rule'] for item in response.data],
+            [self.rule.pk, self.resolved_rule.pk],
+        )
+
+    def test_filter_by_state(self):
+        """
+        GET /api/alerts/?state= return 200 + alerts in that state; 400 for
+        unknown states.
+        """
+        response = self.client.get(self.url, {'state': 'resolved'})
+        self.assertListEqual(
+            [item['rule'] for item in response.data], [self.resolved_rule.pk]
+        )
+        response = self.client.get(self.url, {'state': 'silenced'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
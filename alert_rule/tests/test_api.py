@@ -0,0 +1,142 @@
+"""
+Tests for api endpoints about AlertRule.
+"""
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+from device.tests.factories import DeviceFactory
+from device_group.tests.factories import DeviceGroupFactory
+
+from ..models import AlertRule
+from .factories import AlertRuleFactory
+
+
+class AlertRuleAPITests(APITestCase):
+    """Tests for the AlertRule API endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.device = DeviceFactory(owner=cls.user)
+        cls.group = DeviceGroupFactory(owner=cls.user, devices=[cls.device])
+        cls.rules = AlertRuleFactory.create_batch(3, owner=cls.user)
+        cls.other_rule = AlertRuleFactory()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.list_url = reverse('alert_rule:rule-list')
+
+    def detail_url(self, rule):
+        return reverse('alert_rule:rule-detail', kwargs={'pk': rule.pk})
+
+    def test_list_rules(self):
+        """
+        GET /api/alerts/rules/ return 200 + the rules owned by user.
+        """
+        response = self.client.get(self.list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(
+            [item['id'] for item in response.data], [rule.pk for rule in self.rules]
+        )
+
+    def test_create_rules(self):
+        """
+        POST /api/alerts/rules/ return 201 for a rule on a device or a group.
+        """
+        payloads = [
+            {'name': 'hot', 'device': self.device.pk, 'threshold': 30},
+            {
+                'name': 'rising',
+                'device_group': self.group.pk,
+                'kind': AlertRule.Kind.RATE,
+                'operator': AlertRule.Operator.GTE,
+                'threshold': 0.5,
+                'window': 60,
+            },
+            {
+                'name': 'silent',
+                'device': self.device.pk,
+                'kind': AlertRule.Kind.ABSENCE,
+                'metric': 'temperature',
+                'window': 300,
+            },
+        ]
+        for payload in payloads:
+            response = self.client.post(self.list_url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['owner'], self.user.pk)
+
+        self.assertEqual(AlertRule.objects.filter(owner=self.user).count(), 6)
+
+    def test_create_invalid_rules(self):
+        """
+        POST /api/alerts/rules/ return 400 for incomplete rules and for
+        devices or groups of other users.
+        """
+        valid = {'name': 'rule', 'device': self.device.pk, 'threshold': 30}
+        payloads = [
+            {**valid, 'device_group': self.group.pk},
+            {'name': 'rule', 'threshold': 30},
+            {'name': 'rule', 'device': self.device.pk},
+            {**valid, 'kind': AlertRule.Kind.RATE},
+            {**valid, 'kind': AlertRule.Kind.ABSENCE},
+            {**valid, 'aggregate': AlertRule.Aggregate.AVG},
+            {**valid, 'hysteresis': -1},
+            {**valid, 'device': self.other_rule.device_id},
+            {**valid, 'device': None, 'device_group': DeviceGroupFactory().pk},
+        ]
+        for payload in payloads:
+            response = self.client.post(self.list_url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, payload)
+
+    def test_update_rule(self):
+        """
+        PATCH /api/alerts/rules/{pk}/ return 200 and keeps the other fields.
+        """
+        rule = self.rules[0]
+        response = self.client.patch(
+            self.detail_url(rule),
+            {'aggregate': AlertRule.Aggregate.MAX, 'window': 600},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rule.refresh_from_db()
+        self.assertEqual(rule.aggregate, AlertRule.Aggregate.MAX)
+        self.assertEqual(rule.threshold, 30.0)
+
+        response = self.client.patch(
+            self.detail_url(rule), {'window': 0}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_rule(self):
+        """
+        DELETE /api/alerts/rules/{pk}/ return 204 and removes the rule.
+        """
+        response = self.client.delete(self.detail_url(self.rules[0]))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(AlertRule.objects.filter(pk=self.rules[0].pk).exists())
+
+    def test_rules_of_other_users(self):
+        """
+        GET, PUT and DELETE /api/alerts/rules/{pk}/ return 404 if not owned.
+        """
+        url = self.detail_url(self.other_rule)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.put(url, {'name': 'x'}, format='json').status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,241 @@
+"""
+Tests for the evaluation of alert rules at ingest.
+"""
+
+import random
+from datetime import datetime, timedelta
+from unittest.mock import PropertyMock, patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from device.ingest import write_readings
+from device.models import DeviceData
+from device.tests.factories import DeviceFactory
+from device_group.tests.factories import DeviceGroupFactory
+
+from ..alerts import AlertTracker
+from ..evaluator import evaluator
+from ..models import AlertRule
+from ..rules import SlidingWindow
+from ..signals import rule_triggered
+from .factories import AlertRuleFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+
+class SlidingWindowTests(TestCase):
+    """Tests for the running aggregates of SlidingWindow."""
+
+    def test_aggregates_match_a_full_scan(self):
+        rng = random.Random(7)
+        window = SlidingWindow(30)
+        points = []
+        at = 0.0
+        for _ in range(500):
+            at += rng.choice([0, 1, 2, 5, 17])
+            value = rng.uniform(-50, 50)
+            window.push(at, value)
+            points.append((at, value))
+            held = [v for t, v in points if t >= at - 30]
+
+            self.assertEqual(len(window), len(held))
+            self.assertAlmostEqual(window.avg(), sum(held) / len(held))
+            self.assertEqual(window.min(), min(held))
+            self.assertEqual(window.max(), max(held))
+            self.assertEqual(window.last(), value)
+
+    def test_rate(self):
+        window = SlidingWindow(60)
+        window.push(0, 10.0)
+        self.assertIsNone(window.rate())
+        window.push(20, 20.0)
+        window.push(40, 16.0)
+        self.assertEqual(window.rate(), 0.15)
+        window.push(70, 10.0)
+        self.assertEqual(window.rate(), -0.2)
+
+    def test_older_readings_are_ignored(self):
+        window = SlidingWindow(60)
+        window.push(10, 1.0)
+        self.assertFalse(window.push(5, 100.0))
+        self.assertEqual(window.max(), 1.0)
+
+
+class RuleEvaluatorTests(TestCase):
+    """Tests for the rules evaluated on data_ingested."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = DeviceFactory()
+        cls.other_device = DeviceFactory(owner=cls.device.owner)
+
+    def setUp(self):
+        evaluator.clear()
+        self.addCleanup(evaluator.clear)
+        self.triggers = []
+        # Digests are covered by test_alerts.py
+        patcher = patch('alert_rule.alerts.send_digest', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        def collect(sender, triggers, **kwargs):
+            self.triggers += triggers
+
+        rule_triggered.connect(collect)
+        self.addCleanup(rule_triggered.disconnect, collect)
+
+    def rule(self, **kwargs):
+        return AlertRuleFactory(
+            owner=self.device.owner, device=kwargs.pop('device', self.device), **kwargs
+        )
+
+    def write(self, values, device=None, start=START, step=10):
+        return write_readings(
+            [
+                DeviceData(
+                    device=device or self.device,
+                    data=str(value),
+                    created_at=start + timedelta(seconds=n * step),
+                )
+                for n, value in enumerate(values)
+            ]
+        )
+
+    def fired(self):
+        return [(t.rule_id, t.device_id, t.value) for t in self.triggers]
+
+    def test_threshold_on_each_reading(self):
+        rule = self.rule(threshold=30)
+        self.rule(threshold=30, device=self.other_device)
+
+        self.write([25, 31, 'n/a', 30, 45])
+
+        self.assertListEqual(
+            self.fired(), [(rule.pk, self.device.pk, 31), (rule.pk, self.device.pk, 45)]
+        )
+        self.assertEqual(self.triggers[0].at, START + timedelta(seconds=10))
+
+    def test_windowed_aggregates(self):
+        avg = self.rule(aggregate=AlertRule.Aggregate.AVG, window=30, threshold=20)
+        low = self.rule(
+            aggregate=AlertRule.Aggregate.MIN,
+            window=30,
+            operator=AlertRule.Operator.LT,
+            threshold=5,
+        )
+
+        # Windows of 30 s hold the last four readings, 10 s apart
+        self.write([10, 30, 30, 2, 10, 10, 10])
+
+        self.assertListEqual(
+            self.fired(),
+            [
+                (avg.pk, self.device.pk, 70 / 3),
+                (low.pk, self.device.pk, 2),
+                (low.pk, self.device.pk, 2),
+                (low.pk, self.device.pk, 2),
+                (low.pk, self.device.pk, 2),
+            ],
+        )
+
+    def test_rate_of_change(self):
+        rule = self.rule(kind=AlertRule.Kind.RATE, window=60, threshold=0.5)
+
+        # At most 11 / 40 per second over the window
+        self.write([20, 21, 22, 30, 31])
+        self.assertListEqual(self.fired(), [])
+
+        self.write([50], start=START + timedelta(seconds=50))
+        self.assertListEqual(self.fired(), [(rule.pk, self.device.pk, 30 / 50)])
+
+    def test_windows_continue_across_batches(self):
+        rule = self.rule(aggregate=AlertRule.Aggregate.MAX, window=60, threshold=40)
+        self.write([50])
+        self.write([10, 10], start=START + timedelta(seconds=30))
+        self.write([10], start=START + timedelta(seconds=70))
+
+        self.assertListEqual(
+            self.fired(),
+            [
+                (rule.pk, self.device.pk, 50),
+                (rule.pk, self.device.pk, 50),
+                (rule.pk, self.device.pk, 50),
+            ],
+        )
+
+    def test_window_is_filled_from_stored_readings(self):
+        self.write([50, 10])
+        rule = self.rule(aggregate=AlertRule.Aggregate.AVG, window=60, threshold=20)
+
+        self.write([10], start=START + timedelta(seconds=20))
+
+        self.assertListEqual(self.fired(), [(rule.pk, self.device.pk, 70 / 3)])
+
+    def test_metric_filter(self):
+        rule = self.rule(metric='temperature', threshold=30)
+        write_readings(
+            [
+                DeviceData(device=self.device, data='humidity=80 %'),
+                DeviceData(device=self.device, data='temperature=35 C'),
+            ]
+        )
+        self.assertListEqual(self.fired(), [(rule.pk, self.device.pk, 35)])
+
+    def test_group_rules(self):
+        group = DeviceGroupFactory(owner=self.device.owner, devices=[self.device])
+        rule = self.rule(device=None, device_group=group, threshold=30)
+
+        self.write([40])
+        self.write([40], device=self.other_device)
+        group.devices.add(self.other_device)
+        self.write([50], device=self.other_device)
+
+        self.assertListEqual(
+            self.fired(),
+            [(rule.pk, self.device.pk, 40), (rule.pk, self.other_device.pk, 50)],
+        )
+
+    def test_rule_changes_apply_to_the_next_reading(self):
+        rule = self.rule(threshold=30)
+        self.write([40])
+        rule.enabled = False
+        rule.save()
+        self.write([40])
+        AlertRuleFactory(owner=self.device.owner, device=self.device, threshold=45)
+        self.write([50])
+
+        self.assertEqual(len(self.fired()), 2)
+
+    @override_settings(ALERT_RULES={'ENABLED': False})
+    def test_disabled(self):
+        self.rule(threshold=30)
+        self.write([40])
+        self.assertListEqual(self.triggers, [])
+
+    def test_cost_does_not_depend_on_stored_readings(self):
+        """
+        Once the rules and windows of a device are loaded, evaluating a
+        batch makes no query, however many readings are stored. Alert changes
+        are stored later by the notifier thread.
+        """
+        self.rule(aggregate=AlertRule.Aggregate.AVG, window=3600, threshold=20)
+        self.rule(kind=AlertRule.Kind.RATE, window=600, threshold=1)
+        self.write(range(200), step=1)
+
+        readings = [
+            DeviceData(
+                device=self.device,
+                data='25',
+                value=25.0,
+                created_at=START + timedelta(seconds=300 + n),
+            )
+            for n in range(50)
+        ]
+        with (
+            patch.object(
+                AlertTracker, 'running', new_callable=PropertyMock, return_value=True
+            ),
+            self.assertNumQueries(0),
+        ):
+            evaluator.evaluate(readings)
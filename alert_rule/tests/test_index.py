@@ -0,0 +1,186 @@
+"""
+Tests for the rule index and the plans it hands out.
+"""
+
+import random
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from device.tests.factories import DeviceFactory
+from device_group.tests.factories import DeviceGroupFactory
+
+from ..index import IndexState, rule_index
+from ..models import AlertRule
+from ..rules import CompiledRule, RulePlan
+from .factories import AlertRuleFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+
+class RulePlanTests(TestCase):
+    """Tests for the threshold matching of RulePlan."""
+
+    def test_bisection_matches_each_rule(self):
+        rng = random.Random(3)
+        rules = []
+        for pk in range(1, 201):
+            rule = AlertRule(
+                pk=pk,
+                operator=rng.choice(AlertRule.Operator.values),
+                threshold=rng.randint(-10, 10),
+                metric=rng.choice(['', 'temperature']),
+            )
+            rules.append(CompiledRule(rule))
+        plan = RulePlan(rules)
+
+        for value in [*range(-12, 13), 0.5, -3.25]:
+            for metric in ['', 'temperature', 'humidity']:
+                reading = SimpleNamespace(value=value, metric=metric, created_at=START)
+                expected = sorted(
+                    rule.id
+                    for rule in rules
+                    if rule.accepts(reading) and rule.fires(value)
+                )
+                fired = plan.fired_thresholds(1, [reading])
+                self.assertListEqual(
+                    sorted(trigger.rule_id for trigger in fired), expected
+                )
+
+    def test_windowed_and_absence_rules(self):
+        rules = [
+            CompiledRule(AlertRule(pk=1, threshold=1)),
+            CompiledRule(AlertRule(pk=2, aggregate=AlertRule.Aggregate.AVG, window=60)),
+            CompiledRule(AlertRule(pk=3, kind=AlertRule.Kind.ABSENCE, window=60)),
+            CompiledRule(AlertRule(pk=4, kind=AlertRule.Kind.RATE, window=60)),
+        ]
+        plan = RulePlan(rules)
+
+        self.assertListEqual([rule.id for rule in plan.windowed], [2, 4])
+        self.assertListEqual([rule.id for rule in plan.absence], [3])
+
+
+class RuleIndexTests(TestCase):
+    """Tests for the incremental updates of the rule index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = DeviceFactory()
+        cls.other_device = DeviceFactory(owner=cls.device.owner)
+        cls.group = DeviceGroupFactory(owner=cls.device.owner, devices=[cls.device])
+
+    def setUp(self):
+        rule_index.clear()
+        self.addCleanup(rule_index.clear)
+
+    def rule(self, **kwargs):
+        return AlertRuleFactory(owner=self.device.owner, **kwargs)
+
+    def rule_ids(self, device):
+        plan = rule_index.plans_for([device.pk])[device.pk]
+        if plan is None:
+            return []
+        ids = [rule.id for rule in [*plan.windowed, *plan.absence]]
+        for tables in plan.thresholds.values():
+            for _, _, rule_ids in tables:
+                ids += rule_ids
+        return sorted(ids)
+
+    def test_loads_with_two_queries(self):
+        direct = self.rule(device=self.device)
+        grouped = self.rule(device=None, device_group=self.group)
+        self.rule(device=self.device, enabled=False)
+
+        with self.assertNumQueries(2):
+            rule_index.plans_for([self.device.pk])
+        with self.assertNumQueries(0):
+            self.assertListEqual(self.rule_ids(self.device), [direct.pk, grouped.pk])
+            self.assertListEqual(self.rule_ids(self.other_device), [])
+
+    def test_rule_changes(self):
+        rule_index.plans_for([])
+        rule = self.rule(device=self.device)
+        self.assertListEqual(self.rule_ids(self.device), [rule.pk])
+
+        rule.device = self.other_device
+        rule.save()
+        self.assertListEqual(self.rule_ids(self.device), [])
+        self.assertListEqual(self.rule_ids(self.other_device), [rule.pk])
+
+        rule.threshold = 50
+        rule.save()
+        plan = rule_index.plans_for([self.other_device.pk])[self.other_device.pk]
+        self.assertListEqual(plan.thresholds[''][0][1], [50])
+
+        rule.enabled = False
+        rule.save()
+        self.assertListEqual(self.rule_ids(self.other_device), [])
+
+        rule.enabled = True
+        rule.save()
+        rule.delete()
+        self.assertListEqual(self.rule_ids(self.other_device), [])
+
+    def test_group_membership_changes(self):
+        rule_index.plans_for([])
+        rule = self.rule(device=None, device_group=self.group)
+        self.assertListEqual(self.rule_ids(self.device), [rule.pk])
+
+        with self.assertNumQueries(0):
+            self.assertListEqual(self.rule_ids(self.other_device), [])
+        self.group.devices.add(self.other_device)
+        self.assertListEqual(self.rule_ids(self.other_device), [rule.pk])
+
+        # Changed from the side of the device
+        self.device.device_groups.remove(self.group)
+        self.assertListEqual(self.rule_ids(self.device), [])
+        self.device.device_groups.add(self.group)
+        self.assertListEqual(self.rule_ids(self.device), [rule.pk])
+        self.device.device_groups.clear()
+        self.assertListEqual(self.rule_ids(self.device), [])
+
+        self.group.devices.clear()
+        self.assertListEqual(self.rule_ids(self.other_device), [])
+
+    def test_groups_without_rules_are_not_tracked(self):
+        rule_index.plans_for([])
+        untracked = DeviceGroupFactory(owner=self.device.owner)
+        untracked.devices.add(self.device, self.other_device)
+
+        self.assertDictEqual(rule_index._state.members, {})
+        rule = self.rule(device=None, device_group=untracked)
+        self.assertListEqual(self.rule_ids(self.other_device), [rule.pk])
+
+    def test_deleted_groups_and_devices(self):
+        rule_index.plans_for([])
+        grouped = self.rule(device=None, device_group=self.group)
+        direct = self.rule(device=self.other_device)
+        self.group.devices.add(self.other_device)
+        self.assertListEqual(self.rule_ids(self.other_device), [grouped.pk, direct.pk])
+
+        self.group.delete()
+        self.assertListEqual(self.rule_ids(self.other_device), [direct.pk])
+        self.assertListEqual(self.rule_ids(self.device), [])
+
+        self.other_device.delete()
+        state = rule_index._state
+        self.assertDictEqual(state.rules, {})
+        self.assertDictEqual(state.device_groups, {})
+
+    def test_changes_during_a_rebuild_are_replayed(self):
+        rule_index.plans_for([])
+        build = IndexState.build
+
+        def racing_build():
+            state = build()
+            # Saved after the rules were read, before the state is swapped
+            self.rule(device=self.device)
+            return state
+
+        with patch.object(IndexState, 'build', side_effect=racing_build):
+            rule_index.rebuild()
+
+        self.assertEqual(len(self.rule_ids(self.device)), 1)
@@ -0,0 +1,15 @@
+from django.urls import path
+
+from .views import (
+    AlertListAPIView,
+    AlertRuleGetUpdateDropAPIView,
+    AlertRuleListCreateAPIView,
+)
+
+app_name = 'alert_rule'
+
+urlpatterns = [
+    path('', AlertListAPIView.as_view(), name='alert-list'),
+    path('rules', AlertRuleListCreateAPIView.as_view(), name='rule-list'),
+    path('rules/<int:pk>', AlertRuleGetUpdateDropAPIView.as_view(), name='rule-detail'),
+]
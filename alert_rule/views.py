@@ -1,3 +1,142 @@
-from django.shortcuts import render
+"""
+View functions in alert_rule.
+"""
 
-# Create your views here.
+from rest_framework import generics, serializers
+from rest_framework.permissions import IsAuthenticated
+
+from device.models import Device
+from device_group.models import DeviceGroup
+
+from .models import Alert, AlertRule
+
+
+class AlertRuleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AlertRule
+        fields = [
+            'id',
+            'name',
+            'device',
+            'device_group',
+            'kind',
+            'metric',
+            'operator',
+            'threshold',
+            'aggregate',
+            'window',
+            'hysteresis',
+            'cooldown',
+            'group_by',
+            'enabled',
+            'owner',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = ['id', 'owner', 'created_at', 'updated_at']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Rules can only watch the user's own devices and groups
+        user = self.context['request'].user
+        fields['device'].queryset = Device.objects.filter(owner=user)
+        fields['device_group'].queryset = DeviceGroup.objects.filter(owner=user)
+        return fields
+
+    def validate(self, attrs):
+        def get(field):
+            if field in attrs:
+                return attrs[field]
+            return getattr(self.instance, field, None)
+
+        if (get('device') is None) == (get('device_group') is None):
+            raise serializers.ValidationError(
+                'Set exactly one of device and device_group.'
+            )
+        kind = get('kind') or AlertRule.Kind.THRESHOLD
+        window = get('window') or 0
+        if kind != AlertRule.Kind.ABSENCE and get('threshold') is None:
+            raise serializers.ValidationError(
+                {'threshold': f'Required for {kind} rules.'}
+            )
+        if kind != AlertRule.Kind.THRESHOLD and not window:
+            raise serializers.ValidationError({'window': f'Required for {kind} rules.'})
+        aggregate = get('aggregate') or AlertRule.Aggregate.LAST
+        if aggregate != AlertRule.Aggregate.LAST and not window:
+            raise serializers.ValidationError(
+                {'window': f'Required to take the {aggregate} of readings.'}
+            )
+        return attrs
+
+
+class AlertSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Alert
+        fields = [
+            'id',
+            'rule',
+            'device',
+            'group_key',
+            'state',
+            'value',
+            'count',
+            'started_at',
+            'last_fired_at',
+            'resolved_at',
+            'notified_at',
+        ]
+        read_only_fields = fields
+
+
+class AlertRuleListCreateAPIView(generics.ListCreateAPIView):
+    """
+    GET /api/alerts/rules/  return 200 + all alert rules owned by user if auth; 401 otherwise.
+    POST /api/alerts/rules/ return 201 if auth and valid; 400 if invalid; 401 otherwise.
+        A rule watches either one device or every device of a group.
+    """
+
+    serializer_class = AlertRuleSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return AlertRule.objects.filter(owner=self.request.user).order_by('pk')
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+
+class AlertRuleGetUpdateDropAPIView(generics.RetrieveUpdateDestroyAPIView):
+    """
+    GET /api/alerts/rules/{pk}/    return 200 + rule if owned by user; 404 if not owned; 401 if anon.
+    PUT /api/alerts/rules/{pk}/    return 200 if owned and updated; 400 if invalid; 404 if not owned; 401 if anon.
+    DELETE /api/alerts/rules/{pk}/ return 204 if owned and deleted; 404 if not owned; 401 if anon.
+    """
+
+    serializer_class = AlertRuleSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return AlertRule.objects.filter(owner=self.request.user)
+
+
+class AlertListAPIView(generics.ListAPIView):
+    """
+    GET /api/alerts/ return 200 + the alerts of the rules owned by user, most
+        recently fired first, if auth; 401 otherwise.
+        ?state=firing or ?state=resolved keeps the alerts in that state; 400 for
+        any other state.
+    """
+
+    serializer_class = AlertSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        alerts = Alert.objects.filter(rule__owner=self.request.user)
+        state = self.request.query_params.get('state')
+        if state is not None:
+            if state not in Alert.State.values:
+                raise serializers.ValidationError(
+                    {'state': f'Expected one of {", ".join(Alert.State.values)}.'}
+                )
+            alerts = alerts.filter(state=state)
+        return alerts.order_by('-last_fired_at', '-pk')
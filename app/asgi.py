@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_asgi_application()
+
+# Start the background flushers used by the ingest path (see device/workers.py)
+from device.workers import start_workers
+
+start_workers()
@@ -38,6 +38,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
+    'rest_framework.authtoken',
 ]
 
 LOCAL_APPS = [
@@ -88,6 +90,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Lets the retention purge hand freed pages back to the filesystem
+            # a few at a time. Only takes effect on a new database file; an
+            # existing one needs a single VACUUM after this is set.
+            'init_command': 'PRAGMA auto_vacuum = INCREMENTAL;',
+        },
     }
 }
 
@@ -139,7 +147,174 @@ AUTH_USER_MODEL = 'account.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'account.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
 }
+
+# Token lookups made by account.authentication.CachedTokenAuthentication and
+# device.authentication.DeviceTokenAuthentication are cached per process.
+AUTH_TOKEN_CACHE = {
+    # Tokens kept in the in-process LRU
+    'MAX_ENTRIES': 10000,
+    # Seconds a token is trusted without looking it up again. Tokens revoked or
+    # users deactivated by another process stay valid here for up to this long
+    # unless CACHE is set.
+    'TTL': 60.0,
+    # Alias of a cache in CACHES shared by all server processes. Leave as None
+    # for a single process.
+    'CACHE': None,
+    # Seconds an entry read from the shared cache is reused locally
+    'LOCAL_TTL': 1.0,
+}
+
+# Device data ingestion
+
+# Maximum number of readings accepted by a single bulk ingest request.
+DEVICE_DATA_BULK_MAX_ITEMS = 1000
+
+# Rows fetched per database round trip by ?export=csv|ndjson on
+# /devices/<pk>/data; the export is streamed, so memory use does not grow
+# with the number of rows.
+DEVICE_DATA_EXPORT_CHUNK_SIZE = 2000
+
+# Serve plain JSON listings of /devices/<pk>/data straight from value tuples,
+# bypassing DeviceDataSerializer and JSONRenderer (see device/renderers.py).
+# The output is the same either way.
+DEVICE_DATA_FAST_JSON = True
+
+# Number of readings written per transaction by the streaming backfill upload.
+DEVICE_DATA_BACKFILL_CHUNK_SIZE = 1000
+
+# Write-behind ingest for POST /devices/<pk>/data: readings are queued in
+# process and group-committed by a background thread (see device/ingest.py).
+DEVICE_DATA_WRITE_BEHIND = {
+    'ENABLED': False,
+    # Seconds between flushes; a flush also starts once FLUSH_MAX_ROWS are queued
+    'FLUSH_INTERVAL': 0.2,
+    'FLUSH_MAX_ROWS': 500,
+    # Requests wait up to SUBMIT_TIMEOUT seconds for room once MAX_PENDING
+    # readings are queued, then get a 503
+    'MAX_PENDING': 10000,
+    'SUBMIT_TIMEOUT': 0.5,
+}
+
+# Retention purge of expired DeviceData/DeviceLog rows (see device/retention.py
+# and RetentionPolicy). Also available as `manage.py purge_device_data`.
+DEVICE_DATA_RETENTION = {
+    # Run the purge on a background thread of the server process
+    'ENABLED': False,
+    # Seconds between purge passes
+    'INTERVAL': 3600,
+    # Rows deleted per transaction and seconds slept between batches, so
+    # ingestion never waits long for the write lock
+    'BATCH_SIZE': 1000,
+    'BATCH_PAUSE': 0.05,
+    # Free pages returned to the filesystem per device purged
+    'VACUUM_PAGES': 1000,
+}
+
+# Cold-tier archive: readings older than AFTER_DAYS are moved out of the
+# database into compressed per-device, per-day segment files under ROOT by
+# `manage.py archive_device_data` (see device/archive.py). The device data
+# endpoint keeps serving them.
+DEVICE_DATA_ARCHIVE = {
+    'ROOT': BASE_DIR / 'archive',
+    'AFTER_DAYS': 90,
+    # Readings per compressed block; a range read decodes whole blocks
+    'BLOCK_ROWS': 1024,
+}
+
+# Latest reading per device, updated on every ingest and served by
+# /devices/latest and /devices/<pk>/data/latest (see device/latest.py).
+DEVICE_LATEST_READING = {
+    # Devices kept in the in-process LRU
+    'MAX_ENTRIES': 10000,
+    # Alias of a cache in CACHES shared by all server processes, e.g. Redis or
+    # Memcached. Leave as None for a single process.
+    'CACHE': None,
+    # Seconds an entry read from the shared cache is reused locally
+    'LOCAL_TTL': 1.0,
+}
+
+# Owner and status of devices as seen by permission checks and ingest, cached
+# per process (see device/ownership.py). Changes made in this process are seen
+# at once, changes made by other processes after at most TTL seconds.
+DEVICE_OWNERSHIP_CACHE = {
+    # Devices kept in the in-process LRU
+    'MAX_ENTRIES': 10000,
+    # Seconds an entry is reused
+    'TTL': 5.0,
+}
+
+# Heartbeats posted to /devices/<pk>/heartbeat are kept in memory and written
+# to Device.last_seen in one batched UPDATE per flush (see device/heartbeat.py).
+DEVICE_HEARTBEAT = {
+    'ENABLED': True,
+    # Seconds between flushes; last_seen lags by at most this much
+    'FLUSH_INTERVAL': 5.0,
+    # Devices per UPDATE statement
+    'BATCH_SIZE': 500,
+    # Data messages from devices known to be online and seen within this many
+    # seconds do not write last_seen again; it lags their data by at most this
+    'DATA_MAX_LAG': 60.0,
+}
+
+# Devices that stay silent (no heartbeat or data) for MISSED_BEATS times their
+# heartbeat_interval are set offline by a sweeper thread (see device/liveness.py).
+DEVICE_LIVENESS = {
+    'ENABLED': True,
+    # Seconds between sweeps
+    'TICK': 1.0,
+    # Heartbeat interval in seconds of devices without their own
+    'DEFAULT_INTERVAL': 60,
+    # Missed heartbeats after which a device is offline
+    'MISSED_BEATS': 3,
+}
+
+# Alert rules evaluated at ingest by alert_rule.evaluator, absence rules by a
+# background sweeper in alert_rule.absence.
+ALERT_RULES = {
+    'ENABLED': True,
+    # Seconds between rebuilds of the per-process rule index; changes to rules
+    # and groups made by other processes are seen after at most this long
+    'INDEX_REFRESH': 60.0,
+    # (rule, device) sliding windows held per process; evicted windows are
+    # filled from DeviceData again
+    'MAX_WINDOWS': 100000,
+    # Seconds between absence checks
+    'TICK': 1.0,
+    # Seconds between passes that store alert changes and send one digest of
+    # the alerts that fired or resolved
+    'NOTIFY_INTERVAL': 30.0,
+    # 'log' writes digests to the alert_rule.alerts logger; 'webhook' POSTs
+    # them as JSON to WEBHOOK_URL
+    'NOTIFY_SINK': 'log',
+    'WEBHOOK_URL': None,
+    'WEBHOOK_TIMEOUT': 5.0,
+}
+
+# Live dashboard feed at /live: readings and device status changes pushed to
+# the browser as server-sent events (see dashboard/live.py). Needs the ASGI
+# application (app/asgi.py); under WSGI the feed answers 501.
+DASHBOARD_LIVE = {
+    'ENABLED': True,
+    # Readings queued per client; a slow client loses the oldest ones and is
+    # told how many
+    'QUEUE_SIZE': 1000,
+    # Seconds between keep-alive comments on an idle feed
+    'KEEPALIVE': 15.0,
+    # Devices a single feed may watch
+    'MAX_DEVICES': 1000,
+}
+
+# Per-user summary of the dashboard landing page and GET /summary, kept up to
+# date in memory as devices, readings, groups and alerts change (see
+# dashboard/summary.py).
+DASHBOARD_SUMMARY = {
+    # Users whose summary is kept in the in-process LRU
+    'MAX_USERS': 1000,
+    # Seconds before a summary is built again from the database; changes made
+    # by other processes are seen after at most this long
+    'REFRESH': 300.0,
+}
@@ -21,5 +21,6 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('account/', include('account.urls')),
     path('devices/', include('device.urls')),
+    path('alerts/', include('alert_rule.urls')),
     path('', include('dashboard.urls')),
 ]
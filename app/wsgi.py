@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Start the background flushers used by the ingest path (see device/workers.py)
+from device.workers import start_workers
+
+start_workers()
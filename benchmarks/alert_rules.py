@@ -0,0 +1,231 @@
+"""
+Cost of evaluating a batch of readings against the alert rules: checking
+every rule against every reading, against the rule index of
+alert_rule.index and the plans it hands out.
+
+    python -m benchmarks.alert_rules --rules 10000 --devices 50000
+
+Fills a scratch SQLite database (see benchmarks/settings.py) with devices,
+groups of --group-size devices and threshold rules, a fifth of them aimed at
+groups, then times the threshold matching of batches of readings spread over
+random devices both ways. The triggers are checked to be identical first.
+Loading the index and keeping it current as rules and group memberships
+change are timed as well.
+"""
+
+import argparse
+import random
+from datetime import UTC, datetime
+
+from .utils import reset_database, setup_django, summarize, timed
+
+START = datetime(2025, 1, 1, tzinfo=UTC)
+METRICS = ['', '', 'temperature', 'humidity']
+DEVICE_SQL = (
+    'INSERT INTO device_device (name, type, status, last_seen, serial_number, '
+    "owner_id, data_version) VALUES (?, 'sensor', 'online', ?, ?, ?, 0)"
+)
+GROUP_SQL = (
+    'INSERT INTO device_group_devicegroup (name, description, created_at, '
+    "updated_at, owner_id) VALUES (?, '', ?, ?, ?)"
+)
+MEMBER_SQL = (
+    'INSERT INTO device_group_devicegroup_devices (devicegroup_id, device_id) '
+    'VALUES (?, ?)'
+)
+RULE_SQL = (
+    'INSERT INTO alert_rule_alertrule (name, owner_id, device_id, device_group_id, '
+    'kind, metric, operator, threshold, aggregate, window, enabled, hysteresis, '
+    'cooldown, group_by, created_at, updated_at) '
+    "VALUES (?, ?, ?, ?, 'threshold', ?, ?, ?, 'last', 0, 1, ?, ?, ?, ?, ?)"
+)
+
+
+def populate(devices, groups, group_size, rules, rng):
+    from django.db import connection, transaction
+
+    from account.models import User
+    from alert_rule.models import AlertRule
+
+    owner = User.objects.create_user(email='bench@example.com', password='bench')
+    now = START.isoformat(' ')[:26]
+    raw = connection.cursor().connection
+    with transaction.atomic():
+        raw.executemany(
+            DEVICE_SQL, [(f'bench_{n}', now, f'B{n}', owner.pk) for n in range(devices)]
+        )
+        device_ids = [row[0] for row in raw.execute('SELECT id FROM device_device')]
+        raw.executemany(
+            GROUP_SQL, [(f'group_{n}', now, now, owner.pk) for n in range(groups)]
+        )
+        group_ids = [
+            row[0] for row in raw.execute('SELECT id FROM device_group_devicegroup')
+        ]
+        raw.executemany(
+            MEMBER_SQL,
+            [
+                (group_id, device_id)
+                for group_id in group_ids
+                for device_id in rng.sample(device_ids, group_size)
+            ],
+        )
+        defaults = [
+            AlertRule._meta.get_field(name).default
+            for name in ('hysteresis', 'cooldown', 'group_by')
+        ]
+        rows = []
+        for n in range(rules):
+            grouped = n % 5 == 0
+            rows.append(
+                (
+                    f'rule_{n}',
+                    owner.pk,
+                    None if grouped else rng.choice(device_ids),
+                    rng.choice(group_ids) if grouped else None,
+                    rng.choice(METRICS),
+                    rng.choice(AlertRule.Operator.values),
+                    rng.uniform(0, 100),
+                    *defaults,
+                    now,
+                    now,
+                )
+            )
+        raw.executemany(RULE_SQL, rows)
+    return device_ids, group_ids
+
+
+def make_batch(device_ids, size, rng):
+    from device.models import DeviceData
+
+    return [
+        DeviceData(
+            pk=n,
+            device_id=rng.choice(device_ids),
+            value=rng.uniform(0, 100),
+            metric=rng.choice(METRICS),
+            created_at=START,
+        )
+        for n in range(size)
+    ]
+
+
+def naive_path():
+    """Every rule is checked against every reading, as a scan of all rules."""
+    from alert_rule.models import AlertRule
+    from alert_rule.rules import CompiledRule, Trigger
+    from device_group.models import DeviceGroup
+
+    rules = list(AlertRule.objects.filter(enabled=True))
+    members = {}
+    for group_id, device_id in DeviceGroup.devices.through.objects.values_list(
+        'devicegroup_id', 'device_id'
+    ):
+        members.setdefault(group_id, set()).add(device_id)
+    compiled = [
+        (CompiledRule(rule), rule.device_id, members.get(rule.device_group_id, ()))
+        for rule in rules
+    ]
+
+    def run(batch):
+        triggers = []
+        for reading in batch:
+            for rule, device_id, group in compiled:
+                if (
+                    (reading.device_id == device_id or reading.device_id in group)
+                    and rule.accepts(reading)
+                    and rule.fires(reading.value)
+                ):
+                    triggers.append(
+                        Trigger(
+                            rule.id,
+                            reading.device_id,
+                            reading.value,
+                            reading.created_at,
+                        )
+                    )
+        return triggers
+
+    return run
+
+
+def index_path():
+    """The threshold pass of RuleEvaluator.evaluate()."""
+    from alert_rule.index import rule_index
+
+    def run(batch):
+        by_device = {}
+        for reading in batch:
+            by_device.setdefault(reading.device_id, []).append(reading)
+        plans = rule_index.plans_for(list(by_device))
+        triggers = []
+        for device_id, readings in by_device.items():
+            plan = plans[device_id]
+            if plan is not None:
+                triggers += plan.fired_thresholds(device_id, readings)
+        return triggers
+
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rules', type=int, default=10_000)
+    parser.add_argument('--devices', type=int, default=50_000)
+    parser.add_argument('--groups', type=int, default=500)
+    parser.add_argument('--group-size', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from alert_rule.index import rule_index
+    from alert_rule.models import AlertRule
+    from device_group.models import DeviceGroup
+
+    rng = random.Random(0)
+    reset_database()
+    print(
+        f'Populating {args.devices:,} devices, {args.groups:,} groups and '
+        f'{args.rules:,} rules ...'
+    )
+    device_ids, group_ids = populate(
+        args.devices, args.groups, args.group_size, args.rules, rng
+    )
+    batches = [make_batch(device_ids, args.batch, rng) for _ in range(args.repeat)]
+
+    def key(triggers):
+        return sorted((t.rule_id, t.device_id, t.value) for t in triggers)
+
+    slow, fast = naive_path(), index_path()
+    summarize('load rule index', timed(rule_index.rebuild, args.repeat))
+    if key(slow(batches[0])) != key(fast(batches[0])):
+        raise SystemExit('The rule index produced different triggers')
+    print(f'{len(fast(batches[0])):,} triggers per batch of {args.batch:,} readings')
+
+    def run_all(path):
+        pending = iter(batches)
+        return lambda: path(next(pending))
+
+    summarize('every rule per reading', timed(run_all(slow), args.repeat))
+    rule_index.clear()
+    rule_index.rebuild()
+    summarize('rule index, cold plans', timed(run_all(fast), args.repeat))
+    summarize('rule index, warm plans', timed(run_all(fast), args.repeat))
+
+    rule = AlertRule.objects.filter(device_group__isnull=False).first()
+    group = DeviceGroup.objects.get(pk=rng.choice(group_ids))
+    device_id = iter(device_ids)
+
+    def save_rule():
+        rule.threshold = rng.uniform(0, 100)
+        rule.save()
+
+    summarize('save a group rule', timed(save_rule, args.repeat))
+    summarize(
+        'add a device to a group',
+        timed(lambda: group.devices.add(next(device_id)), args.repeat),
+    )
+
+
+if __name__ == '__main__':
+    main()
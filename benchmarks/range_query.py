@@ -0,0 +1,133 @@
+"""
+Range-query latency of GET /devices/<pk>/data over a large DeviceData table.
+
+    python -m benchmarks.range_query --rows 10000000 --devices 100
+
+Fills a scratch SQLite database (see benchmarks/settings.py) and times the
+queryset built by DeviceDataListCreateAPIView.get_queryset for random
+ten-minute windows, first with the single-column device index the table
+used to have and then with the (device, created_at) index.
+"""
+
+import argparse
+import random
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+
+from .utils import reset_database, setup_django, summarize, timed
+
+START = datetime(2025, 1, 1, tzinfo=UTC)
+INSERT_CHUNK = 100_000
+INSERT_SQL = (
+    'INSERT INTO device_devicedata (device_id, data, created_at, value, unit, metric) '
+    'VALUES (?, ?, ?, ?, ?, ?)'
+)
+
+
+def populate(rows, devices):
+    from django.db import connection, transaction
+
+    from account.models import User
+    from device.models import Device, parse_reading
+
+    owner = User.objects.create_user(email='bench@example.com', password='bench')
+    device_ids = [
+        Device.objects.create(
+            name=f'bench_{n}',
+            device_type=Device.DeviceType.SENSOR,
+            serial_number=f'B{n}',
+            owner=owner,
+        ).pk
+        for n in range(devices)
+    ]
+
+    # Readings arrive one per second per device, interleaved across devices
+    def generate():
+        for n in range(rows):
+            created_at = START + timedelta(seconds=n // devices)
+            data = f'{n % 1000 / 10:.1f}'
+            yield (
+                device_ids[n % devices],
+                data,
+                created_at.isoformat(' ')[:19],
+                *parse_reading(data),
+            )
+
+    raw = connection.cursor().connection
+    with transaction.atomic():
+        raw.execute('DROP INDEX devicedata_device_time_idx')
+        batch = []
+        for row in generate():
+            batch.append(row)
+            if len(batch) >= INSERT_CHUNK:
+                raw.executemany(INSERT_SQL, batch)
+                batch = []
+        if batch:
+            raw.executemany(INSERT_SQL, batch)
+    return owner, device_ids
+
+
+def make_query(owner, device_ids, span, window):
+    from device.views import DeviceDataListCreateAPIView
+
+    def run():
+        begin = START + timedelta(seconds=random.randrange(max(1, span - window)))
+        end = begin + timedelta(seconds=window)
+        view = DeviceDataListCreateAPIView()
+        view.kwargs = {'pk': random.choice(device_ids)}
+        view.request = SimpleNamespace(
+            user=owner,
+            GET={'start': begin.isoformat(), 'end': end.isoformat()},
+        )
+        return list(view.get_queryset().values_list('id', 'data', 'created_at'))
+
+    return run
+
+
+def explain(owner, device_ids):
+    from device.views import DeviceDataListCreateAPIView
+
+    view = DeviceDataListCreateAPIView()
+    view.kwargs = {'pk': device_ids[0]}
+    view.request = SimpleNamespace(
+        user=owner, GET={'start': START.isoformat(), 'end': START.isoformat()}
+    )
+    return view.get_queryset().explain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--window', type=int, default=600, help='seconds')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    reset_database()
+    print(f'Populating {args.rows:,} rows over {args.devices} devices ...')
+    owner, device_ids = populate(args.rows, args.devices)
+    span = args.rows // args.devices
+
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE INDEX bench_device_idx ON device_devicedata (device_id)')
+        cursor.execute('ANALYZE')
+    query = make_query(owner, device_ids, span, args.window)
+    print(explain(owner, device_ids))
+    summarize('device index only', timed(query, args.repeat))
+
+    with connection.cursor() as cursor:
+        cursor.execute('DROP INDEX bench_device_idx')
+        cursor.execute(
+            'CREATE INDEX devicedata_device_time_idx '
+            'ON device_devicedata (device_id, created_at)'
+        )
+        cursor.execute('ANALYZE')
+    print(explain(owner, device_ids))
+    summarize('(device, created_at) index', timed(query, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
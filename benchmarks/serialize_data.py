@@ -0,0 +1,108 @@
+"""
+Serialization cost of a DeviceData listing: DeviceDataSerializer and
+JSONRenderer against the value-tuple fast path.
+
+    python -m benchmarks.serialize_data --rows 100000
+
+Fills a scratch SQLite database (see benchmarks/settings.py) with readings of
+one device and times turning all of them into the JSON body of
+GET /devices/<pk>/data, query included, both ways. The two bodies are checked
+to be identical first.
+"""
+
+import argparse
+from datetime import UTC, datetime, timedelta
+
+from .utils import reset_database, setup_django, summarize, timed
+
+START = datetime(2025, 1, 1, tzinfo=UTC)
+INSERT_CHUNK = 100_000
+INSERT_SQL = (
+    'INSERT INTO device_devicedata (device_id, data, created_at, value, unit, metric) '
+    "VALUES (?, ?, ?, ?, 'C', '')"
+)
+
+
+def populate(rows):
+    from django.db import connection, transaction
+
+    from account.models import User
+    from device.models import Device
+
+    owner = User.objects.create_user(email='bench@example.com', password='bench')
+    device = Device.objects.create(
+        name='bench',
+        device_type=Device.DeviceType.SENSOR,
+        serial_number='B0',
+        owner=owner,
+    )
+    raw = connection.cursor().connection
+    with transaction.atomic():
+        batch = []
+        for n in range(rows):
+            value = n % 1000 / 10
+            created_at = START + timedelta(seconds=n, microseconds=n % 1000)
+            batch.append(
+                (device.pk, f'{value:.1f} C', created_at.isoformat(' ')[:26], value)
+            )
+            if len(batch) >= INSERT_CHUNK:
+                raw.executemany(INSERT_SQL, batch)
+                batch = []
+        if batch:
+            raw.executemany(INSERT_SQL, batch)
+    return device
+
+
+def serializer_path(device):
+    from rest_framework.renderers import JSONRenderer
+
+    from device.models import DeviceData
+    from device.views import DeviceDataSerializer
+
+    def run():
+        rows = DeviceData.objects.filter(device=device).order_by('created_at', 'id')
+        data = DeviceDataSerializer(rows, many=True).data
+        return JSONRenderer().render({'results': data})
+
+    return run
+
+
+def fast_path(device):
+    from device.models import DeviceData
+    from device.renderers import DEVICE_DATA_COLUMNS, device_data_representation, dumps
+
+    def run():
+        rows = (
+            DeviceData.objects.filter(device=device)
+            .order_by('created_at', 'id')
+            .values_list(*DEVICE_DATA_COLUMNS, named=True)
+        )
+        return dumps({'results': device_data_representation(rows)})
+
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from device import renderers
+
+    reset_database()
+    print(f'Populating {args.rows:,} rows ...')
+    device = populate(args.rows)
+
+    slow, fast = serializer_path(device), fast_path(device)
+    body = slow()
+    if fast() != body:
+        raise SystemExit('The fast path produced a different body')
+    print(f'{len(body):,} bytes per body, orjson: {renderers.orjson is not None}')
+    summarize('DeviceDataSerializer + JSONRenderer', timed(slow, args.repeat))
+    summarize('values_list + dumps', timed(fast, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+"""
+Settings for the benchmark scripts: the app settings on a scratch database.
+
+The database file is taken from BENCH_DB and defaults to the temp directory,
+so benchmarks never touch db.sqlite3.
+"""
+
+import os
+import tempfile
+
+from app.settings import *
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            'BENCH_DB', os.path.join(tempfile.gettempdir(), 'iot_bench.sqlite3')
+        ),
+        'OPTIONS': DATABASES['default']['OPTIONS'],
+    }
+}
@@ -0,0 +1,47 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+
+import os
+import statistics
+import time
+
+
+def setup_django():
+    """Configure Django on the scratch benchmark database."""
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    import django
+
+    django.setup()
+
+
+def reset_database():
+    """Recreate the scratch database with every migration applied."""
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+
+    connection.close()
+    path = settings.DATABASES['default']['NAME']
+    if os.path.exists(path):
+        os.remove(path)
+    call_command('migrate', verbosity=0)
+
+
+def timed(func, repeat):
+    """Run ``func`` ``repeat`` times and return the latencies in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - begin) * 1000)
+    return samples
+
+
+def summarize(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(
+        f'{label:<40} mean {statistics.fmean(samples):9.3f} ms'
+        f'  p50 {statistics.median(samples):9.3f} ms  p95 {p95:9.3f} ms'
+    )
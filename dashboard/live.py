@@ -0,0 +1,177 @@
+"""
+Fan-out of new readings and device status changes to live dashboard clients.
+
+Clients of the live feed (see dashboard/views.py) subscribe to a set of
+devices. The receivers below publish from whichever thread ingests readings
+or changes a device: the hub looks up the subscribers of each device and
+hands their events to the event loop the subscribers wait on, with one
+call_soon_threadsafe() per loop and batch, so a batch costs O(readings +
+subscribers reached) and nothing at all while nobody is subscribed.
+
+Every subscriber holds its own bounded queue. When a slow client lets more
+than QUEUE_SIZE readings pile up, the oldest are dropped and the client is
+told how many; status changes are coalesced to the newest per device and are
+never dropped. The hub is per process: a client sees the readings ingested
+by the process that serves its feed.
+"""
+
+import asyncio
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from device.models import Device
+from device.renderers import device_data_representation
+from device.signals import data_ingested, device_status_changed
+
+LIVE_DEFAULTS = {
+    'ENABLED': True,
+    'QUEUE_SIZE': 1000,
+    'KEEPALIVE': 15.0,
+    'MAX_DEVICES': 1000,
+}
+
+
+def get_live_settings():
+    return {
+        **LIVE_DEFAULTS,
+        **getattr(settings, 'DASHBOARD_LIVE', {}),
+    }
+
+
+class Subscriber:
+    """
+    Events waiting for one client, filled by the hub on the event loop the
+    subscriber was created on and drained by get().
+    """
+
+    def __init__(self, device_ids, queue_size):
+        self.device_ids = frozenset(device_ids)
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+        self._readings = deque(maxlen=queue_size)
+        self._statuses = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, readings, statuses):
+        for reading in readings:
+            if len(self._readings) == self._readings.maxlen:
+                self.dropped += 1
+            self._readings.append(reading)
+        self._statuses.update(statuses)
+        self._ready.set()
+
+    async def get(self, timeout):
+        """
+        Wait up to ``timeout`` seconds for events and return them as
+        (readings, {device id: status}, number of readings dropped).
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except TimeoutError:
+            return [], {}, 0
+        self._ready.clear()
+        readings = list(self._readings)
+        self._readings.clear()
+        statuses, self._statuses = self._statuses, {}
+        dropped, self.dropped = self.dropped, 0
+        return readings, statuses, dropped
+
+
+def deliver(items):
+    for subscriber, readings, statuses in items:
+        subscriber.offer(readings, statuses)
+
+
+class LiveHub:
+    """Subscribers by device id, and the last status published per device."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._statuses = {}
+        self._lock = threading.Lock()
+
+    @property
+    def subscribed(self):
+        return bool(self._subscribers)
+
+    def watches(self, device_id):
+        return device_id in self._subscribers
+
+    def subscribe(self, statuses):
+        """
+        Subscribe the running event loop to the devices of ``statuses``, a
+        dict of their current status; return the Subscriber.
+        """
+        subscriber = Subscriber(statuses, get_live_settings()['QUEUE_SIZE'])
+        with self._lock:
+            for device_id, status in statuses.items():
+                self._subscribers.setdefault(device_id, set()).add(subscriber)
+                self._statuses.setdefault(device_id, status)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            for device_id in subscriber.device_ids:
+                subscribers = self._subscribers.get(device_id)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[device_id]
+                    self._statuses.pop(device_id, None)
+
+    def publish(self, readings=(), statuses=None):
+        """
+        Hand ``readings``, as represented by the data endpoints, and
+        ``statuses``, {device id: status}, to their subscribers. Statuses a
+        device already had are skipped. Safe to call from any thread.
+        """
+        deliveries = {}
+        with self._lock:
+            for reading in readings:
+                for subscriber in self._subscribers.get(reading['device'], ()):
+                    deliveries.setdefault(subscriber, ([], {}))[0].append(reading)
+            for device_id, status in (statuses or {}).items():
+                subscribers = self._subscribers.get(device_id)
+                if not subscribers or self._statuses.get(device_id) == status:
+                    continue
+                self._statuses[device_id] = status
+                for subscriber in subscribers:
+                    deliveries.setdefault(subscriber, ([], {}))[1][device_id] = status
+        by_loop = {}
+        for subscriber, (sent, changed) in deliveries.items():
+            by_loop.setdefault(subscriber.loop, []).append((subscriber, sent, changed))
+        for loop, items in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver, items)
+            except RuntimeError:
+                # The loop was closed; its subscribers are gone
+                pass
+
+
+hub = LiveHub()
+
+
+@receiver(data_ingested)
+def push_readings(sender, readings, **kwargs):
+    if not hub.subscribed:
+        return
+    watched = [reading for reading in readings if hub.watches(reading.device_id)]
+    if watched:
+        hub.publish(readings=device_data_representation(watched))
+
+
+@receiver(device_status_changed)
+def push_status_changes(sender, device_ids, status, **kwargs):
+    if hub.subscribed:
+        hub.publish(statuses=dict.fromkeys(device_ids, status))
+
+
+@receiver(post_save, sender=Device)
+def push_device_status(sender, instance, **kwargs):
+    if hub.subscribed:
+        hub.publish(statuses={instance.pk: instance.status})
@@ -0,0 +1,397 @@
+"""
+Per-user summary shown on the dashboard landing page.
+
+A summary counts the devices of a user by status and by type, their readings
+of the last hour, the alerts firing on them and the size of each of their
+groups. It is built from the database on first read (see
+DashboardSummary.build()) and then kept current by the receivers below as
+devices, readings, group memberships and alerts change in this process, so
+reading it costs a cache lookup whatever the size of the fleet.
+
+Readings are counted per minute of their created_at, so "the last hour" is
+the current minute and the 59 before it. Summaries are rebuilt REFRESH
+seconds after they were built, which is how changes made by other processes
+(or written without the signals, e.g. with QuerySet.update()) show up.
+"""
+
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.functions import TruncMinute
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from alert_rule.alerts import alerts
+from alert_rule.signals import firing_changed
+from device.cache import MISSING, LRUCache
+from device.models import Device, DeviceData
+from device.rollups import epoch_to_datetime
+from device.signals import data_ingested, device_status_changed
+from device_group.models import DeviceGroup
+
+SUMMARY_DEFAULTS = {
+    'MAX_USERS': 1000,
+    'REFRESH': 300.0,
+}
+
+# Minutes of readings counted by readings_last_hour
+WINDOW_MINUTES = 60
+
+
+def get_summary_settings():
+    return {
+        **SUMMARY_DEFAULTS,
+        **getattr(settings, 'DASHBOARD_SUMMARY', {}),
+    }
+
+
+def minute_of(moment):
+    return int(moment.timestamp()) // 60
+
+
+class DashboardSummary:
+    """
+    What the landing page shows for one user, with what it takes to update
+    it: the (status, type) of every device, the members of every group, the
+    number of firing alerts per device and readings per minute.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.devices = {}
+        self.statuses = Counter()
+        self.types = Counter()
+        self.groups = {}
+        self.firing = {}
+        self.active_alerts = 0
+        self.minutes = Counter()
+        self._snapshot = None
+
+    @classmethod
+    def build(cls, user_id, now=None):
+        """Return the summary of ``user_id`` as stored in the database."""
+        now = now or timezone.now()
+        summary = cls(user_id)
+        for pk, status, device_type in Device.objects.filter(
+            owner_id=user_id
+        ).values_list('pk', 'status', 'device_type'):
+            summary.add_device(pk, status, device_type)
+        for pk, name in DeviceGroup.objects.filter(owner_id=user_id).values_list(
+            'pk', 'name'
+        ):
+            summary.groups[pk] = [name, set()]
+        for group_id, device_id in DeviceGroup.devices.through.objects.filter(
+            devicegroup__owner_id=user_id
+        ).values_list('devicegroup_id', 'device_id'):
+            if group_id in summary.groups:
+                summary.groups[group_id][1].add(device_id)
+        for device_id in summary.devices:
+            summary.set_firing(device_id, len(alerts.firing(device_id)))
+        since = epoch_to_datetime((minute_of(now) - WINDOW_MINUTES + 1) * 60)
+        for minute, count in (
+            DeviceData.objects.filter(device__owner_id=user_id, created_at__gte=since)
+            .annotate(minute=TruncMinute('created_at'))
+            .values('minute')
+            .annotate(count=Count('id'))
+            .values_list('minute', 'count')
+        ):
+            summary.minutes[minute_of(minute)] += count
+        return summary
+
+    def _uncount(self, pk):
+        entry = self.devices.pop(pk, None)
+        if entry is not None:
+            self.statuses[entry[0]] -= 1
+            self.types[entry[1]] -= 1
+        self._snapshot = None
+
+    def add_device(self, pk, status, device_type):
+        """Add device ``pk``, or update its status and type."""
+        self._uncount(pk)
+        self.devices[pk] = (status, device_type)
+        self.statuses[status] += 1
+        self.types[device_type] += 1
+
+    def remove_device(self, pk):
+        self._uncount(pk)
+        self.set_firing(pk, 0)
+
+    def set_status(self, pk, status, only_from):
+        """Set the status of ``pk`` if it is currently ``only_from``."""
+        entry = self.devices.get(pk)
+        if entry is not None and entry[0] == only_from:
+            self.add_device(pk, status, entry[1])
+
+    def set_firing(self, device_id, count):
+        self.active_alerts += count - self.firing.pop(device_id, 0)
+        if count:
+            self.firing[device_id] = count
+        self._snapshot = None
+
+    def save_group(self, pk, name, members):
+        self.groups[pk] = [name, members]
+        self._snapshot = None
+
+    def remove_group(self, pk):
+        """Forget group ``pk``; return its members."""
+        self._snapshot = None
+        return self.groups.pop(pk, [None, set()])[1]
+
+    def change_members(self, pk, device_ids, added):
+        """Add ``device_ids`` to group ``pk``, remove them, or all if None."""
+        if pk not in self.groups:
+            return
+        members = self.groups[pk][1]
+        if device_ids is None:
+            members.clear()
+        elif added:
+            members.update(device_ids)
+        else:
+            members.difference_update(device_ids)
+        self._snapshot = None
+
+    def leave_groups(self, device_id):
+        for _, members in self.groups.values():
+            members.discard(device_id)
+        self._snapshot = None
+
+    def add_readings(self, minutes, now):
+        start = minute_of(now) - WINDOW_MINUTES + 1
+        for minute, count in minutes.items():
+            if minute >= start:
+                self.minutes[minute] += count
+        for minute in [minute for minute in self.minutes if minute < start]:
+            del self.minutes[minute]
+
+    def readings_last_hour(self, now):
+        start = minute_of(now) - WINDOW_MINUTES + 1
+        return sum(count for minute, count in self.minutes.items() if minute >= start)
+
+    def as_dict(self, now=None):
+        now = now or timezone.now()
+        if self._snapshot is None:
+            self._snapshot = {
+                'devices': len(self.devices),
+                'by_status': {
+                    status: self.statuses[status]
+                    for status in Device.DeviceStatus.values
+                },
+                'by_type': {
+                    device_type: self.types[device_type]
+                    for device_type in Device.DeviceType.values
+                },
+                'active_alerts': self.active_alerts,
+                'groups': [
+                    {'id': pk, 'name': name, 'devices': len(members)}
+                    for pk, (name, members) in sorted(self.groups.items())
+                ],
+            }
+        return {**self._snapshot, 'readings_last_hour': self.readings_last_hour(now)}
+
+
+class SummaryStore:
+    """
+    DashboardSummary per user id, for the MAX_USERS users read most recently,
+    each kept for REFRESH seconds. Only summaries already built are updated;
+    the others are built on their next read.
+    """
+
+    def __init__(self):
+        self._summaries = None
+        # Owner of every device and group of the summaries built so far
+        self._device_owners = {}
+        self._group_owners = {}
+        self._lock = threading.Lock()
+
+    @property
+    def summaries(self):
+        if self._summaries is None:
+            config = get_summary_settings()
+            self._summaries = LRUCache(config['MAX_USERS'], ttl=config['REFRESH'])
+        return self._summaries
+
+    def clear(self):
+        """Forget every summary; the settings are read again on next use."""
+        with self._lock:
+            if self._summaries is not None:
+                self._summaries.clear()
+            self._summaries = None
+            self._device_owners = {}
+            self._group_owners = {}
+
+    def get(self, user_id, now=None):
+        """Return the summary of ``user_id`` as a dict, building it if needed."""
+        summary = self.summaries.get(user_id)
+        if summary is MISSING:
+            summary = self.rebuild(user_id, now)
+        with self._lock:
+            return summary.as_dict(now)
+
+    def rebuild(self, user_id, now=None):
+        """Build the summary of ``user_id`` from the database and keep it."""
+        summary = DashboardSummary.build(user_id, now)
+        with self._lock:
+            self._device_owners.update(dict.fromkeys(summary.devices, user_id))
+            self._group_owners.update(dict.fromkeys(summary.groups, user_id))
+            self.summaries.set(user_id, summary)
+        return summary
+
+    def _summary(self, owners, pk):
+        """Return the built summary that ``pk`` belongs to, or None."""
+        user_id = owners.get(pk)
+        if user_id is None:
+            return None
+        summary = self.summaries.get(user_id)
+        if summary is MISSING:
+            # Evicted or expired
+            owners.pop(pk, None)
+            return None
+        return summary
+
+    def device_saved(self, device):
+        with self._lock:
+            current = self._summary(self._device_owners, device.pk)
+            moved = current is not None and current.user_id != device.owner_id
+            if moved:
+                current.remove_device(device.pk)
+            summary = self.summaries.get(device.owner_id)
+            if summary is MISSING:
+                self._device_owners.pop(device.pk, None)
+                return
+            summary.add_device(device.pk, device.status, device.device_type)
+            if moved:
+                summary.set_firing(device.pk, len(alerts.firing(device.pk)))
+            self._device_owners[device.pk] = device.owner_id
+
+    def device_deleted(self, device_id):
+        with self._lock:
+            summary = self._summary(self._device_owners, device_id)
+            self._device_owners.pop(device_id, None)
+            if summary is None:
+                return
+            summary.remove_device(device_id)
+            # Its memberships went with it, without m2m_changed
+            summary.leave_groups(device_id)
+
+    def statuses_changed(self, device_ids, status):
+        # Heartbeats only revive offline devices, and the sweeper only sets
+        # online devices offline
+        only_from = (
+            Device.DeviceStatus.OFFLINE
+            if status == Device.DeviceStatus.ONLINE
+            else Device.DeviceStatus.ONLINE
+        )
+        with self._lock:
+            for device_id in device_ids:
+                summary = self._summary(self._device_owners, device_id)
+                if summary is not None:
+                    summary.set_status(device_id, status, only_from)
+
+    def readings_added(self, readings, now=None):
+        now = now or timezone.now()
+        with self._lock:
+            minutes = {}
+            for reading in readings:
+                summary = self._summary(self._device_owners, reading.device_id)
+                if summary is not None:
+                    counts = minutes.setdefault(summary, Counter())
+                    counts[minute_of(reading.created_at)] += 1
+            for summary, counts in minutes.items():
+                summary.add_readings(counts, now)
+
+    def firing_changed(self, device_ids):
+        with self._lock:
+            for device_id in device_ids:
+                summary = self._summary(self._device_owners, device_id)
+                if summary is not None:
+                    summary.set_firing(device_id, len(alerts.firing(device_id)))
+
+    def group_saved(self, group):
+        with self._lock:
+            current = self._summary(self._group_owners, group.pk)
+            members = set()
+            if current is not None:
+                members = current.remove_group(group.pk)
+            summary = self.summaries.get(group.owner_id)
+            if summary is MISSING:
+                self._group_owners.pop(group.pk, None)
+                return
+            summary.save_group(group.pk, group.name, members)
+            self._group_owners[group.pk] = group.owner_id
+
+    def group_deleted(self, group_id):
+        with self._lock:
+            summary = self._summary(self._group_owners, group_id)
+            self._group_owners.pop(group_id, None)
+            if summary is not None:
+                summary.remove_group(group_id)
+
+    def members_changed(self, group_id, device_ids, added):
+        with self._lock:
+            summary = self._summary(self._group_owners, group_id)
+            if summary is not None:
+                summary.change_members(group_id, device_ids, added)
+
+    def device_left_groups(self, device_id):
+        with self._lock:
+            summary = self._summary(self._device_owners, device_id)
+            if summary is not None:
+                summary.leave_groups(device_id)
+
+
+summaries = SummaryStore()
+
+
+@receiver(post_save, sender=Device)
+def summarize_device(sender, instance, **kwargs):
+    summaries.device_saved(instance)
+
+
+@receiver(post_delete, sender=Device)
+def summarize_deleted_device(sender, instance, **kwargs):
+    summaries.device_deleted(instance.pk)
+
+
+@receiver(device_status_changed)
+def summarize_statuses(sender, device_ids, status, **kwargs):
+    summaries.statuses_changed(device_ids, status)
+
+
+@receiver(data_ingested)
+def summarize_readings(sender, readings, **kwargs):
+    summaries.readings_added(readings)
+
+
+@receiver(firing_changed)
+def summarize_alerts(sender, device_ids, **kwargs):
+    summaries.firing_changed(device_ids)
+
+
+@receiver(post_save, sender=DeviceGroup)
+def summarize_group(sender, instance, **kwargs):
+    summaries.group_saved(instance)
+
+
+@receiver(post_delete, sender=DeviceGroup)
+def summarize_deleted_group(sender, instance, **kwargs):
+    summaries.group_deleted(instance.pk)
+
+
+@receiver(m2m_changed, sender=DeviceGroup.devices.through)
+def summarize_group_members(sender, instance, action, reverse, pk_set, **kwargs):
+    """Follow DeviceGroup.devices, changed from either side."""
+    if action == 'post_clear':
+        if reverse:
+            summaries.device_left_groups(instance.pk)
+        else:
+            summaries.members_changed(instance.pk, None, added=False)
+    elif action in ('post_add', 'post_remove'):
+        added = action == 'post_add'
+        if reverse:
+            for group_id in pk_set:
+                summaries.members_changed(group_id, [instance.pk], added)
+        else:
+            summaries.members_changed(instance.pk, pk_set, added)
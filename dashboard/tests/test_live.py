@@ -0,0 +1,221 @@
+"""
+Tests for the live dashboard feed.
+"""
+
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from device.heartbeat import heartbeats
+from device.ingest import write_readings
+from device.models import Device, DeviceData
+from device.tests.factories import DeviceFactory
+from device_group.tests.factories import DeviceGroupFactory
+
+from ..live import LiveHub, hub
+
+ONLINE = Device.DeviceStatus.ONLINE
+OFFLINE = Device.DeviceStatus.OFFLINE
+ERROR = Device.DeviceStatus.ERROR
+
+
+def reading(pk, device_id):
+    return {'id': pk, 'device': device_id, 'data': str(pk), 'created_at': None}
+
+
+class LiveHubTests(SimpleTestCase):
+    """Tests for the fan-out of LiveHub."""
+
+    def run_async(self, coroutine):
+        return asyncio.run(asyncio.wait_for(coroutine, 5))
+
+    def test_readings_reach_the_subscribers_of_their_device(self):
+        async def scenario():
+            live = LiveHub()
+            first = live.subscribe({1: ONLINE, 2: ONLINE})
+            second = live.subscribe({2: ONLINE})
+            live.publish(readings=[reading(10, 1), reading(11, 2), reading(12, 3)])
+            first_events = await first.get(1)
+            second_events = await second.get(1)
+            live.unsubscribe(first)
+            live.unsubscribe(second)
+            return first_events, second_events, live.subscribed
+
+        first, second, subscribed = self.run_async(scenario())
+
+        self.assertListEqual([item['id'] for item in first[0]], [10, 11])
+        self.assertListEqual([item['id'] for item in second[0]], [11])
+        self.assertFalse(subscribed)
+
+    def test_published_from_other_threads(self):
+        async def scenario():
+            live = LiveHub()
+            subscriber = live.subscribe({1: ONLINE})
+            threads = [
+                threading.Thread(
+                    target=live.publish, kwargs={'readings': [reading(n, 1)]}
+                )
+                for n in range(20)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            received = []
+            while len(received) < 20:
+                readings, _, _ = await subscriber.get(1)
+                received += readings
+            return received
+
+        self.assertEqual(len(self.run_async(scenario())), 20)
+
+    @override_settings(DASHBOARD_LIVE={'QUEUE_SIZE': 3})
+    def test_slow_subscribers_drop_the_oldest_readings(self):
+        async def scenario():
+            live = LiveHub()
+            subscriber = live.subscribe({1: ONLINE})
+            for n in range(10):
+                live.publish(readings=[reading(n, 1)])
+            # Delivered on the next iterations of the loop
+            await asyncio.sleep(0)
+            return await subscriber.get(1)
+
+        readings, _, dropped = self.run_async(scenario())
+
+        self.assertListEqual([item['id'] for item in readings], [7, 8, 9])
+        self.assertEqual(dropped, 7)
+
+    def test_status_changes_are_coalesced(self):
+        async def scenario():
+            live = LiveHub()
+            subscriber = live.subscribe({1: ONLINE, 2: ONLINE})
+            live.publish(statuses={1: ONLINE, 2: OFFLINE})
+            live.publish(statuses={2: ONLINE})
+            live.publish(statuses={2: OFFLINE, 1: ONLINE})
+            await asyncio.sleep(0)
+            _, statuses, _ = await subscriber.get(1)
+            idle = await subscriber.get(0.01)
+            return statuses, idle
+
+        statuses, idle = self.run_async(scenario())
+
+        # Device 1 never changed; device 2 ends up offline
+        self.assertDictEqual(statuses, {2: OFFLINE})
+        self.assertEqual(idle, ([], {}, 0))
+
+
+class LiveFeedTests(TestCase):
+    """Tests for GET /live."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = DeviceFactory()
+        cls.grouped = DeviceFactory(owner=cls.device.owner)
+        cls.group = DeviceGroupFactory(owner=cls.device.owner, devices=[cls.grouped])
+        cls.other_device = DeviceFactory()
+
+    def setUp(self):
+        self.url = reverse('live')
+
+    def test_needs_asgi(self):
+        """
+        GET /live return 501 when served over WSGI.
+        """
+        self.client.force_login(self.device.owner)
+        response = self.client.get(self.url, {'devices': self.device.pk})
+        self.assertEqual(response.status_code, 501)
+
+    async def test_invalid_requests(self):
+        """
+        GET /live return 401 if anon, 400 for bad ids and 404 for devices or
+        groups of other users.
+        """
+        response = await self.async_client.get(self.url, {'devices': '1'})
+        self.assertEqual(response.status_code, 401)
+
+        await self.async_client.aforce_login(self.device.owner)
+        for params, code in [
+            ({}, 400),
+            ({'devices': 'a,b'}, 400),
+            ({'devices': '0'}, 400),
+            ({'devices': self.other_device.pk}, 404),
+            ({'groups': 999999}, 404),
+        ]:
+            response = await self.async_client.get(self.url, params)
+            self.assertEqual(response.status_code, code, params)
+
+    async def test_heartbeats_of_errored_devices_are_not_pushed(self):
+        """
+        A device in ERROR that sends a heartbeat stays in ERROR, so no
+        "online" status is pushed for it.
+        """
+        device = await sync_to_async(DeviceFactory)(status=ERROR)
+        subscriber = hub.subscribe({device.pk: ERROR})
+        self.addCleanup(hub.unsubscribe, subscriber)
+
+        await sync_to_async(heartbeats.record)(device.pk, timezone.now())
+
+        self.assertEqual(await subscriber.get(0.05), ([], {}, 0))
+
+    async def test_pushes_readings_and_status_changes(self):
+        """
+        GET /live return 200 + the statuses of the devices, then a readings
+        event per ingested batch and a status event per change.
+        """
+        await self.async_client.aforce_login(self.device.owner)
+        response = await self.async_client.get(
+            self.url, {'devices': self.device.pk, 'groups': self.group.pk}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+
+        async def next_event():
+            chunk = await asyncio.wait_for(anext(events), 5)
+            name, data = chunk.decode().strip().split('\n')
+            return name.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+        self.assertEqual(
+            await next_event(),
+            (
+                'status',
+                [
+                    {'device': self.device.pk, 'status': ONLINE},
+                    {'device': self.grouped.pk, 'status': ONLINE},
+                ],
+            ),
+        )
+
+        await sync_to_async(write_readings)(
+            [
+                DeviceData(device=self.device, data='21.5'),
+                DeviceData(device=self.other_device, data='1'),
+                DeviceData(device=self.grouped, data='40'),
+            ]
+        )
+        name, readings = await next_event()
+        self.assertEqual(name, 'readings')
+        self.assertListEqual(
+            [(item['device'], item['data']) for item in readings],
+            [(self.device.pk, '21.5'), (self.grouped.pk, '40')],
+        )
+
+        self.device.status = OFFLINE
+        await self.device.asave()
+        self.assertEqual(
+            await next_event(),
+            ('status', [{'device': self.device.pk, 'status': OFFLINE}]),
+        )
+
+        # The server cancels the response task when the client goes away
+        waiting = asyncio.ensure_future(next_event())
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertFalse(hub.subscribed)
@@ -0,0 +1,218 @@
+"""
+Tests for the per-user dashboard summary.
+"""
+
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from alert_rule.evaluator import evaluator
+from alert_rule.tests.factories import AlertRuleFactory
+from device.ingest import write_readings
+from device.liveness import sweeper
+from device.models import Device, DeviceData
+from device.tests.factories import DeviceFactory
+from device_group.tests.factories import DeviceGroupFactory
+
+from ..summary import DashboardSummary, summaries
+
+ONLINE = Device.DeviceStatus.ONLINE
+OFFLINE = Device.DeviceStatus.OFFLINE
+ERROR = Device.DeviceStatus.ERROR
+
+
+class SummaryTests(TestCase):
+    """Tests for the summaries kept by SummaryStore."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = DeviceFactory()
+        cls.user = cls.device.owner
+        cls.actuator = DeviceFactory(
+            owner=cls.user, device_type=Device.DeviceType.ACTUATOR, status=OFFLINE
+        )
+        cls.group = DeviceGroupFactory(owner=cls.user, devices=[cls.device])
+        cls.other_device = DeviceFactory()
+
+    def setUp(self):
+        summaries.clear()
+        self.addCleanup(summaries.clear)
+        evaluator.clear()
+        self.addCleanup(evaluator.clear)
+        patcher = patch('alert_rule.alerts.send_digest', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, device, count=1, at=None):
+        write_readings(
+            [
+                DeviceData(device=device, data='40', created_at=at or timezone.now())
+                for _ in range(count)
+            ]
+        )
+
+    def assertCurrent(self):
+        """The kept summary matches one built from the database."""
+        self.assertDictEqual(
+            summaries.get(self.user.pk),
+            DashboardSummary.build(self.user.pk).as_dict(),
+        )
+
+    def test_built_on_first_read(self):
+        self.write(self.device, 3)
+        self.write(self.device, at=timezone.now() - timedelta(hours=2))
+        self.write(self.other_device)
+
+        self.assertDictEqual(
+            summaries.get(self.user.pk),
+            {
+                'devices': 2,
+                'by_status': {ONLINE: 1, OFFLINE: 1, ERROR: 0},
+                'by_type': {'sensor': 1, 'actuator': 1},
+                'active_alerts': 0,
+                'groups': [
+                    {'id': self.group.pk, 'name': self.group.name, 'devices': 1}
+                ],
+                'readings_last_hour': 3,
+            },
+        )
+
+    def test_read_without_queries(self):
+        summaries.get(self.user.pk)
+        with self.assertNumQueries(0):
+            summaries.get(self.user.pk)
+
+    def test_follows_devices(self):
+        summaries.get(self.user.pk)
+        added = DeviceFactory(owner=self.user)
+        added.status = ERROR
+        added.save()
+        self.actuator.delete()
+        self.other_device.owner = self.user
+        self.other_device.save()
+        self.assertEqual(summaries.get(self.user.pk)['devices'], 3)
+        self.assertCurrent()
+
+    def test_follows_status_changes(self):
+        summaries.get(self.user.pk)
+        # Revived by its readings
+        self.write(self.actuator)
+        self.assertEqual(summaries.get(self.user.pk)['by_status'][OFFLINE], 0)
+        self.assertCurrent()
+
+        Device.objects.filter(pk=self.device.pk).update(
+            last_seen=timezone.now() - timedelta(hours=1)
+        )
+        sweeper.schedule(self.device.pk, timezone.now() - timedelta(hours=1), 60)
+        sweeper.run_once()
+        self.assertEqual(summaries.get(self.user.pk)['by_status'][OFFLINE], 1)
+        self.assertCurrent()
+
+    def test_follows_groups(self):
+        summaries.get(self.user.pk)
+        group = DeviceGroupFactory(owner=self.user, devices=[self.device])
+        group.devices.add(self.actuator)
+        self.actuator.device_groups.add(self.group)
+        self.device.device_groups.remove(group)
+        self.group.name = 'renamed'
+        self.group.save()
+        self.assertListEqual(
+            summaries.get(self.user.pk)['groups'],
+            [
+                {'id': self.group.pk, 'name': 'renamed', 'devices': 2},
+                {'id': group.pk, 'name': group.name, 'devices': 1},
+            ],
+        )
+        self.assertCurrent()
+
+        self.device.device_groups.clear()
+        group.devices.clear()
+        self.actuator.delete()
+        self.assertCurrent()
+        group.delete()
+        self.assertCurrent()
+
+    def test_follows_alerts(self):
+        rule = AlertRuleFactory(owner=self.user, device=self.device, cooldown=0)
+        AlertRuleFactory(owner=self.user, device=self.actuator)
+        summaries.get(self.user.pk)
+        self.write(self.device)
+        self.write(self.actuator)
+        self.assertEqual(summaries.get(self.user.pk)['active_alerts'], 2)
+        self.assertCurrent()
+
+        write_readings([DeviceData(device=self.device, data='10')])
+        self.assertEqual(summaries.get(self.user.pk)['active_alerts'], 1)
+        self.write(self.device)
+        rule.delete()
+        self.assertEqual(summaries.get(self.user.pk)['active_alerts'], 1)
+        self.assertCurrent()
+
+    def test_readings_leave_the_window(self):
+        now = timezone.now()
+        summaries.get(self.user.pk, now=now)
+        self.write(self.device, 2, at=now - timedelta(minutes=30))
+        self.write(self.device, 1, at=now)
+        self.assertEqual(summaries.get(self.user.pk, now=now)['readings_last_hour'], 3)
+
+        later = now + timedelta(minutes=45)
+        self.assertEqual(
+            summaries.get(self.user.pk, now=later)['readings_last_hour'], 1
+        )
+
+    def test_rebuilt_after_refresh(self):
+        summaries.get(self.user.pk)
+        # Not seen by the signals
+        Device.objects.filter(pk=self.actuator.pk).update(owner=self.other_device.owner)
+        self.assertEqual(summaries.get(self.user.pk)['devices'], 2)
+
+        later = time.monotonic() + 301
+        with patch('device.cache.time.monotonic', return_value=later):
+            self.assertEqual(summaries.get(self.user.pk)['devices'], 1)
+
+
+class SummaryViewTests(TestCase):
+    """Tests for GET /summary."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = DeviceFactory()
+
+    def setUp(self):
+        summaries.clear()
+        self.addCleanup(summaries.clear)
+        self.url = reverse('summary')
+
+    def test_summary(self):
+        """
+        GET /summary return 200 + the summary of the user if auth; 401 if anon.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+        self.client.force_login(self.device.owner)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['devices'], 1)
+
+    def test_rebuild(self):
+        """
+        GET /summary?rebuild=true return 200 + the summary built again from
+        the database.
+        """
+        self.client.force_login(self.device.owner)
+        self.client.get(self.url)
+        DeviceFactory.create_batch(2, owner=self.device.owner)
+        Device.objects.filter(owner=self.device.owner).update(status=ERROR)
+
+        response = self.client.get(self.url, {'rebuild': 'true'})
+        self.assertEqual(response.json()['by_status'][ERROR], 3)
+
+    def test_home_shows_the_summary(self):
+        self.client.force_login(self.device.owner)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['summary']['devices'], 1)
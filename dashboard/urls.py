@@ -1,5 +1,9 @@
 from django.urls import path
 
-from .views import home
+from .views import home, live, summary
 
-urlpatterns = [path('', home, name='home')]
+urlpatterns = [
+    path('', home, name='home'),
+    path('live', live, name='live'),
+    path('summary', summary, name='summary'),
+]
@@ -1,8 +1,143 @@
+"""
+View functions in dashboard.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.urls import reverse
+
+from device.models import Device
+from device.renderers import dumps
+from device_group.models import DeviceGroup
+
+from .live import get_live_settings, hub
+from .summary import summaries
 
 
-# Create your views here.
 def home(request):
-    url = reverse('dashboard:home')
-    return render(request, url)
+    context = {'devices': [], 'summary': None}
+    if request.user.is_authenticated:
+        context['devices'] = Device.objects.filter(owner=request.user).order_by('pk')
+        context['summary'] = summaries.get(request.user.pk)
+    return render(request, 'dashboard/home.html', context)
+
+
+def summary(request):
+    """
+    GET /summary return 200 + the counts of the user's devices by status and
+        type, their readings of the last hour, their firing alerts and the
+        size of each of their groups if auth; 401 if anon. The summary is
+        kept up to date in memory; ?rebuild=true builds it again from the
+        database first.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication required.'}, status=401)
+    if request.GET.get('rebuild') in ('1', 'true'):
+        summaries.rebuild(request.user.pk)
+    return JsonResponse(summaries.get(request.user.pk))
+
+
+def parse_ids(value):
+    """Return the ids of a comma-separated list, or None if one is not an id."""
+    if not value:
+        return []
+    try:
+        ids = [int(item) for item in value.split(',')]
+    except ValueError:
+        return None
+    return ids if all(pk > 0 for pk in ids) else None
+
+
+def watched_devices(user, device_ids, group_ids):
+    """
+    Return the status of each device of ``device_ids`` and of the groups
+    ``group_ids``, or None if one of them is not owned by ``user``.
+    """
+    groups = DeviceGroup.objects.filter(owner=user, pk__in=group_ids)
+    if groups.count() != len(set(group_ids)):
+        return None
+    devices = Device.objects.filter(owner=user, pk__in=device_ids)
+    statuses = dict(devices.values_list('pk', 'status'))
+    if len(statuses) != len(set(device_ids)):
+        return None
+    statuses.update(
+        Device.objects.filter(device_groups__in=groups).values_list('pk', 'status')
+    )
+    return statuses
+
+
+def event(name, data):
+    return b'event: %s\ndata: %s\n\n' % (name.encode(), dumps(data))
+
+
+async def stream(statuses, keepalive):
+    subscriber = hub.subscribe(statuses)
+    try:
+        yield event(
+            'status',
+            [{'device': pk, 'status': status} for pk, status in statuses.items()],
+        )
+        while True:
+            readings, changed, dropped = await subscriber.get(keepalive)
+            if not (readings or changed or dropped):
+                # Keeps proxies from closing an idle connection
+                yield b': keepalive\n\n'
+                continue
+            if dropped:
+                yield event('dropped', {'readings': dropped})
+            if changed:
+                yield event(
+                    'status',
+                    [
+                        {'device': pk, 'status': status}
+                        for pk, status in changed.items()
+                    ],
+                )
+            if readings:
+                yield event('readings', readings)
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+async def live(request):
+    """
+    GET /live?devices=1,2&groups=3 return 200 + a stream of server-sent events
+        for the given devices and the devices of the given groups if auth;
+        400 if the ids are invalid or too many devices; 401 if anon; 404 if a
+        device or group is not owned by user; 501 unless served over ASGI.
+        A "status" event lists the status of every device first, then
+        "readings" events carry the readings of each ingested batch, "status"
+        events the devices that went online or offline, and "dropped" events
+        how many readings a slow client missed.
+    """
+    config = get_live_settings()
+    if not config['ENABLED'] or not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'The live feed needs ASGI.'}, status=501)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication required.'}, status=401)
+
+    device_ids = parse_ids(request.GET.get('devices'))
+    group_ids = parse_ids(request.GET.get('groups'))
+    if device_ids is None or group_ids is None or not (device_ids or group_ids):
+        return JsonResponse(
+            {'detail': 'Expected comma-separated ids in devices or groups.'},
+            status=400,
+        )
+    statuses = await sync_to_async(watched_devices)(user, device_ids, group_ids)
+    if statuses is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    if len(statuses) > config['MAX_DEVICES']:
+        return JsonResponse(
+            {'detail': f'At most {config["MAX_DEVICES"]} devices per feed.'},
+            status=400,
+        )
+
+    response = StreamingHttpResponse(
+        stream(statuses, config['KEEPALIVE']), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stops nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class DevicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'device'
+
+    def ready(self):
+        # Register background workers and signal receivers
+        from . import (  # noqa: F401
+            archive,
+            authentication,
+            heartbeat,
+            ingest,
+            latest,
+            liveness,
+            retention,
+        )
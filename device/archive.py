@@ -0,0 +1,406 @@
+"""
+Cold-tier archive of DeviceData in compressed columnar segment files.
+
+Readings older than DEVICE_DATA_ARCHIVE['AFTER_DAYS'] are moved out of the
+database into one segment file per device and UTC day,
+``<ROOT>/<device id>/<YYYY-MM-DD>.seg``. A segment is laid out as::
+
+    magic | header | block index | block | block | ...
+
+The header holds the block and row counts, and the block index the time range,
+offset and size of each block. Every block stores up to BLOCK_ROWS readings
+ordered by (created_at, id) as zlib-compressed columns: ids and timestamps
+(microseconds since the epoch) as delta-encoded int64 arrays, values as a
+float64 array (NaN when not numeric) and the raw data strings. Segments are
+memory-mapped and only the blocks overlapping a requested range are
+decompressed.
+"""
+
+import heapq
+import math
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_left
+from datetime import UTC, date, datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .conditional import bump_data_version
+from .models import Device, DeviceData, parse_reading
+
+ARCHIVE_DEFAULTS = {
+    'ROOT': None,
+    'AFTER_DAYS': 90,
+    'BLOCK_ROWS': 1024,
+}
+
+MAGIC = b'IOTSEG1\0'
+HEADER = struct.Struct('<II')
+# first created_at, last created_at, offset, size, rows
+BLOCK_ENTRY = struct.Struct('<qqQII')
+SEGMENT_SUFFIX = '.seg'
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+DELETE_BATCH_SIZE = 500
+
+
+def get_archive_settings():
+    return {
+        **ARCHIVE_DEFAULTS,
+        **getattr(settings, 'DEVICE_DATA_ARCHIVE', {}),
+    }
+
+
+def get_archive_root():
+    root = get_archive_settings()['ROOT']
+    return Path(root) if root else Path(settings.BASE_DIR) / 'archive'
+
+
+def to_micros(moment):
+    delta = moment - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def day_bounds(day):
+    start = datetime.combine(day, time.min, tzinfo=UTC)
+    return start, start + timedelta(days=1)
+
+
+def segment_path(device_id, day):
+    return get_archive_root() / str(device_id) / f'{day.isoformat()}{SEGMENT_SUFFIX}'
+
+
+def archived_days(device_id):
+    """Return the sorted days that have a segment file for ``device_id``."""
+    try:
+        entries = os.scandir(get_archive_root() / str(device_id))
+    except FileNotFoundError:
+        return []
+    days = []
+    with entries:
+        for entry in entries:
+            if entry.name.endswith(SEGMENT_SUFFIX):
+                days.append(date.fromisoformat(entry.name[: -len(SEGMENT_SUFFIX)]))
+    return sorted(days)
+
+
+def _little_endian(column):
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+
+def _deltas(values):
+    column = array('q', values)
+    for i in range(len(column) - 1, 0, -1):
+        column[i] -= column[i - 1]
+    return column
+
+
+def _undelta(column):
+    for i in range(1, len(column)):
+        column[i] += column[i - 1]
+    return column
+
+
+def _encode_block(rows):
+    ids = _deltas(row[0] for row in rows)
+    stamps = _deltas(row[1] for row in rows)
+    values = array('d', (math.nan if row[2] is None else row[2] for row in rows))
+    encoded = [row[3].encode('utf-8') for row in rows]
+    lengths = array('H', (len(raw) for raw in encoded))
+    payload = b''.join(
+        [
+            struct.pack('<I', len(rows)),
+            _little_endian(ids).tobytes(),
+            _little_endian(stamps).tobytes(),
+            _little_endian(values).tobytes(),
+            _little_endian(lengths).tobytes(),
+            *encoded,
+        ]
+    )
+    return zlib.compress(payload)
+
+
+def _decode_block(raw):
+    payload = zlib.decompress(raw)
+    (count,) = struct.unpack_from('<I', payload)
+    offset = 4
+    columns = []
+    for typecode in ('q', 'q', 'd', 'H'):
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(payload[offset : offset + size])
+        columns.append(_little_endian(column))
+        offset += size
+    ids, stamps, values, lengths = columns
+    _undelta(ids)
+    _undelta(stamps)
+    rows = []
+    for i in range(count):
+        end = offset + lengths[i]
+        value = values[i]
+        rows.append(
+            (
+                ids[i],
+                stamps[i],
+                None if math.isnan(value) else value,
+                payload[offset:end].decode('utf-8'),
+            )
+        )
+        offset = end
+    return rows
+
+
+def write_segment(path, rows, block_rows=None):
+    """
+    Write ``rows``, (id, created_at micros, value, data) tuples sorted by
+    (created_at, id), to the segment file ``path``, replacing it atomically.
+    """
+    block_rows = block_rows or get_archive_settings()['BLOCK_ROWS']
+    blocks = [
+        rows[offset : offset + block_rows] for offset in range(0, len(rows), block_rows)
+    ]
+    encoded = [_encode_block(block) for block in blocks]
+
+    offset = len(MAGIC) + HEADER.size + BLOCK_ENTRY.size * len(blocks)
+    index = []
+    for block, raw in zip(blocks, encoded, strict=True):
+        index.append(
+            BLOCK_ENTRY.pack(block[0][1], block[-1][1], offset, len(raw), len(block))
+        )
+        offset += len(raw)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(MAGIC)
+            file.write(HEADER.pack(len(blocks), len(rows)))
+            file.writelines(index)
+            file.writelines(encoded)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class Segment:
+    """A memory-mapped segment file; use as a context manager."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        with open(self.path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f'{self.path} is not a segment file')
+        self.block_count, self.row_count = HEADER.unpack_from(self._map, len(MAGIC))
+        start = len(MAGIC) + HEADER.size
+        self.blocks = [
+            BLOCK_ENTRY.unpack_from(self._map, start + i * BLOCK_ENTRY.size)
+            for i in range(self.block_count)
+        ]
+        return self
+
+    def __exit__(self, *exc_info):
+        self._map.close()
+
+    def read(self, start=None, end=None, reverse=False):
+        """
+        Yield the rows with ``start <= created_at < end`` (micros, None for
+        unbounded), decoding only the blocks that overlap that range.
+        """
+        first = 0
+        stop = self.block_count
+        if start is not None:
+            first = bisect_left([block[1] for block in self.blocks], start)
+        if end is not None:
+            stop = bisect_left([block[0] for block in self.blocks], end)
+        indexes = range(first, stop)
+        for i in reversed(indexes) if reverse else indexes:
+            _, _, offset, size, _ = self.blocks[i]
+            rows = _decode_block(self._map[offset : offset + size])
+            lo = 0 if start is None else bisect_left(rows, start, key=_stamp)
+            hi = len(rows) if end is None else bisect_left(rows, end, key=_stamp)
+            rows = rows[lo:hi]
+            yield from reversed(rows) if reverse else rows
+
+
+def _stamp(row):
+    return row[1]
+
+
+def iter_rows(device_id, start=None, end=None, reverse=False):
+    """
+    Yield archived (id, created_at micros, value, data) rows of a device with
+    ``start <= created_at < end``, in (created_at, id) order or its reverse.
+    """
+    lo = None if start is None else to_micros(start)
+    hi = None if end is None else to_micros(end)
+    days = [
+        day
+        for day in archived_days(device_id)
+        if (start is None or day_bounds(day)[1] > start)
+        and (end is None or day_bounds(day)[0] < end)
+    ]
+    for day in reversed(days) if reverse else days:
+        with Segment(segment_path(device_id, day)) as segment:
+            yield from segment.read(lo, hi, reverse=reverse)
+
+
+def to_reading(device_id, row):
+    """Build an unsaved DeviceData instance from an archived row."""
+    pk, micros, value, data = row
+    _, unit, metric = parse_reading(data)
+    return DeviceData(
+        pk=pk,
+        device_id=device_id,
+        data=data,
+        created_at=from_micros(micros),
+        value=value,
+        unit=unit,
+        metric=metric,
+    )
+
+
+def read_archive(
+    device_id, start=None, end=None, after=None, reverse=False, limit=None
+):
+    """
+    Return up to ``limit`` archived readings of a device as DeviceData
+    instances with ``start <= created_at < end``, ordered by (created_at, id),
+    descending if ``reverse``. ``after`` is a (created_at, id) key: only
+    readings past it in that order are returned.
+    """
+    if after is not None:
+        after_key = (to_micros(after[0]), after[1])
+        # Narrow the range to the side of the key that is still to come
+        if reverse:
+            bound = after[0] + timedelta(microseconds=1)
+            end = bound if end is None else min(end, bound)
+        else:
+            start = after[0] if start is None else max(start, after[0])
+    readings = []
+    for row in iter_rows(device_id, start, end, reverse=reverse):
+        if after is not None:
+            key = (row[1], row[0])
+            if key >= after_key if reverse else key <= after_key:
+                continue
+        readings.append(to_reading(device_id, row))
+        if limit is not None and len(readings) >= limit:
+            break
+    return readings
+
+
+def archived_values(device_id, start=None, end=None):
+    """Yield (created_at, value) of archived numeric readings in a range."""
+    for _, micros, value, _ in iter_rows(device_id, start, end):
+        if value is not None:
+            yield from_micros(micros), value
+
+
+def archive_day(device_id, day):
+    """
+    Move the readings of one device and UTC day from the database into its
+    segment file, merging with readings archived earlier. Return the number
+    of readings moved.
+    """
+    start, end = day_bounds(day)
+    rows = [
+        (pk, to_micros(created_at), value, data)
+        for pk, created_at, value, data in DeviceData.objects.filter(
+            device_id=device_id, created_at__gte=start, created_at__lt=end
+        )
+        .order_by('created_at', 'id')
+        .values_list('pk', 'created_at', 'value', 'data')
+    ]
+    if not rows:
+        return 0
+
+    path = segment_path(device_id, day)
+    merged = rows
+    if path.exists():
+        with Segment(path) as segment:
+            archived = list(segment.read())
+        merged = list(heapq.merge(archived, rows, key=lambda row: (row[1], row[0])))
+    write_segment(path, merged)
+
+    # Rows leave the database only once their segment is safely on disk
+    moved = [row[0] for row in rows]
+    for offset in range(0, len(moved), DELETE_BATCH_SIZE):
+        DeviceData.objects.filter(
+            pk__in=moved[offset : offset + DELETE_BATCH_SIZE]
+        ).delete()
+    bump_data_version([device_id])
+    return len(moved)
+
+
+def archive_before(cutoff, device_ids=None):
+    """
+    Archive every full UTC day before ``cutoff`` that still has readings in
+    the database. Return a dict mapping device id to readings moved.
+    """
+    cutoff_day = cutoff.astimezone(UTC).date()
+    readings = DeviceData.objects.filter(created_at__lt=day_bounds(cutoff_day)[0])
+    if device_ids is not None:
+        readings = readings.filter(device_id__in=device_ids)
+    pending = (
+        readings.annotate(day=TruncDate('created_at', tzinfo=UTC))
+        .values_list('device_id', 'day')
+        .distinct()
+        .order_by('device_id', 'day')
+    )
+    moved = {}
+    for device_id, day in pending:
+        moved[device_id] = moved.get(device_id, 0) + archive_day(device_id, day)
+    return moved
+
+
+def archive_expired(device_ids=None):
+    """Archive readings older than DEVICE_DATA_ARCHIVE['AFTER_DAYS']."""
+    days = get_archive_settings()['AFTER_DAYS']
+    return archive_before(timezone.now() - timedelta(days=days), device_ids)
+
+
+def drop_segments(device_id, cutoff):
+    """
+    Delete the segment files of days that ended before ``cutoff`` and return
+    the number of readings they held.
+    """
+    dropped = 0
+    for day in archived_days(device_id):
+        if day_bounds(day)[1] > cutoff:
+            break
+        path = segment_path(device_id, day)
+        with Segment(path) as segment:
+            dropped += segment.row_count
+        path.unlink()
+    return dropped
+
+
+@receiver(post_delete, sender=Device)
+def drop_device_archive(sender, instance, **kwargs):
+    # Only once the delete is committed, so a rollback keeps the segments
+    path = get_archive_root() / str(instance.pk)
+    transaction.on_commit(lambda: shutil.rmtree(path, ignore_errors=True))
@@ -0,0 +1,70 @@
+"""
+Authentication of requests made by a device itself.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+from account.authentication import CachedTokenAuthentication, token_cache
+from account.models import User
+
+from .models import Device, DeviceToken
+
+
+class DeviceTokenAuthentication(CachedTokenAuthentication):
+    """
+    Authenticate with a DeviceToken passed as "Authorization: Device <key>".
+
+    request.user is the owner of the device and request.auth the DeviceToken;
+    ownership checks only accept that one device (see device/ownership.py).
+    """
+
+    keyword = 'Device'
+    model = DeviceToken
+
+    def lookup_credentials(self, key):
+        try:
+            token = DeviceToken.objects.select_related('device__owner').get(key=key)
+        except DeviceToken.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.device.owner.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.device.owner, token)
+
+
+# Endpoints a device calls accept its DeviceToken besides the usual schemes
+DEVICE_AUTHENTICATION_CLASSES = [
+    DeviceTokenAuthentication,
+    *api_settings.DEFAULT_AUTHENTICATION_CLASSES,
+]
+
+
+def device_token_cache_key(key):
+    return DeviceTokenAuthentication().get_cache_key(key)
+
+
+@receiver(post_delete, sender=DeviceToken)
+def forget_device_token(sender, instance, **kwargs):
+    token_cache.delete([device_token_cache_key(instance.key)])
+
+
+@receiver(post_save, sender=Device)
+def forget_device_tokens_of_device(sender, instance, created, **kwargs):
+    # The owner may have changed
+    if created:
+        return
+    keys = DeviceToken.objects.filter(device=instance).values_list('key', flat=True)
+    token_cache.delete([device_token_cache_key(key) for key in keys])
+
+
+@receiver(post_save, sender=User)
+def forget_device_tokens_of_user(sender, instance, **kwargs):
+    keys = DeviceToken.objects.filter(device__owner=instance).values_list(
+        'key', flat=True
+    )
+    token_cache.delete([device_token_cache_key(key) for key in keys])
@@ -0,0 +1,108 @@
+"""
+Conditional GETs: ETags built from cheap validators instead of the payload.
+
+A view using ConditionalGetMixin returns from ``get_validators()`` a few
+values that change whenever its response would, e.g. the ``data_version`` of a
+device or the DeviceListVersion of its owner. They are hashed with the user,
+the full path and the accepted media type into the ETag, so a request whose
+If-None-Match still holds is answered with 304 Not Modified without querying
+or rendering the payload.
+"""
+
+import hashlib
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Device, DeviceListVersion
+
+
+def bump_data_version(device_ids):
+    """Mark the readings of ``device_ids`` as changed."""
+    Device.objects.filter(pk__in=device_ids).update(data_version=F('data_version') + 1)
+
+
+def bump_device_version(owner_ids):
+    """Mark the device lists of ``owner_ids`` as changed."""
+    DeviceListVersion.objects.filter(owner_id__in=owner_ids).update(
+        version=F('version') + 1
+    )
+
+
+def bump_owner_versions(device_ids):
+    """Mark the device lists of the owners of ``device_ids`` as changed."""
+    bump_device_version(Device.objects.filter(pk__in=device_ids).values('owner_id'))
+
+
+def device_list_validators(user):
+    """
+    Return validators of the devices of ``user``. Code that writes devices
+    with QuerySet.update() must call ``bump_owner_versions()`` itself.
+    """
+    # Created on first use: there is nothing to bump before an ETag is handed out
+    version, _ = DeviceListVersion.objects.get_or_create(owner_id=user.pk)
+    return (version.version,)
+
+
+@receiver(pre_save, sender=Device)
+def bump_previous_owner(sender, instance, **kwargs):
+    # The device may be moving to another owner, whose list changes as well
+    if instance.pk is not None:
+        bump_owner_versions([instance.pk])
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def bump_owner(sender, instance, **kwargs):
+    bump_device_version([instance.owner_id])
+
+
+def make_etag(request, validators):
+    """Return the quoted ETag of ``validators`` for this request."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (
+        request.user.pk,
+        request.get_full_path(),
+        request.accepted_media_type,
+        *validators,
+    ):
+        digest.update(repr(part).encode())
+        digest.update(b'\0')
+    return quote_etag(digest.hexdigest())
+
+
+def etag_matches(request, etag):
+    """True when the If-None-Match header of ``request`` holds ``etag``."""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    # Weak comparison, the payload is the same either way
+    etags = [tag.removeprefix('W/') for tag in parse_etags(header)]
+    return '*' in etags or etag in etags
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET with 304 Not Modified while the ETag of ``get_validators()``
+    is one the client already has, and send the ETag with every 200.
+    """
+
+    def get_validators(self, request):
+        """Return a tuple of values that change whenever the response does."""
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        etag = make_etag(request, self.get_validators(request))
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            patch_vary_headers(response, ['Accept', 'Authorization'])
+        return response
@@ -0,0 +1,110 @@
+"""
+Streaming export of device data as CSV or NDJSON.
+
+Bodies are generators of byte chunks. Served over ASGI they are wrapped with
+``iterate_async()``, since Django would otherwise read a sync iterator to the
+end before sending the first chunk.
+"""
+
+import csv
+import heapq
+import io
+import zlib
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+
+from .archive import from_micros, iter_rows
+from .renderers import DEVICE_DATA_COLUMNS, datetime_formatter, dumps
+
+# Format name: (media type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+EXPORT_COMPRESSIONS = ('gzip',)
+EXPORT_HEADER = ('id', 'device', 'data', 'created_at')
+
+# Encoded bytes collected before a chunk is sent
+STREAM_CHUNK_BYTES = 64 * 1024
+
+ArchivedRow = namedtuple('ArchivedRow', DEVICE_DATA_COLUMNS)
+
+
+def export_rows(queryset, device_id, start=None, end=None, chunk_size=2000):
+    """
+    Yield the rows of ``queryset`` merged with the archived readings of
+    ``device_id`` in [start, end), both in (created_at, id) order. Rows are
+    fetched ``chunk_size`` at a time and never held all at once.
+    """
+    stored = queryset.values_list(*DEVICE_DATA_COLUMNS, named=True).iterator(
+        chunk_size=chunk_size
+    )
+    archived = (
+        ArchivedRow(pk, device_id, data, from_micros(micros))
+        for pk, micros, _, data in iter_rows(device_id, start, end)
+    )
+    return heapq.merge(archived, stored, key=lambda row: (row.created_at, row.pk))
+
+
+def encode_csv(rows):
+    """Yield CSV bytes for ``rows``, a header line first."""
+    timestamp = datetime_formatter()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        writer.writerow((row.pk, row.device_id, row.data, timestamp(row.created_at)))
+        if buffer.tell() >= STREAM_CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def encode_ndjson(rows):
+    """Yield one JSON object per line for ``rows``."""
+    timestamp = datetime_formatter()
+    buffer = bytearray()
+    for row in rows:
+        buffer += dumps(
+            {
+                'id': row.pk,
+                'device': row.device_id,
+                'data': row.data,
+                'created_at': timestamp(row.created_at),
+            }
+        )
+        buffer += b'\n'
+        if len(buffer) >= STREAM_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+ENCODERS = {'csv': encode_csv, 'ndjson': encode_ndjson}
+
+
+def gzip_stream(chunks):
+    """Compress a stream of byte chunks into a gzip stream as it goes."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def iterate_async(chunks):
+    """
+    Yield the chunks of the sync iterator ``chunks`` one ``next()`` at a time,
+    each run in the thread that owns the database connection.
+    """
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # Release the database cursor when the client goes away early
+        await sync_to_async(chunks.close, thread_sensitive=True)()
@@ -0,0 +1,176 @@
+"""
+Coalesced recording of device heartbeats.
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .conditional import bump_owner_versions
+from .liveness import sweeper
+from .models import Device
+from .ownership import device_access
+from .signals import data_ingested, device_status_changed
+from .workers import BackgroundWorker, register
+
+HEARTBEAT_DEFAULTS = {
+    'ENABLED': True,
+    'FLUSH_INTERVAL': 5.0,
+    'BATCH_SIZE': 500,
+    'DATA_MAX_LAG': 60.0,
+}
+
+
+def get_heartbeat_settings():
+    return {
+        **HEARTBEAT_DEFAULTS,
+        **getattr(settings, 'DEVICE_HEARTBEAT', {}),
+    }
+
+
+def offline_ids(device_ids):
+    return list(
+        Device.objects.filter(
+            pk__in=device_ids, status=Device.DeviceStatus.OFFLINE
+        ).values_list('pk', flat=True)
+    )
+
+
+def set_online(device_ids):
+    Device.objects.filter(pk__in=device_ids, status=Device.DeviceStatus.OFFLINE).update(
+        status=Device.DeviceStatus.ONLINE
+    )
+
+
+def announce_revived(device_ids):
+    """Tell the caches and receivers that ``device_ids`` are ONLINE again."""
+    if device_ids:
+        device_access.invalidate(device_ids)
+        device_status_changed.send(
+            sender=Device, device_ids=device_ids, status=Device.DeviceStatus.ONLINE
+        )
+
+
+def revive(device_ids):
+    """Set the OFFLINE devices of ``device_ids`` back ONLINE; return their ids."""
+    revived = offline_ids(device_ids)
+    if revived:
+        set_online(revived)
+        bump_owner_versions(revived)
+        announce_revived(revived)
+    return revived
+
+
+class HeartbeatRecorder(BackgroundWorker):
+    """
+    Keep the newest heartbeat time of each device in memory and write them
+    all to Device.last_seen every FLUSH_INTERVAL seconds, updating only that
+    column. However often a device beats, it costs one row per flush.
+    Devices that were set OFFLINE (see device/liveness.py) are ONLINE again
+    after the flush.
+
+    When the worker thread is not running, heartbeats are written inline.
+    """
+
+    name = 'device-heartbeat'
+
+    def __init__(self):
+        super().__init__()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return get_heartbeat_settings()['ENABLED']
+
+    @property
+    def interval(self):
+        return get_heartbeat_settings()['FLUSH_INTERVAL']
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def record(self, device_id, seen_at):
+        """Note that ``device_id`` was seen at ``seen_at``."""
+        self.record_many([device_id], seen_at)
+
+    def record_many(self, device_ids, seen_at):
+        """Note that each of ``device_ids`` was seen at ``seen_at``."""
+        sweeper.touch(device_ids, seen_at)
+        if not self.running:
+            revived = offline_ids(device_ids)
+            Device.objects.filter(pk__in=device_ids).update(last_seen=seen_at)
+            if revived:
+                set_online(revived)
+            bump_owner_versions(device_ids)
+            device_access.seen(device_ids, seen_at)
+            announce_revived(revived)
+            return
+        with self._lock:
+            self._merge(dict.fromkeys(device_ids, seen_at))
+
+    def _merge(self, seen):
+        for device_id, seen_at in seen.items():
+            current = self._pending.get(device_id)
+            if current is None or seen_at > current:
+                self._pending[device_id] = seen_at
+
+    def run_once(self):
+        """Write out every pending heartbeat; return the number of devices."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        batch_size = get_heartbeat_settings()['BATCH_SIZE']
+        device_ids = list(pending)
+        devices = [
+            Device(pk=device_id, last_seen=seen_at)
+            for device_id, seen_at in pending.items()
+        ]
+        revived = []
+        try:
+            # bulk_update() writes the given value and skips auto_now
+            with transaction.atomic():
+                Device.objects.bulk_update(
+                    devices, ['last_seen'], batch_size=batch_size
+                )
+                for offset in range(0, len(device_ids), batch_size):
+                    chunk = device_ids[offset : offset + batch_size]
+                    offline = offline_ids(chunk)
+                    if offline:
+                        set_online(offline)
+                        revived += offline
+                    bump_owner_versions(chunk)
+        except OperationalError:
+            # Keep the heartbeats for the next pass unless newer ones arrived
+            with self._lock:
+                self._merge(pending)
+            raise
+        # Only devices that really went from OFFLINE to ONLINE; ERROR stays
+        announce_revived(revived)
+        return len(devices)
+
+
+heartbeats = register(HeartbeatRecorder())
+
+
+@receiver(data_ingested)
+def record_data_messages(sender, readings, **kwargs):
+    # A data message shows the device is alive just like a heartbeat. Devices
+    # known to be online and seen lately are not written again, so that the
+    # ingest path stays free of a last_seen UPDATE per batch.
+    seen_at = timezone.now()
+    max_lag = get_heartbeat_settings()['DATA_MAX_LAG']
+    device_ids = list({reading.device_id for reading in readings})
+    sweeper.touch(device_ids, seen_at)
+    stale = [
+        device_id
+        for device_id in device_ids
+        if not device_access.recently_seen(device_id, seen_at, max_lag)
+    ]
+    if stale:
+        heartbeats.record_many(stale, seen_at)
@@ -0,0 +1,189 @@
+"""
+Batched ingestion of DeviceData.
+"""
+
+import csv
+import json
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+
+from .conditional import bump_data_version
+from .models import Device, DeviceData
+from .rollups import update_rollups
+from .signals import data_ingested
+from .workers import BackgroundWorker, register
+
+logger = logging.getLogger(__name__)
+
+BULK_CREATE_BATCH_SIZE = 500
+
+WRITE_BEHIND_DEFAULTS = {
+    'ENABLED': False,
+    'FLUSH_INTERVAL': 0.2,
+    'FLUSH_MAX_ROWS': 500,
+    'MAX_PENDING': 10000,
+    'SUBMIT_TIMEOUT': 0.5,
+}
+
+NDJSON_MEDIA_TYPES = ('application/x-ndjson', 'application/jsonl')
+CSV_MEDIA_TYPES = ('text/csv',)
+
+
+def write_readings(readings):
+    """
+    Insert unsaved DeviceData instances, fold them into the rollups and bump
+    the data version of their devices in a single transaction, then send
+    ``data_ingested``.
+    """
+    if not readings:
+        return []
+    with transaction.atomic():
+        created = DeviceData.objects.bulk_create(
+            readings, batch_size=BULK_CREATE_BATCH_SIZE
+        )
+        update_rollups(created)
+        bump_data_version({reading.device_id for reading in created})
+    data_ingested.send(sender=DeviceData, readings=created)
+    return created
+
+
+def get_write_behind_settings():
+    return {
+        **WRITE_BEHIND_DEFAULTS,
+        **getattr(settings, 'DEVICE_DATA_WRITE_BEHIND', {}),
+    }
+
+
+class BufferFull(Exception):
+    """Raised when the write-behind buffer has no room for more readings."""
+
+
+class WriteBehindBuffer(BackgroundWorker):
+    """
+    In-process buffer that accepts validated readings and writes them in
+    group-committed batches of up to FLUSH_MAX_ROWS rows, every
+    FLUSH_INTERVAL seconds or as soon as a full batch is pending.
+
+    Submitters block for up to SUBMIT_TIMEOUT seconds when MAX_PENDING readings
+    are already queued and get ``BufferFull`` if no room frees up. When the
+    worker thread is not running, readings are written synchronously.
+    """
+
+    name = 'device-data-write-behind'
+
+    def __init__(self):
+        super().__init__()
+        self._pending = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def enabled(self):
+        return get_write_behind_settings()['ENABLED']
+
+    @property
+    def interval(self):
+        return get_write_behind_settings()['FLUSH_INTERVAL']
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def submit(self, readings):
+        """Queue unsaved DeviceData instances for the writer thread."""
+        if not self.running:
+            write_readings(readings)
+            return
+        conf = get_write_behind_settings()
+        with self._cond:
+            has_room = self._cond.wait_for(
+                lambda: len(self._pending) + len(readings) <= conf['MAX_PENDING'],
+                timeout=conf['SUBMIT_TIMEOUT'],
+            )
+            if not has_room:
+                raise BufferFull()
+            self._pending.extend(readings)
+            if len(self._pending) >= conf['FLUSH_MAX_ROWS']:
+                self.wake()
+
+    def run_once(self):
+        """Write out everything pending; return the number of rows written."""
+        max_rows = get_write_behind_settings()['FLUSH_MAX_ROWS']
+        written = 0
+        while True:
+            with self._cond:
+                if not self._pending:
+                    break
+                size = min(max_rows, len(self._pending))
+                batch = [self._pending.popleft() for _ in range(size)]
+                self._cond.notify_all()
+            try:
+                written += len(self._write(batch))
+            except OperationalError:
+                # Typically "database is locked": keep the batch for the next pass
+                with self._cond:
+                    self._pending.extendleft(reversed(batch))
+                raise
+        return written
+
+    def _write(self, batch):
+        try:
+            return write_readings(batch)
+        except IntegrityError:
+            # A device was deleted after its readings were accepted; its data
+            # would have been removed by the cascade, so drop only those rows.
+            device_ids = {reading.device_id for reading in batch}
+            existing = set(
+                Device.objects.filter(pk__in=device_ids).values_list('pk', flat=True)
+            )
+            logger.warning(
+                'Dropping readings for deleted devices %s',
+                sorted(device_ids - existing),
+            )
+            return write_readings(
+                [reading for reading in batch if reading.device_id in existing]
+            )
+
+
+write_behind = register(WriteBehindBuffer())
+
+
+def _decode_lines(stream, encoding='utf-8'):
+    """Yield decoded lines from a binary stream, reading one line at a time."""
+    for raw in iter(stream.readline, b''):
+        yield raw.decode(encoding)
+
+
+def read_ndjson(stream):
+    """
+    Yield (line_number, record, errors) for each non-blank line of an NDJSON
+    stream. Exactly one of record and errors is None.
+    """
+    for line_no, raw in enumerate(iter(stream.readline, b''), start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as exc:
+            yield line_no, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, {'non_field_errors': ['Expected an object.']}
+            continue
+        yield line_no, record, None
+
+
+def read_csv(stream):
+    """
+    Yield (line_number, record, errors) for each row of a CSV stream whose
+    first line is a header naming the columns.
+    """
+    try:
+        reader = csv.DictReader(_decode_lines(stream))
+        for row in reader:
+            yield reader.line_num, row, None
+    except (csv.Error, UnicodeDecodeError) as exc:
+        yield reader.line_num, None, {'non_field_errors': [f'Invalid CSV: {exc}']}
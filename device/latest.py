@@ -0,0 +1,193 @@
+"""
+Latest reading of every device, kept up to date at ingest.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import OuterRef, Subquery
+from django.dispatch import receiver
+
+from .archive import read_archive
+from .cache import MISSING, LRUCache
+from .models import Device, DeviceData
+from .signals import data_ingested
+
+LATEST_READING_DEFAULTS = {
+    'MAX_ENTRIES': 10000,
+    'CACHE': None,
+    'LOCAL_TTL': 1.0,
+}
+
+# Devices resolved per database query on a cache miss
+LOAD_BATCH_SIZE = 500
+
+
+def get_latest_reading_settings():
+    return {
+        **LATEST_READING_DEFAULTS,
+        **getattr(settings, 'DEVICE_LATEST_READING', {}),
+    }
+
+
+def as_entry(reading):
+    return {
+        'id': reading.pk,
+        'device': reading.device_id,
+        'data': reading.data,
+        'created_at': reading.created_at,
+        'value': reading.value,
+    }
+
+
+def entry_key(entry):
+    return entry['created_at'], entry['id']
+
+
+class LatestReadingStore:
+    """
+    Latest reading per device id, as a dict, or None for a device without
+    readings.
+
+    Entries live in an in-process LRU. When DEVICE_LATEST_READING['CACHE']
+    names a Django cache alias, that cache is shared between processes and
+    local entries only live for LOCAL_TTL seconds. A device that is in
+    neither is looked up in the database once.
+    """
+
+    key_prefix = 'device:latest:'
+
+    def __init__(self):
+        self._local = None
+
+    @property
+    def local(self):
+        if self._local is None:
+            config = get_latest_reading_settings()
+            ttl = config['LOCAL_TTL'] if config['CACHE'] else None
+            self._local = LRUCache(config['MAX_ENTRIES'], ttl=ttl)
+        return self._local
+
+    @property
+    def shared(self):
+        alias = get_latest_reading_settings()['CACHE']
+        return caches[alias] if alias else None
+
+    def make_key(self, device_id):
+        return f'{self.key_prefix}{device_id}'
+
+    def clear(self):
+        """Forget every entry; the settings are read again on next use."""
+        if self._local is not None:
+            self._local.clear()
+        self._local = None
+
+    def forget(self, device_ids):
+        """Drop the entries of ``device_ids``; they are loaded again on next read."""
+        for device_id in device_ids:
+            self.local.delete(device_id)
+        shared = self.shared
+        if shared is not None and device_ids:
+            shared.delete_many([self.make_key(device_id) for device_id in device_ids])
+
+    def _store(self, entries):
+        for device_id, entry in entries.items():
+            self.local.set(device_id, entry)
+        shared = self.shared
+        if shared is not None and entries:
+            shared.set_many(
+                {
+                    self.make_key(device_id): entry
+                    for device_id, entry in entries.items()
+                },
+                timeout=None,
+            )
+
+    def _cached(self, device_ids):
+        """Return the known entries of ``device_ids`` without a database query."""
+        found = {}
+        missing = []
+        for device_id in device_ids:
+            entry = self.local.get(device_id)
+            if entry is MISSING:
+                missing.append(device_id)
+            else:
+                found[device_id] = entry
+        shared = self.shared
+        if missing and shared is not None:
+            keys = {self.make_key(device_id): device_id for device_id in missing}
+            for key, entry in shared.get_many(list(keys)).items():
+                found[keys[key]] = entry
+                self.local.set(keys[key], entry)
+        return found
+
+    def _load(self, device_ids):
+        """Look the latest reading of ``device_ids`` up in the database."""
+        latest = (
+            DeviceData.objects.filter(device=OuterRef('pk'))
+            .order_by('-created_at', '-id')
+            .values('pk')[:1]
+        )
+        entries = {}
+        for offset in range(0, len(device_ids), LOAD_BATCH_SIZE):
+            chunk = device_ids[offset : offset + LOAD_BATCH_SIZE]
+            reading_ids = (
+                Device.objects.filter(pk__in=chunk)
+                .annotate(latest=Subquery(latest))
+                .values_list('latest', flat=True)
+            )
+            readings = DeviceData.objects.filter(pk__in=list(reading_ids))
+            entries.update(
+                {reading.device_id: as_entry(reading) for reading in readings}
+            )
+        for device_id in device_ids:
+            if device_id not in entries:
+                # Devices that stopped reporting long ago may only have
+                # archived readings
+                archived = read_archive(device_id, reverse=True, limit=1)
+                entries[device_id] = as_entry(archived[0]) if archived else None
+        return entries
+
+    def get(self, device_id):
+        return self.get_many([device_id])[device_id]
+
+    def get_many(self, device_ids):
+        """Return a dict mapping each of ``device_ids`` to its latest reading."""
+        found = self._cached(device_ids)
+        missing = [device_id for device_id in device_ids if device_id not in found]
+        if missing:
+            loaded = self._load(missing)
+            self._store(loaded)
+            found.update(loaded)
+        return found
+
+    def update(self, readings):
+        """Record freshly stored ``readings`` where they are the newest."""
+        newest = {}
+        for reading in readings:
+            entry = as_entry(reading)
+            current = newest.get(reading.device_id)
+            if current is None or entry_key(entry) > entry_key(current):
+                newest[reading.device_id] = entry
+
+        # Only devices with a known latest reading are updated; backfilled
+        # readings may be older than what is stored. Unknown devices are
+        # loaded on their first read.
+        known = self._cached(list(newest))
+        changed = {
+            device_id: entry
+            for device_id, entry in newest.items()
+            if device_id in known
+            and (
+                known[device_id] is None
+                or entry_key(entry) > entry_key(known[device_id])
+            )
+        }
+        self._store(changed)
+
+
+latest_readings = LatestReadingStore()
+
+
+@receiver(data_ingested)
+def remember_latest_readings(sender, readings, **kwargs):
+    latest_readings.update(readings)
@@ -0,0 +1,185 @@
+"""
+Offline detection: flip devices that stop reporting to OFFLINE.
+"""
+
+import heapq
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .conditional import bump_owner_versions
+from .models import Device
+from .ownership import device_access
+from .signals import device_status_changed
+from .workers import BackgroundWorker, register
+
+LIVENESS_DEFAULTS = {
+    'ENABLED': True,
+    'TICK': 1.0,
+    'DEFAULT_INTERVAL': 60,
+    'MISSED_BEATS': 3,
+}
+
+# Devices per SELECT/UPDATE statement
+SWEEP_BATCH_SIZE = 500
+
+
+def get_liveness_settings():
+    return {
+        **LIVENESS_DEFAULTS,
+        **getattr(settings, 'DEVICE_LIVENESS', {}),
+    }
+
+
+def timeout_for(heartbeat_interval):
+    """Return how long a device may stay silent before it is offline."""
+    config = get_liveness_settings()
+    interval = heartbeat_interval or config['DEFAULT_INTERVAL']
+    return timedelta(seconds=interval * config['MISSED_BEATS'])
+
+
+class OfflineSweeper(BackgroundWorker):
+    """
+    Keep the deadline of every online device in a min-heap and, every TICK
+    seconds, pop the ones that passed and set them OFFLINE with one UPDATE.
+    A device is offline once it has been silent for MISSED_BEATS times its
+    heartbeat_interval. A tick costs O(expired log n), not a scan of Device.
+
+    Heartbeats and data messages push a new deadline; the entries they
+    replace stay in the heap and are skipped when popped. Expired devices are
+    checked against Device.last_seen before the UPDATE, since other processes
+    record messages this one never sees.
+
+    Devices come back ONLINE when their next heartbeat is written (see
+    device/heartbeat.py). When the worker thread is not running, nothing is
+    tracked.
+    """
+
+    name = 'device-offline-sweeper'
+    drain_on_stop = False
+
+    def __init__(self):
+        super().__init__()
+        self._heap = []
+        self._deadlines = {}
+        self._intervals = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return get_liveness_settings()['ENABLED']
+
+    @property
+    def interval(self):
+        return get_liveness_settings()['TICK']
+
+    @property
+    def tracked(self):
+        return len(self._deadlines)
+
+    def schedule(self, device_id, seen_at, heartbeat_interval=None):
+        """Expect the next message of ``device_id`` relative to ``seen_at``."""
+        with self._lock:
+            if heartbeat_interval is not None:
+                self._intervals[device_id] = heartbeat_interval
+            deadline = seen_at + timeout_for(self._intervals.get(device_id))
+            current = self._deadlines.get(device_id)
+            if current is not None and deadline <= current:
+                return
+            self._deadlines[device_id] = deadline
+            heapq.heappush(self._heap, (deadline, device_id))
+
+    def reschedule(self, device_id, seen_at, heartbeat_interval):
+        """Replace the deadline of ``device_id``, e.g. after its interval changed."""
+        with self._lock:
+            self._intervals[device_id] = heartbeat_interval
+            deadline = seen_at + timeout_for(heartbeat_interval)
+            self._deadlines[device_id] = deadline
+            heapq.heappush(self._heap, (deadline, device_id))
+
+    def forget(self, device_id):
+        with self._lock:
+            self._deadlines.pop(device_id, None)
+            self._intervals.pop(device_id, None)
+
+    def touch(self, device_ids, seen_at):
+        """Note that ``device_ids`` sent a message at ``seen_at``."""
+        if not self.running:
+            return
+        for device_id in device_ids:
+            self.schedule(device_id, seen_at)
+
+    def load(self):
+        """Schedule every online device from its last_seen."""
+        devices = Device.objects.filter(status=Device.DeviceStatus.ONLINE).values_list(
+            'pk', 'last_seen', 'heartbeat_interval'
+        )
+        for device_id, last_seen, heartbeat_interval in devices.iterator():
+            self.schedule(device_id, last_seen, heartbeat_interval)
+        self._loaded = True
+
+    def _pop_expired(self, now):
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, device_id = heapq.heappop(self._heap)
+                # Entries replaced by a later deadline are skipped here
+                if self._deadlines.get(device_id) == deadline:
+                    del self._deadlines[device_id]
+                    expired.append(device_id)
+        return expired
+
+    def run_once(self, now=None):
+        """Set devices whose deadline passed OFFLINE; return how many."""
+        if not self._loaded:
+            self.load()
+        now = now or timezone.now()
+        expired = self._pop_expired(now)
+        offline = 0
+        for offset in range(0, len(expired), SWEEP_BATCH_SIZE):
+            chunk = expired[offset : offset + SWEEP_BATCH_SIZE]
+            online = Device.objects.filter(
+                pk__in=chunk, status=Device.DeviceStatus.ONLINE
+            )
+            silent = []
+            for device_id, last_seen, heartbeat_interval in online.values_list(
+                'pk', 'last_seen', 'heartbeat_interval'
+            ):
+                if last_seen + timeout_for(heartbeat_interval) <= now:
+                    silent.append(device_id)
+                else:
+                    # Seen by another process since this one scheduled it
+                    self.schedule(device_id, last_seen, heartbeat_interval)
+            if silent:
+                offline += Device.objects.filter(
+                    pk__in=silent, status=Device.DeviceStatus.ONLINE
+                ).update(status=Device.DeviceStatus.OFFLINE)
+                bump_owner_versions(silent)
+                device_access.invalidate(silent)
+                device_status_changed.send(
+                    sender=Device, device_ids=silent, status=Device.DeviceStatus.OFFLINE
+                )
+        return offline
+
+
+sweeper = register(OfflineSweeper())
+
+
+@receiver(post_save, sender=Device)
+def track_device(sender, instance, **kwargs):
+    if not sweeper.running:
+        return
+    if instance.status == Device.DeviceStatus.ONLINE:
+        sweeper.reschedule(instance.pk, instance.last_seen, instance.heartbeat_interval)
+    else:
+        sweeper.forget(instance.pk)
+
+
+@receiver(post_delete, sender=Device)
+def untrack_device(sender, instance, **kwargs):
+    sweeper.forget(instance.pk)
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from device.archive import archive_before, get_archive_root, get_archive_settings
+
+
+class Command(BaseCommand):
+    help = (
+        'Move DeviceData older than DEVICE_DATA_ARCHIVE["AFTER_DAYS"] into '
+        'per-device, per-day compressed segment files.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=get_archive_settings()['AFTER_DAYS'],
+            help='Archive full days older than this many days (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--device',
+            type=int,
+            action='append',
+            dest='devices',
+            metavar='PK',
+            help='Only archive this device; may be repeated.',
+        )
+
+    def handle(self, *args, days, devices=None, **options):
+        cutoff = timezone.now() - timedelta(days=days)
+        moved = archive_before(cutoff, devices)
+        if options['verbosity'] > 1:
+            for device_id, count in moved.items():
+                self.stdout.write(f'Device {device_id}: {count} readings')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Archived {sum(moved.values())} readings of {len(moved)} devices '
+                f'to {get_archive_root()}.'
+            )
+        )
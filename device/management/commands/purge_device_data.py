@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from device.retention import get_retention_settings, purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete DeviceData and DeviceLog rows older than their retention '
+        'policy, in small batches that do not stall ingestion.'
+    )
+
+    def add_arguments(self, parser):
+        config = get_retention_settings()
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=config['BATCH_SIZE'],
+            help='Rows deleted per transaction (default: %(default)s).',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=config['BATCH_PAUSE'],
+            help='Seconds to sleep between batches (default: %(default)s).',
+        )
+
+    def handle(self, *args, batch_size, pause, **options):
+        stats = purge_expired(batch_size=batch_size, pause=pause)
+        rows = stats['data'] + stats['logs']
+        rate = rows / stats['seconds'] if stats['seconds'] else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Deleted {stats["data"]} readings and {stats["logs"]} logs '
+                f'in {stats["seconds"]:.2f}s ({rate:.0f} rows/s).'
+            )
+        )
+        if stats['pages'] is not None:
+            self.stdout.write(f'Reclaimed {stats["pages"]} free pages.')
+        elif rows and options['verbosity'] > 1:
+            self.stdout.write(
+                'Free space was not reclaimed: the database does not use '
+                'incremental auto_vacuum.'
+            )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from device.models import Device
+from device.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the 1m/1h/1d DeviceData rollups from the stored readings. '
+        'Run once after upgrading, and after loading readings that did not '
+        'go through the ingest path.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--device',
+            type=int,
+            action='append',
+            dest='devices',
+            metavar='PK',
+            help='Only rebuild this device; may be repeated.',
+        )
+
+    def handle(self, *args, devices=None, **options):
+        if devices is None:
+            devices = Device.objects.order_by('pk').values_list('pk', flat=True)
+        total = 0
+        # One transaction per device keeps locks and memory bounded
+        for device_id in devices:
+            written = rebuild_rollups(device_id)
+            total += written
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Device {device_id}: {written} rollups')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {total} rollups.'))
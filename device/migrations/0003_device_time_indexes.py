@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0002_device_data_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='devicedata',
+            index=models.Index(fields=['device', 'created_at'], name='devicedata_device_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devicelog',
+            index=models.Index(fields=['device', 'created_at'], name='devicelog_device_time_idx'),
+        ),
+        migrations.AlterField(
+            model_name='devicedata',
+            name='device',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='data', to='device.device'),
+        ),
+        migrations.AlterField(
+            model_name='devicelog',
+            name='device',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='log', to='device.device'),
+        ),
+    ]
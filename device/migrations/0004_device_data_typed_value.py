@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0003_device_time_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='devicedata',
+            name='metric',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='devicedata',
+            name='unit',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='devicedata',
+            name='value',
+            field=models.FloatField(blank=True, db_comment='Numeric value parsed from data; null when data is not a number', null=True),
+        ),
+    ]
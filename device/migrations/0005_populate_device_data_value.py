@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:00
+
+import math
+import re
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 2000
+
+# A copy of device.models.READING_RE and parse_reading() as of this migration,
+# so later changes to the parser do not change what it does
+READING_RE = re.compile(
+    r'^\s*(?:(?P<metric>[A-Za-z_][\w.-]{0,31})\s*[=:]\s*)?'
+    r'(?P<value>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+    r'\s*(?P<unit>[^\s\d.+-]\S{0,15})?\s*$'
+)
+
+
+def parse_reading(raw):
+    match = READING_RE.match(raw or '')
+    if not match:
+        return None, '', ''
+    value = float(match.group('value'))
+    if not math.isfinite(value):
+        return None, '', ''
+    return value, match.group('unit') or '', match.group('metric') or ''
+
+
+def populate_value(apps, schema_editor):
+    """Parse the data of existing readings into value/unit/metric in batches."""
+    DeviceData = apps.get_model('device', 'DeviceData')
+    last_pk = 0
+    while True:
+        batch = list(
+            DeviceData.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .only('pk', 'data')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+
+        changed = []
+        for row in batch:
+            row.value, row.unit, row.metric = parse_reading(row.data)
+            if row.value is not None:
+                changed.append(row)
+        # One short transaction per batch keeps the write lock brief
+        with transaction.atomic():
+            DeviceData.objects.bulk_update(changed, ['value', 'unit', 'metric'])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('device', '0004_device_data_typed_value'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_value, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0005_populate_device_data_value'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceDataRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveIntegerField(choices=[(60, '1 minute'), (3600, '1 hour'), (86400, '1 day')], db_comment='Bucket width in seconds')),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('sum', models.FloatField(default=0)),
+                ('min', models.FloatField()),
+                ('max', models.FloatField()),
+                ('device', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='device.device')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device', 'resolution', 'bucket_start'), name='devicedatarollup_unique_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0006_device_data_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_days', models.PositiveIntegerField(blank=True, db_comment='Days DeviceData is kept; null keeps it forever', null=True)),
+                ('log_days', models.PositiveIntegerField(blank=True, db_comment='Days DeviceLog is kept; null keeps it forever', null=True)),
+                ('device', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='retention_policy', to='device.device')),
+                ('owner', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='retention_policy', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'retention policies',
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('device__isnull', True), ('owner__isnull', False)), models.Q(('device__isnull', False), ('owner__isnull', True)), _connector='OR'), name='retentionpolicy_owner_xor_device')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0007_retention_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='heartbeat_interval',
+            field=models.PositiveIntegerField(blank=True, db_comment='Seconds between expected heartbeats; null uses DEVICE_LIVENESS["DEFAULT_INTERVAL"]', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0009_device_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='data_version',
+            field=models.PositiveBigIntegerField(db_comment='Counter bumped whenever readings of the device are written or deleted; validates conditional GETs of its data', default=0, editable=False),
+        ),
+    ]
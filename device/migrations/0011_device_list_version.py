@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('device', '0010_device_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceListVersion',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.PositiveBigIntegerField(db_comment='Counter bumped whenever a device of the owner is written or deleted; validates conditional GETs of the device list', default=0)),
+            ],
+        ),
+    ]
@@ -2,10 +2,37 @@
 Device models
 """
 
+import math
+import re
+import secrets
+
 from django.db import models
+from django.utils import timezone
 
 from account.models import User
 
+# "<value>", "<value><unit>" or "<metric>=<value> <unit>", e.g. "21.5",
+# "21.5 C" or "temperature: 21.5C"
+READING_RE = re.compile(
+    r'^\s*(?:(?P<metric>[A-Za-z_][\w.-]{0,31})\s*[=:]\s*)?'
+    r'(?P<value>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+    r'\s*(?P<unit>[^\s\d.+-]\S{0,15})?\s*$'
+)
+
+
+def parse_reading(raw):
+    """
+    Split a raw reading into (value, unit, metric). ``value`` is None when the
+    reading is not a finite number.
+    """
+    match = READING_RE.match(raw or '')
+    if not match:
+        return None, '', ''
+    value = float(match.group('value'))
+    if not math.isfinite(value):
+        return None, '', ''
+    return value, match.group('unit') or '', match.group('metric') or ''
+
 
 # Create your models here.
 class Device(models.Model):
@@ -44,30 +71,223 @@ class Device(models.Model):
     )
     serial_number = models.CharField(max_length=50)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='devices')
+    heartbeat_interval = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        db_comment=(
+            'Seconds between expected heartbeats; null uses '
+            'DEVICE_LIVENESS["DEFAULT_INTERVAL"]'
+        ),
+    )
+    # Bumped by device.conditional.bump_data_version()
+    data_version = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        db_comment=(
+            'Counter bumped whenever readings of the device are written or '
+            'deleted; validates conditional GETs of its data'
+        ),
+    )
 
     def __str__(self):
         return f'{self.name} ({self.serial_number})'
 
 
+class DeviceListVersion(models.Model):
+    """Version of the device list of one owner."""
+
+    owner = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='+'
+    )
+    # Bumped by device.conditional.bump_device_version()
+    version = models.PositiveBigIntegerField(
+        default=0,
+        db_comment=(
+            'Counter bumped whenever a device of the owner is written or '
+            'deleted; validates conditional GETs of the device list'
+        ),
+    )
+
+    def __str__(self):
+        return f'Devices of {self.owner_id}: version {self.version}'
+
+
 class DeviceLog(models.Model):
     """Log of Device in the system."""
 
-    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='log')
+    # Lookups by device are served by the (device, created_at) index
+    device = models.ForeignKey(
+        Device, on_delete=models.CASCADE, related_name='log', db_index=False
+    )
     message = models.CharField(max_length=255, blank=False)
     created_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['device', 'created_at'], name='devicelog_device_time_idx'
+            )
+        ]
+
     def __str__(self):
         preview = self.message[:25] + ('...' if len(self.message) > 25 else '')
         return f'{self.device.name}: {preview}'
 
 
+class DeviceDataQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create() bypasses save(), so fill the typed value here as well
+        objs = list(objs)
+        for obj in objs:
+            obj.set_typed_value()
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class DeviceData(models.Model):
     """Data of Device send to servers in the system."""
 
-    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='data')
+    # Lookups by device are served by the (device, created_at) index
+    device = models.ForeignKey(
+        Device, on_delete=models.CASCADE, related_name='data', db_index=False
+    )
     data = models.CharField(max_length=255, blank=False)
-    created_at = models.DateTimeField(auto_now=True)
+    # Defaults to the time of ingestion; backfilled readings keep the
+    # timestamp supplied by the device.
+    created_at = models.DateTimeField(default=timezone.now)
+    # Typed form of data, filled in by set_typed_value() on save and bulk_create
+    value = models.FloatField(
+        null=True,
+        blank=True,
+        db_comment='Numeric value parsed from data; null when data is not a number',
+    )
+    unit = models.CharField(max_length=16, blank=True)
+    metric = models.CharField(max_length=32, blank=True)
+
+    objects = DeviceDataQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['device', 'created_at'], name='devicedata_device_time_idx'
+            )
+        ]
+
+    def set_typed_value(self):
+        """Fill value, unit and metric from the raw data string."""
+        self.value, self.unit, self.metric = parse_reading(self.data)
+
+    def save(self, *args, **kwargs):
+        self.set_typed_value()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         timestamp = self.created_at.strftime('%Y-%m-%d %H:%M')
         return f'{self.device.name} @ {timestamp}'
+
+
+class DeviceDataRollup(models.Model):
+    """
+    Min/max/sum/count of the numeric readings of a device over one
+    fixed-width time bucket, kept up to date at ingest by device.rollups.
+    """
+
+    class Resolution(models.IntegerChoices):
+        MINUTE = 60, '1 minute'
+        HOUR = 3600, '1 hour'
+        DAY = 86400, '1 day'
+
+    # Lookups by device are served by the unique (device, resolution,
+    # bucket_start) index
+    device = models.ForeignKey(
+        Device, on_delete=models.CASCADE, related_name='rollups', db_index=False
+    )
+    resolution = models.PositiveIntegerField(
+        choices=Resolution, db_comment='Bucket width in seconds'
+    )
+    bucket_start = models.DateTimeField()
+    count = models.PositiveBigIntegerField(default=0)
+    sum = models.FloatField(default=0)
+    min = models.FloatField()
+    max = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['device', 'resolution', 'bucket_start'],
+                name='devicedatarollup_unique_bucket',
+            )
+        ]
+
+    def __str__(self):
+        timestamp = self.bucket_start.strftime('%Y-%m-%d %H:%M')
+        return f'{self.device.name} @ {timestamp} / {self.get_resolution_display()}'
+
+
+class RetentionPolicy(models.Model):
+    """
+    How long readings and logs are kept, for every device of an owner or for
+    a single device. A device policy takes precedence over its owner's.
+    """
+
+    owner = models.OneToOneField(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='retention_policy',
+    )
+    device = models.OneToOneField(
+        Device,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='retention_policy',
+    )
+    data_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        db_comment='Days DeviceData is kept; null keeps it forever',
+    )
+    log_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        db_comment='Days DeviceLog is kept; null keeps it forever',
+    )
+
+    class Meta:
+        verbose_name_plural = 'retention policies'
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(owner__isnull=False, device__isnull=True)
+                    | models.Q(owner__isnull=True, device__isnull=False)
+                ),
+                name='retentionpolicy_owner_xor_device',
+            )
+        ]
+
+    def __str__(self):
+        target = self.device or self.owner
+        return f'Retention for {target}: data {self.data_days}d, logs {self.log_days}d'
+
+
+class DeviceToken(models.Model):
+    """Token that authenticates requests on behalf of a single device."""
+
+    key = models.CharField(max_length=40, primary_key=True)
+    device = models.OneToOneField(
+        Device, on_delete=models.CASCADE, related_name='auth_token'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = self.generate_key()
+        return super().save(*args, **kwargs)
+
+    @classmethod
+    def generate_key(cls):
+        return secrets.token_hex(20)
+
+    def __str__(self):
+        return f'Token for {self.device}'
@@ -0,0 +1,138 @@
+"""
+Owner and status of devices, cached for permission checks and ingest.
+"""
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import MISSING, LRUCache
+from .models import Device, DeviceToken
+
+OWNERSHIP_CACHE_DEFAULTS = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 5.0,
+}
+
+
+def get_ownership_cache_settings():
+    return {
+        **OWNERSHIP_CACHE_DEFAULTS,
+        **getattr(settings, 'DEVICE_OWNERSHIP_CACHE', {}),
+    }
+
+
+class DeviceAccessCache:
+    """
+    (owner_id, status, last_seen) per device id, or None for a device that
+    does not exist, kept for TTL seconds.
+
+    Entries are dropped when a device is saved or deleted in this process, and
+    by code that changes statuses with ``QuerySet.update()``. Changes made by
+    other processes are seen after at most TTL seconds.
+    """
+
+    def __init__(self):
+        self._local = None
+
+    @property
+    def local(self):
+        if self._local is None:
+            config = get_ownership_cache_settings()
+            self._local = LRUCache(config['MAX_ENTRIES'], ttl=config['TTL'])
+        return self._local
+
+    def clear(self):
+        """Forget every entry; the settings are read again on next use."""
+        if self._local is not None:
+            self._local.clear()
+        self._local = None
+
+    def invalidate(self, device_ids, status=None):
+        """Drop the entries of ``device_ids``, or only those with ``status``."""
+        for device_id in device_ids:
+            if status is not None:
+                entry = self.local.get(device_id)
+                if entry is MISSING or entry is None or entry[1] != status:
+                    continue
+            self.local.delete(device_id)
+
+    def recently_seen(self, device_id, moment, max_age):
+        """
+        Return whether ``device_id`` is known to be online and seen less than
+        ``max_age`` seconds before ``moment``, without a database query.
+        """
+        entry = self.local.get(device_id)
+        return (
+            entry is not MISSING
+            and entry is not None
+            and entry[1] == Device.DeviceStatus.ONLINE
+            and (moment - entry[2]).total_seconds() < max_age
+        )
+
+    def seen(self, device_ids, seen_at):
+        """Record that the last_seen of ``device_ids`` was set to ``seen_at``."""
+        for device_id in device_ids:
+            entry = self.local.get(device_id)
+            if entry is not MISSING and entry is not None:
+                self.local.set(device_id, (entry[0], entry[1], seen_at))
+
+    def get_many(self, device_ids):
+        """Return a dict mapping each of ``device_ids`` to its entry."""
+        found = {}
+        missing = []
+        for device_id in device_ids:
+            entry = self.local.get(device_id)
+            if entry is MISSING:
+                missing.append(device_id)
+            else:
+                found[device_id] = entry
+        if missing:
+            loaded = dict.fromkeys(missing)
+            for device_id, owner_id, status, last_seen in Device.objects.filter(
+                pk__in=missing
+            ).values_list('pk', 'owner_id', 'status', 'last_seen'):
+                loaded[device_id] = (owner_id, status, last_seen)
+            for device_id, entry in loaded.items():
+                self.local.set(device_id, entry)
+            found.update(loaded)
+        return found
+
+
+device_access = DeviceAccessCache()
+
+
+def owned_device_statuses(request, device_ids):
+    """
+    Return a dict mapping each of ``device_ids`` owned by ``request.user`` to
+    its status. Results are memoized on the request, so the permission check
+    and the view share one lookup. A request authenticated by a DeviceToken
+    only owns that token's device.
+    """
+    memo = getattr(request, '_device_access', None)
+    if memo is None:
+        memo = request._device_access = {}
+    missing = [device_id for device_id in device_ids if device_id not in memo]
+    if missing:
+        memo.update(device_access.get_many(missing))
+    user_id = request.user.pk
+    token = request.auth
+    statuses = {}
+    for device_id in device_ids:
+        if isinstance(token, DeviceToken) and device_id != token.device_id:
+            continue
+        entry = memo[device_id]
+        if entry is not None and entry[0] == user_id:
+            statuses[device_id] = entry[1]
+    return statuses
+
+
+def owned_device_status(request, device_id):
+    """Return the status of ``device_id`` or None if the user does not own it."""
+    return owned_device_statuses(request, [device_id]).get(device_id)
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def forget_device_access(sender, instance, **kwargs):
+    device_access.invalidate([instance.pk])
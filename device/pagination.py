@@ -0,0 +1,145 @@
+"""
+Pagination for device time series.
+"""
+
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (created_at, id).
+
+    Every page, however deep, is a seek on the (device, created_at) index
+    instead of an OFFSET scan. Cursors are opaque; each one records the key of
+    the row it starts after (forward) or before (backward).
+    """
+
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        if position is None:
+            reverse, created_at, pk = False, None, None
+        else:
+            reverse, created_at, pk = position
+
+        if reverse:
+            queryset = queryset.order_by('-created_at', '-id')
+            if created_at is not None:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(id__lt=pk),
+                    created_at__lte=created_at,
+                )
+        else:
+            queryset = queryset.order_by('created_at', 'id')
+            if created_at is not None:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(id__gt=pk),
+                    created_at__gte=created_at,
+                )
+
+        results = list(queryset[: self.page_size + 1])
+        # Views backed by an archive tier expose rows that are no longer in
+        # the queryset through read_archive()
+        read_archive = getattr(view, 'read_archive', None)
+        if read_archive is not None:
+            archived = read_archive(
+                after=None if created_at is None else (created_at, pk),
+                reverse=reverse,
+                limit=self.page_size + 1,
+            )
+            if archived:
+                results = sorted(
+                    results + archived,
+                    key=lambda row: (row.created_at, row.pk),
+                    reverse=reverse,
+                )[: self.page_size + 1]
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_previous, self.has_next = has_more, position is not None
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            direction, timestamp, pk = (
+                b64decode(encoded.encode('ascii'), altchars=b'-_', validate=True)
+                .decode('ascii')
+                .split('|')
+            )
+            created_at = parse_datetime(timestamp)
+            pk = int(pk)
+        except (BinasciiError, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None or direction not in ('f', 'b'):
+            raise NotFound(self.invalid_cursor_message)
+        return direction == 'b', created_at, pk
+
+    def encode_cursor(self, reverse, row):
+        raw = '|'.join(
+            ['b' if reverse else 'f', row.created_at.isoformat(), str(row.pk)]
+        )
+        encoded = b64encode(raw.encode('ascii'), altchars=b'-_').decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'results': data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -4,7 +4,7 @@ Define customized permission.
 
 from rest_framework.permissions import BasePermission
 
-from .models import Device
+from .ownership import owned_device_status
 
 
 class IsOwner(BasePermission):
@@ -14,7 +14,7 @@ class IsOwner(BasePermission):
 
     def has_permission(self, request, view):
         dev_pk = view.kwargs.get('pk')
-        return Device.objects.filter(pk=dev_pk, owner=request.user).exists()
+        return owned_device_status(request, dev_pk) is not None
 
     def has_object_permission(self, request, view, obj):
         # Instance must have an attribute named 'owner'
@@ -28,7 +28,7 @@ class IsDataOwner(BasePermission):
 
     def has_permission(self, request, view):
         dev_pk = view.kwargs.get('pk')
-        return Device.objects.filter(pk=dev_pk, owner=request.user).exists()
+        return owned_device_status(request, dev_pk) is not None
 
     def has_object_permission(self, request, view, obj):
         return obj.device.owner == request.user
@@ -0,0 +1,222 @@
+"""
+Fast JSON and columnar rendering of DeviceData listings.
+
+The columnar layouts return a page of readings as parallel arrays instead of
+one object per reading. As JSON (``application/vnd.iot.columns+json`` or
+``?format=columns``)::
+
+    {"next": ..., "previous": ..., "timestamp_unit": "us", "delta": false,
+     "ids": [...], "timestamps": [...], "values": [...], "data": [...]}
+
+Timestamps are microseconds since the epoch; with ``?delta=1`` each one after
+the first is the difference to the previous one. ``values`` holds null for
+readings that are not numeric. The binary layout (``application/vnd.iot.columns``
+or ``?format=columns-bin``) holds the same columns as little-endian arrays::
+
+    magic "IOTCOL1\\0" | uint32 count | uint8 flags (1 = delta)
+    | int64 ids[count] | int64 timestamps[count] | float64 values[count] (NaN
+    for null) | uint32 data lengths[count] | UTF-8 data
+
+and carries the pagination links in the Link header.
+"""
+
+import json
+import math
+import struct
+import sys
+from array import array
+from itertools import pairwise
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+
+from .archive import to_micros
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# DeviceData columns read by the fast path, as (pk, device_id, data, created_at)
+DEVICE_DATA_COLUMNS = ('pk', 'device_id', 'data', 'created_at')
+# DeviceData columns read by the columnar layouts
+COLUMNAR_COLUMNS = ('pk', 'created_at', 'value', 'data')
+
+COLUMNS_MAGIC = b'IOTCOL1\0'
+COLUMNS_HEADER = struct.Struct('<IB')
+COLUMNS_DELTA = 1
+
+
+def renders_plain_json(request):
+    """
+    True when the response goes through the stock JSONRenderer without
+    indentation, whose output ``dumps()`` reproduces byte for byte.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    if type(renderer) is not JSONRenderer:
+        return False
+    if not renderer.compact or renderer.ensure_ascii:
+        return False
+    return renderer.get_indent(request.accepted_media_type, {}) is None
+
+
+def dumps(data):
+    """
+    Encode ``data``, made of dicts, lists, strings, numbers and None, the way
+    JSONRenderer does with the default COMPACT_JSON and UNICODE_JSON settings.
+    """
+    if orjson is not None:
+        body = orjson.dumps(data)
+    else:
+        body = json.dumps(
+            data,
+            ensure_ascii=False,
+            allow_nan=not JSONRenderer.strict,
+            separators=(',', ':'),
+        ).encode()
+    # JSONRenderer escapes these so the output is valid JavaScript
+    return body.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+        b'\xe2\x80\xa9', b'\\u2029'
+    )
+
+
+def datetime_formatter():
+    """
+    Return a function formatting aware datetimes like DRF's DateTimeField,
+    without re-reading the settings for every value.
+    """
+    field = serializers.DateTimeField()
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if (
+        not settings.USE_TZ
+        or output_format is None
+        or output_format.lower() != ISO_8601
+    ):
+        return field.to_representation
+    tz = timezone.get_current_timezone()
+
+    def to_representation(value):
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return to_representation
+
+
+def device_data_representation(rows):
+    """
+    Return what DeviceDataSerializer(rows, many=True).data holds, for rows
+    with pk, device_id, data and created_at attributes: model instances or
+    ``values_list(*DEVICE_DATA_COLUMNS, named=True)`` tuples.
+    """
+    timestamp = datetime_formatter()
+    return [
+        {
+            'id': row.pk,
+            'device': row.device_id,
+            'data': row.data,
+            'created_at': timestamp(row.created_at),
+        }
+        for row in rows
+    ]
+
+
+def _little_endian(column):
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+
+def columnar_representation(rows, delta=False):
+    """
+    Return the columns of ``rows``, objects with pk, created_at, value and
+    data attributes, with timestamps delta-encoded if ``delta``.
+    """
+    timestamps = [to_micros(row.created_at) for row in rows]
+    if delta:
+        timestamps[1:] = [b - a for a, b in pairwise(timestamps)]
+    return {
+        'timestamp_unit': 'us',
+        'delta': delta,
+        'ids': [row.pk for row in rows],
+        'timestamps': timestamps,
+        'values': [row.value for row in rows],
+        'data': [row.data for row in rows],
+    }
+
+
+def encode_columns(columns):
+    """Pack a columnar_representation() into the binary layout."""
+    encoded = [raw.encode('utf-8') for raw in columns['data']]
+    values = (math.nan if value is None else value for value in columns['values'])
+    return b''.join(
+        [
+            COLUMNS_MAGIC,
+            COLUMNS_HEADER.pack(len(encoded), COLUMNS_DELTA if columns['delta'] else 0),
+            _little_endian(array('q', columns['ids'])).tobytes(),
+            _little_endian(array('q', columns['timestamps'])).tobytes(),
+            _little_endian(array('d', values)).tobytes(),
+            _little_endian(array('I', (len(raw) for raw in encoded))).tobytes(),
+            *encoded,
+        ]
+    )
+
+
+def decode_columns(raw):
+    """Unpack the binary layout into the columns encode_columns() was given."""
+    if not raw.startswith(COLUMNS_MAGIC):
+        raise ValueError('Not a columnar payload')
+    offset = len(COLUMNS_MAGIC)
+    count, flags = COLUMNS_HEADER.unpack_from(raw, offset)
+    offset += COLUMNS_HEADER.size
+    columns = []
+    for typecode in ('q', 'q', 'd', 'I'):
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(raw[offset : offset + size])
+        columns.append(_little_endian(column))
+        offset += size
+    ids, timestamps, values, lengths = columns
+    data = []
+    for length in lengths:
+        data.append(raw[offset : offset + length].decode('utf-8'))
+        offset += length
+    return {
+        'timestamp_unit': 'us',
+        'delta': bool(flags & COLUMNS_DELTA),
+        'ids': list(ids),
+        'timestamps': list(timestamps),
+        'values': [None if math.isnan(value) else value for value in values],
+        'data': data,
+    }
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """JSON renderer selecting the columnar layout of readings."""
+
+    media_type = 'application/vnd.iot.columns+json'
+    format = 'columns'
+
+
+class ColumnarBinaryRenderer(BaseRenderer):
+    """
+    Renderer for the binary columnar layout of readings. Other payloads,
+    such as errors, are sent as plain JSON.
+    """
+
+    media_type = 'application/vnd.iot.columns'
+    format = 'columns-bin'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'timestamps' in data:
+            return encode_columns(data)
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data)
@@ -0,0 +1,192 @@
+"""
+Retention policies: batched purging of expired DeviceData, their rollups and
+DeviceLog.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .archive import drop_segments
+from .conditional import bump_data_version
+from .latest import latest_readings
+from .models import Device, DeviceData, DeviceLog, RetentionPolicy
+from .rollups import expired_rollups, refold_cutoff_buckets
+from .workers import BackgroundWorker, register
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DEFAULTS = {
+    'ENABLED': False,
+    'INTERVAL': 3600,
+    'BATCH_SIZE': 1000,
+    'BATCH_PAUSE': 0.05,
+    'VACUUM_PAGES': 1000,
+}
+
+# PRAGMA auto_vacuum value of a SQLite database in incremental mode
+SQLITE_AUTO_VACUUM_INCREMENTAL = 2
+
+
+def get_retention_settings():
+    return {
+        **RETENTION_DEFAULTS,
+        **getattr(settings, 'DEVICE_DATA_RETENTION', {}),
+    }
+
+
+def expiry_cutoffs(now=None):
+    """
+    Yield (device_id, data_cutoff, log_cutoff) for every device covered by a
+    retention policy. A cutoff is None when that kind of row is kept forever.
+    """
+    now = now or timezone.now()
+    owner_policies = {}
+    device_policies = {}
+    for policy in RetentionPolicy.objects.all():
+        if policy.device_id is not None:
+            device_policies[policy.device_id] = policy
+        else:
+            owner_policies[policy.owner_id] = policy
+    if not (owner_policies or device_policies):
+        return
+
+    def cutoff(days):
+        return None if days is None else now - timedelta(days=days)
+
+    devices = Device.objects.filter(
+        Q(pk__in=device_policies) | Q(owner_id__in=owner_policies)
+    ).values_list('pk', 'owner_id')
+    for device_id, owner_id in devices.iterator():
+        policy = device_policies.get(device_id) or owner_policies[owner_id]
+        yield device_id, cutoff(policy.data_days), cutoff(policy.log_days)
+
+
+def purge_rows(queryset, batch_size, pause=0, should_stop=None):
+    """
+    Delete the rows of ``queryset`` in primary-key ranges of at most
+    ``batch_size`` rows, each in its own short transaction, sleeping ``pause``
+    seconds in between so writers can take the lock. Return the number of
+    rows deleted.
+    """
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        count, _ = queryset.filter(pk__range=(pks[0], pks[-1])).delete()
+        deleted += count
+        if len(pks) < batch_size or (should_stop and should_stop()):
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def reclaim_space(max_pages):
+    """
+    Hand up to ``max_pages`` free pages back to the filesystem with SQLite's
+    incremental vacuum and return how many were freed. Returns None when the
+    database cannot do this, i.e. it is not SQLite or its auto_vacuum mode is
+    not INCREMENTAL.
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] != SQLITE_AUTO_VACUUM_INCREMENTAL:
+            return None
+        cursor.execute('PRAGMA freelist_count')
+        before = cursor.fetchone()[0]
+        cursor.execute(f'PRAGMA incremental_vacuum({int(max_pages)})')
+        # The pragma frees one page per step
+        cursor.fetchall()
+        cursor.execute('PRAGMA freelist_count')
+        return before - cursor.fetchone()[0]
+
+
+def purge_expired(now=None, batch_size=None, pause=None, should_stop=None):
+    """
+    Delete the readings, along with their rollup buckets, and logs that are
+    older than their retention policy allows. Return a dict with the number of deleted readings and logs, the
+    freed pages (None if space cannot be reclaimed incrementally) and the
+    elapsed seconds.
+    """
+    config = get_retention_settings()
+    if batch_size is None:
+        batch_size = config['BATCH_SIZE']
+    if pause is None:
+        pause = config['BATCH_PAUSE']
+
+    started = time.monotonic()
+    stats = {'data': 0, 'logs': 0, 'pages': None, 'seconds': 0.0}
+    for device_id, data_cutoff, log_cutoff in expiry_cutoffs(now):
+        deleted = 0
+        if data_cutoff is not None:
+            expired = DeviceData.objects.filter(
+                device_id=device_id, created_at__lt=data_cutoff
+            )
+            count = purge_rows(expired, batch_size, pause, should_stop)
+            # Whole archived days past the cutoff go as well
+            count += drop_segments(device_id, data_cutoff)
+            # Rollups serve bucketed queries, so expire them in the same pass
+            rollups = purge_rows(
+                expired_rollups(device_id, data_cutoff), batch_size, pause, should_stop
+            )
+            if count or rollups:
+                refold_cutoff_buckets(device_id, data_cutoff)
+                bump_data_version([device_id])
+                # The latest reading may be gone as well
+                latest_readings.forget([device_id])
+            stats['data'] += count
+            deleted += count
+        if log_cutoff is not None:
+            expired = DeviceLog.objects.filter(
+                device_id=device_id, created_at__lt=log_cutoff
+            )
+            count = purge_rows(expired, batch_size, pause, should_stop)
+            stats['logs'] += count
+            deleted += count
+        if deleted:
+            pages = reclaim_space(config['VACUUM_PAGES'])
+            if pages is not None:
+                stats['pages'] = (stats['pages'] or 0) + pages
+        if should_stop and should_stop():
+            break
+    stats['seconds'] = time.monotonic() - started
+    return stats
+
+
+class RetentionPurger(BackgroundWorker):
+    """
+    Run ``purge_expired()`` every INTERVAL seconds of DEVICE_DATA_RETENTION.
+    """
+
+    name = 'device-retention-purge'
+    drain_on_stop = False
+
+    @property
+    def enabled(self):
+        return get_retention_settings()['ENABLED']
+
+    @property
+    def interval(self):
+        return get_retention_settings()['INTERVAL']
+
+    def run_once(self):
+        stats = purge_expired(should_stop=lambda: self.stopping)
+        if stats['data'] or stats['logs']:
+            logger.info(
+                'Purged %d readings and %d logs in %.1fs',
+                stats['data'],
+                stats['logs'],
+                stats['seconds'],
+            )
+
+
+purger = register(RetentionPurger())
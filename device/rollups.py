@@ -0,0 +1,398 @@
+"""
+Precomputed per-device rollups of numeric DeviceData.
+
+Rollups are folded in by ``device.ingest.write_readings`` in the same
+transaction as the readings themselves. Readings stored any other way, and
+data that predates the rollup tables, are picked up by the
+``rebuild_rollups`` management command.
+"""
+
+from collections import defaultdict
+from datetime import UTC, datetime, timedelta
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+
+from .archive import archived_days, archived_values, day_bounds
+from .models import DeviceData, DeviceDataRollup
+from .timeseries import TimeBucket, aggregate_buckets, numeric_readings
+
+# Coarsest first, so the first resolution that divides a bucket is the best
+RESOLUTIONS = sorted(DeviceDataRollup.Resolution.values, reverse=True)
+
+ROLLUP_BATCH_SIZE = 500
+
+# Upper bound on bucket starts per lookup query, well below the SQLite
+# parameter limit
+LOOKUP_MAX_PARAMS = 500
+
+
+def epoch_to_datetime(epoch):
+    return datetime.fromtimestamp(epoch, tz=UTC)
+
+
+def floor_to(moment, seconds):
+    """Return the start of the epoch-aligned ``seconds`` bucket of ``moment``."""
+    return epoch_to_datetime(int(moment.timestamp()) // seconds * seconds)
+
+
+def pick_resolution(seconds):
+    """Return the coarsest rollup resolution that divides ``seconds``, or None."""
+    for resolution in RESOLUTIONS:
+        if seconds % resolution == 0:
+            return resolution
+    return None
+
+
+def summarize(readings):
+    """
+    Fold the numeric ``readings`` into a dict mapping
+    (device_id, resolution, bucket_start) to [count, sum, min, max].
+    """
+    deltas = {}
+    for reading in readings:
+        value = reading.value
+        if value is None:
+            continue
+        for resolution in RESOLUTIONS:
+            key = (
+                reading.device_id,
+                resolution,
+                floor_to(reading.created_at, resolution),
+            )
+            delta = deltas.get(key)
+            if delta is None:
+                deltas[key] = [1, value, value, value]
+            else:
+                delta[0] += 1
+                delta[1] += value
+                delta[2] = min(delta[2], value)
+                delta[3] = max(delta[3], value)
+    return deltas
+
+
+def _lookups(keys):
+    """
+    Yield filters that together match the rollup rows of ``keys``, each with
+    at most LOOKUP_MAX_PARAMS bucket starts. The filters may match a few extra
+    rows, which callers ignore.
+    """
+    series = defaultdict(lambda: (set(), set()))
+    for device_id, resolution, bucket_start in keys:
+        device_ids, starts = series[resolution]
+        device_ids.add(device_id)
+        starts.add(bucket_start)
+
+    lookup = Q()
+    size = 0
+    for resolution, (device_ids, starts) in series.items():
+        starts = sorted(starts)
+        for offset in range(0, len(starts), LOOKUP_MAX_PARAMS):
+            chunk = starts[offset : offset + LOOKUP_MAX_PARAMS]
+            if size and size + len(chunk) > LOOKUP_MAX_PARAMS:
+                yield lookup
+                lookup = Q()
+                size = 0
+            lookup |= Q(
+                resolution=resolution,
+                device_id__in=device_ids,
+                bucket_start__in=chunk,
+            )
+            size += len(chunk)
+    if size:
+        yield lookup
+
+
+def _apply(deltas):
+    """Merge ``deltas`` into existing rollup rows and create the missing ones."""
+    pending = dict(deltas)
+    updated = []
+    for lookup in _lookups(deltas):
+        for rollup in DeviceDataRollup.objects.select_for_update().filter(lookup):
+            delta = pending.pop(
+                (rollup.device_id, rollup.resolution, rollup.bucket_start), None
+            )
+            if delta is None:
+                continue
+            count, total, low, high = delta
+            rollup.count += count
+            rollup.sum += total
+            rollup.min = min(rollup.min, low)
+            rollup.max = max(rollup.max, high)
+            updated.append(rollup)
+
+    DeviceDataRollup.objects.bulk_update(
+        updated, ['count', 'sum', 'min', 'max'], batch_size=ROLLUP_BATCH_SIZE
+    )
+    if not pending:
+        return
+    try:
+        with transaction.atomic():
+            DeviceDataRollup.objects.bulk_create(
+                [
+                    DeviceDataRollup(
+                        device_id=device_id,
+                        resolution=resolution,
+                        bucket_start=bucket_start,
+                        count=count,
+                        sum=total,
+                        min=low,
+                        max=high,
+                    )
+                    for (device_id, resolution, bucket_start), (
+                        count,
+                        total,
+                        low,
+                        high,
+                    ) in pending.items()
+                ],
+                batch_size=ROLLUP_BATCH_SIZE,
+            )
+    except IntegrityError:
+        # A concurrent writer created some of these buckets first
+        _apply(pending)
+
+
+def update_rollups(readings):
+    """
+    Fold freshly stored ``readings`` into their rollup buckets. Must run
+    inside the transaction that stored them.
+    """
+    deltas = summarize(readings)
+    if deltas:
+        _apply(deltas)
+
+
+def rebuild_rollups(device_id):
+    """
+    Recompute every rollup of one device from its stored and archived
+    readings and return the number of rollup rows.
+    """
+    readings = numeric_readings(DeviceData.objects.filter(device_id=device_id))
+    with transaction.atomic():
+        DeviceDataRollup.objects.filter(device_id=device_id).delete()
+        for resolution in RESOLUTIONS:
+            rows = (
+                readings.order_by()
+                .annotate(bucket=TimeBucket('created_at', resolution))
+                .values('bucket')
+                .annotate(
+                    total_count=Count('value'),
+                    total=Sum('value'),
+                    low=Min('value'),
+                    high=Max('value'),
+                )
+                .iterator()
+            )
+            rollups = (
+                DeviceDataRollup(
+                    device_id=device_id,
+                    resolution=resolution,
+                    bucket_start=epoch_to_datetime(row['bucket']),
+                    count=row['total_count'],
+                    sum=row['total'],
+                    min=row['low'],
+                    max=row['high'],
+                )
+                for row in rows
+            )
+            # Keep memory bounded for devices with years of history
+            while batch := list(islice(rollups, ROLLUP_BATCH_SIZE)):
+                DeviceDataRollup.objects.bulk_create(batch)
+
+        # Archived readings are no longer in DeviceData; fold them in per day
+        for day in archived_days(device_id):
+            update_rollups(
+                DeviceData(device_id=device_id, created_at=created_at, value=value)
+                for created_at, value in archived_values(device_id, *day_bounds(day))
+            )
+        return DeviceDataRollup.objects.filter(device_id=device_id).count()
+
+
+def expired_rollups(device_id, cutoff):
+    """Return the rollup rows of one device whose bucket ends by ``cutoff``."""
+    ended = Q()
+    for resolution in RESOLUTIONS:
+        ended |= Q(
+            resolution=resolution,
+            bucket_start__lte=cutoff - timedelta(seconds=resolution),
+        )
+    return DeviceDataRollup.objects.filter(ended, device_id=device_id)
+
+
+def refold_cutoff_buckets(device_id, cutoff):
+    """
+    Recompute the rollup buckets of one device that straddle ``cutoff`` from
+    the stored and archived readings left in them, after older readings were
+    purged. Buckets left empty are deleted.
+    """
+    with transaction.atomic():
+        for resolution in RESOLUTIONS:
+            start = floor_to(cutoff, resolution)
+            if start == cutoff:
+                continue
+            end = start + timedelta(seconds=resolution)
+            totals = numeric_readings(
+                DeviceData.objects.filter(
+                    device_id=device_id, created_at__gte=start, created_at__lt=end
+                )
+            ).aggregate(
+                count=Count('value'),
+                sum=Sum('value'),
+                min=Min('value'),
+                max=Max('value'),
+            )
+            buckets = {}
+            if totals['count']:
+                buckets[0] = [
+                    totals['count'],
+                    totals['sum'],
+                    totals['min'],
+                    totals['max'],
+                ]
+            for _, value in archived_values(device_id, start, end):
+                _merge(buckets, 0, 1, value, value, value)
+
+            rollups = DeviceDataRollup.objects.filter(
+                device_id=device_id, resolution=resolution, bucket_start=start
+            )
+            if not buckets:
+                rollups.delete()
+                continue
+            count, total, low, high = buckets[0]
+            if not rollups.update(count=count, sum=total, min=low, max=high):
+                DeviceDataRollup.objects.create(
+                    device_id=device_id,
+                    resolution=resolution,
+                    bucket_start=start,
+                    count=count,
+                    sum=total,
+                    min=low,
+                    max=high,
+                )
+
+
+def _finish(buckets, aggregates):
+    results = []
+    for epoch in sorted(buckets):
+        count, total, low, high = buckets[epoch]
+        values = {
+            'avg': total / count,
+            'min': low,
+            'max': high,
+            'sum': total,
+            'count': count,
+        }
+        results.append(
+            {
+                'start': epoch_to_datetime(epoch),
+                **{name: values[name] for name in aggregates},
+            }
+        )
+    return results
+
+
+def _merge(buckets, epoch, count, total, low, high):
+    bucket = buckets.get(epoch)
+    if bucket is None:
+        buckets[epoch] = [count, total, low, high]
+    else:
+        bucket[0] += count
+        bucket[1] += total
+        bucket[2] = min(bucket[2], low)
+        bucket[3] = max(bucket[3], high)
+
+
+def aggregate_series(
+    queryset, device_id, seconds, aggregates, start=None, end=None, archived=None
+):
+    """
+    Same result as ``aggregate_buckets(queryset, seconds, aggregates)`` for
+    the readings of one device between ``start`` and ``end`` (inclusive, and
+    already applied to ``queryset``), read from the coarsest rollup that
+    divides ``seconds``. Only the partial rollup buckets at the edges of the
+    range are aggregated from the raw readings.
+
+    ``archived(start, end)``, if given, yields (created_at, value) of the
+    readings with ``start <= created_at < end`` that were moved out of
+    ``queryset`` into the archive, so they can be counted as raw readings.
+    """
+    resolution = pick_resolution(seconds)
+    if resolution is None and archived is None:
+        return aggregate_buckets(queryset, seconds, aggregates)
+    # Raw readings are read in [start, end + 1us) minus [first, stop)
+    end_exclusive = None if end is None else end + timedelta(microseconds=1)
+
+    # Rollup buckets in [first, stop) lie entirely inside the range
+    first = start
+    stop = end_exclusive
+    if resolution is not None:
+        if start is not None:
+            first = floor_to(start, resolution)
+            if first < start:
+                first += timedelta(seconds=resolution)
+        if end is not None:
+            stop = floor_to(end_exclusive, resolution)
+    use_rollups = resolution is not None and (
+        first is None or stop is None or first < stop
+    )
+
+    buckets = {}
+    if use_rollups:
+        rollups = DeviceDataRollup.objects.filter(
+            device_id=device_id, resolution=resolution
+        )
+        if first is not None:
+            rollups = rollups.filter(bucket_start__gte=first)
+        if stop is not None:
+            rollups = rollups.filter(bucket_start__lt=stop)
+        rows = (
+            rollups.annotate(bucket=TimeBucket('bucket_start', seconds))
+            .values('bucket')
+            .annotate(
+                total_count=Sum('count'),
+                total=Sum('sum'),
+                low=Min('min'),
+                high=Max('max'),
+            )
+        )
+        for row in rows:
+            _merge(
+                buckets,
+                row['bucket'],
+                row['total_count'],
+                row['total'],
+                row['low'],
+                row['high'],
+            )
+        edges = Q()
+        ranges = []
+        if first is not None:
+            edges |= Q(created_at__lt=first)
+            ranges.append((start, first))
+        if stop is not None:
+            edges |= Q(created_at__gte=stop)
+            ranges.append((stop, end_exclusive))
+        raw = queryset.filter(edges) if edges else None
+    else:
+        raw = queryset
+        ranges = [(start, end_exclusive)]
+
+    if raw is not None:
+        for row in aggregate_buckets(raw, seconds, ['count', 'sum', 'min', 'max']):
+            _merge(
+                buckets,
+                int(row['start'].timestamp()),
+                row['count'],
+                row['sum'],
+                row['min'],
+                row['max'],
+            )
+    if archived is not None:
+        for range_start, range_end in ranges:
+            for created_at, value in archived(range_start, range_end):
+                epoch = int(created_at.timestamp()) // seconds * seconds
+                _merge(buckets, epoch, 1, value, value, value)
+
+    return _finish(buckets, aggregates)
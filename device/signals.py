@@ -0,0 +1,15 @@
+"""
+Signals sent by the device app.
+"""
+
+from django.dispatch import Signal
+
+# Sent by device.ingest.write_readings once a batch of readings is stored,
+# with ``readings``, the list of saved DeviceData instances.
+data_ingested = Signal()
+
+# Sent with ``device_ids`` and ``status`` when devices are found to be in
+# ``status``: ONLINE by device.heartbeat when they send a message, OFFLINE by
+# device.liveness when they stopped. The devices may already have been in that
+# status.
+device_status_changed = Signal()
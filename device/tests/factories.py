@@ -1,4 +1,5 @@
 import factory
+from django.utils import timezone
 
 from account.tests.factories import UserFactory
 
@@ -31,3 +32,5 @@ class DeviceDataFactory(factory.django.DjangoModelFactory):
 
     device = factory.SubFactory(DeviceFactory)
     data = factory.Faker('sentence')
+    # Resolve timezone.now at call time so tests can patch it
+    created_at = factory.LazyFunction(lambda: timezone.now())
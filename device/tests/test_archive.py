@@ -0,0 +1,225 @@
+"""
+Tests for the cold-tier archive of DeviceData.
+"""
+
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+
+from .. import archive
+from ..ingest import write_readings
+from ..models import DeviceData, DeviceDataRollup, RetentionPolicy
+from ..retention import purge_expired
+from .factories import DeviceFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+
+def readings(device, count, step=timedelta(hours=1), start=START):
+    return [
+        DeviceData(device=device, data=str(n), created_at=start + step * n)
+        for n in range(count)
+    ]
+
+
+class ArchiveTestMixin:
+    """Point DEVICE_DATA_ARCHIVE at a fresh temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(
+            DEVICE_DATA_ARCHIVE={'ROOT': tmp.name, 'BLOCK_ROWS': 4}
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class SegmentTests(ArchiveTestMixin, TestCase):
+    """Tests for the segment file format."""
+
+    def setUp(self):
+        super().setUp()
+        self.path = archive.get_archive_root() / 'segment.seg'
+        self.rows = [
+            (100 + n, 1_700_000_000_000_000 + n * 1_000_000, n / 2, f'{n / 2} C')
+            for n in range(20)
+        ]
+        self.rows[3] = (103, self.rows[3][1], None, 'door open')
+        archive.write_segment(self.path, self.rows)
+
+    def test_round_trip(self):
+        with archive.Segment(self.path) as segment:
+            self.assertEqual(segment.row_count, 20)
+            self.assertEqual(segment.block_count, 5)
+            self.assertListEqual(list(segment.read()), self.rows)
+            self.assertListEqual(
+                list(segment.read(reverse=True)), list(reversed(self.rows))
+            )
+
+    def test_range_read_decodes_only_overlapping_blocks(self):
+        start, end = self.rows[5][1], self.rows[10][1]
+        with (
+            archive.Segment(self.path) as segment,
+            patch.object(
+                archive, '_decode_block', wraps=archive._decode_block
+            ) as decode,
+        ):
+            rows = list(segment.read(start, end))
+
+        self.assertListEqual(rows, self.rows[5:10])
+        # Rows 5..9 live in blocks 1 and 2
+        self.assertEqual(decode.call_count, 2)
+
+
+class ArchiveTests(ArchiveTestMixin, TestCase):
+    """Tests for moving readings to and from the archive."""
+
+    def setUp(self):
+        super().setUp()
+        self.device = DeviceFactory()
+        write_readings(readings(self.device, 48))
+
+    def test_archive_moves_full_days_before_cutoff(self):
+        moved = archive.archive_before(START + timedelta(days=1, hours=5))
+
+        # 2025-04-01 08:00 to 23:00 is archived, 2025-04-02 is not complete
+        self.assertDictEqual(moved, {self.device.pk: 16})
+        self.assertEqual(DeviceData.objects.filter(device=self.device).count(), 32)
+        self.assertListEqual(archive.archived_days(self.device.pk), [START.date()])
+        archived = archive.read_archive(self.device.pk)
+        self.assertListEqual(
+            [reading.data for reading in archived], [str(n) for n in range(16)]
+        )
+        self.assertEqual(archived[0].created_at, START)
+        self.assertEqual(archived[0].value, 0.0)
+
+    def test_late_readings_are_merged_into_the_segment(self):
+        archive.archive_before(START + timedelta(days=1))
+        write_readings([DeviceData(device=self.device, data='late', created_at=START)])
+        moved = archive.archive_before(START + timedelta(days=1))
+
+        self.assertDictEqual(moved, {self.device.pk: 1})
+        archived = archive.read_archive(self.device.pk)
+        self.assertEqual(len(archived), 17)
+        self.assertListEqual([r.data for r in archived[:2]], ['0', 'late'])
+
+    def test_read_archive_keyset(self):
+        archive.archive_before(START + timedelta(days=1))
+        archived = archive.read_archive(self.device.pk)
+        after = (archived[5].created_at, archived[5].pk)
+
+        forward = archive.read_archive(self.device.pk, after=after, limit=3)
+        self.assertListEqual(forward, archived[6:9])
+        backward = archive.read_archive(
+            self.device.pk, after=after, reverse=True, limit=3
+        )
+        self.assertListEqual(backward, archived[2:5][::-1])
+
+    def test_rebuild_rollups_includes_archive(self):
+        rollups = DeviceDataRollup.objects.order_by('resolution', 'bucket_start')
+        expected = list(rollups.values_list('bucket_start', 'count', 'sum'))
+        archive.archive_before(START + timedelta(days=2))
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertListEqual(
+            list(rollups.values_list('bucket_start', 'count', 'sum')), expected
+        )
+
+    def test_retention_drops_expired_segments(self):
+        archive.archive_before(START + timedelta(days=2))
+        RetentionPolicy.objects.create(device=self.device, data_days=1)
+
+        stats = purge_expired(now=START + timedelta(days=2, hours=2), pause=0)
+
+        self.assertEqual(stats['data'], 16)
+        self.assertListEqual(
+            archive.archived_days(self.device.pk),
+            [START.date() + timedelta(days=1)],
+        )
+
+    def test_segments_are_deleted_with_the_device(self):
+        archive.archive_before(START + timedelta(days=1))
+        device_dir = archive.get_archive_root() / str(self.device.pk)
+        self.assertTrue(device_dir.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.device.delete()
+        self.assertFalse(device_dir.exists())
+
+    def test_command(self):
+        out = StringIO()
+        with patch('django.utils.timezone.now', return_value=START + timedelta(days=3)):
+            call_command('archive_device_data', '--days', '0', stdout=out)
+
+        self.assertIn('Archived 48 readings of 1 devices', out.getvalue())
+        self.assertFalse(DeviceData.objects.exists())
+
+
+class ArchivedDataAPITests(ArchiveTestMixin, APITestCase):
+    """Tests for GET /api/devices/{pk}/data/ over archived time."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserFactory()
+        self.device = DeviceFactory(owner=self.user)
+        write_readings(readings(self.device, 48))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+
+    def get_all(self, params):
+        values = []
+        response = self.client.get(self.url, params)
+        values += [item['data'] for item in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            values += [item['data'] for item in response.data['results']]
+        return values
+
+    def test_pages_span_archive_and_database(self):
+        before = self.get_all({'page_size': 7})
+        archive.archive_before(START + timedelta(days=1))
+
+        self.assertListEqual(self.get_all({'page_size': 7}), before)
+        self.assertListEqual(before, [str(n) for n in range(48)])
+
+    def test_range_inside_archived_time(self):
+        archive.archive_before(START + timedelta(days=1))
+        params = {'start': '2025-04-01T10:00:00Z', 'end': '2025-04-01T12:00:00Z'}
+
+        response = self.client.get(self.url, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(
+            [item['data'] for item in response.data['results']], ['2', '3', '4']
+        )
+
+    def test_aggregates_and_points_are_unchanged_by_archiving(self):
+        queries = [
+            {'bucket': '1d', 'agg': 'count,sum,min,max'},
+            {
+                'bucket': '1d',
+                'agg': 'count,sum',
+                'start': '2025-04-01T10:30:00Z',
+                'end': '2025-04-02T03:00:00Z',
+            },
+            {'bucket': '90m', 'agg': 'count,max'},
+            {'points': 5},
+        ]
+        before = [self.client.get(self.url, params).data for params in queries]
+        archive.archive_before(START + timedelta(days=1))
+        after = [self.client.get(self.url, params).data for params in queries]
+
+        self.assertListEqual(after, before)
@@ -0,0 +1,140 @@
+"""
+Tests for the columnar layouts of DeviceData listings.
+"""
+
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+
+from ..archive import to_micros
+from ..ingest import write_readings
+from ..models import DeviceData
+from ..renderers import decode_columns, encode_columns
+from .factories import DeviceFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+COLUMNS_JSON = 'application/vnd.iot.columns+json'
+COLUMNS_BINARY = 'application/vnd.iot.columns'
+
+
+class ColumnarListTests(APITestCase):
+    """Tests for GET /api/devices/{pk}/data/ in the columnar layouts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.device = DeviceFactory(owner=cls.user)
+        write_readings(
+            [
+                DeviceData(
+                    device=cls.device,
+                    data='offline' if n % 4 == 3 else f'{n / 2} °C',
+                    created_at=START + timedelta(seconds=n * 10, microseconds=n),
+                )
+                for n in range(20)
+            ]
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+
+    def listed(self, **params):
+        response = self.client.get(self.url, {'page_size': 1000, **params})
+        return response.json()['results']
+
+    def test_json_columns(self):
+        """
+        GET /api/devices/{pk}/data/?format=columns return 200 with parallel
+        arrays of the readings.
+        """
+        response = self.client.get(self.url, {'format': 'columns', 'page_size': 8})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], COLUMNS_JSON)
+        body = response.json()
+        readings = DeviceData.objects.order_by('created_at', 'id')[:8]
+        self.assertEqual(body['timestamp_unit'], 'us')
+        self.assertFalse(body['delta'])
+        self.assertListEqual(body['ids'], [row.pk for row in readings])
+        self.assertListEqual(
+            body['timestamps'], [to_micros(row.created_at) for row in readings]
+        )
+        self.assertListEqual(body['values'], [row.value for row in readings])
+        self.assertIsNone(body['values'][3])
+        self.assertListEqual(body['data'], [row.data for row in readings])
+        self.assertIsNone(body['previous'])
+        self.assertIn('rel="next"', response['Link'])
+
+    def test_pages_follow_the_links(self):
+        url, params, ids = self.url, {'page_size': 8}, []
+        while url:
+            body = self.client.get(url, params, HTTP_ACCEPT=COLUMNS_JSON).json()
+            ids += body['ids']
+            url, params = body['next'], None
+        self.assertListEqual(ids, [item['id'] for item in self.listed()])
+
+    def test_delta_timestamps(self):
+        plain = self.client.get(self.url, {'format': 'columns'}).json()
+        delta = self.client.get(self.url, {'format': 'columns', 'delta': 1}).json()
+
+        self.assertTrue(delta['delta'])
+        self.assertEqual(delta['timestamps'][1], 10_000_001)
+        self.assertListEqual(list(accumulate(delta['timestamps'])), plain['timestamps'])
+
+    def test_binary_columns_match_json(self):
+        """
+        GET /api/devices/{pk}/data/ with Accept: application/vnd.iot.columns
+        return 200 with the same columns packed as little-endian arrays.
+        """
+        for delta in ('0', '1'):
+            params = {'page_size': 8, 'delta': delta}
+            response = self.client.get(self.url, params, HTTP_ACCEPT=COLUMNS_BINARY)
+            expected = self.client.get(self.url, params, HTTP_ACCEPT=COLUMNS_JSON)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], COLUMNS_BINARY)
+            self.assertIn('rel="next"', response['Link'])
+            columns = expected.json()
+            del columns['next'], columns['previous']
+            self.assertDictEqual(decode_columns(response.content), columns)
+
+    def test_columns_are_smaller(self):
+        default = self.client.get(self.url).content
+        columns = self.client.get(self.url, {'format': 'columns', 'delta': 1}).content
+        binary = self.client.get(self.url, {'format': 'columns-bin'}).content
+
+        self.assertLess(len(columns), len(default) * 0.6)
+        self.assertLess(len(binary), len(default) * 0.6)
+
+    def test_aggregates_are_not_columnar(self):
+        for params in ({'bucket': '1h'}, {'points': 5}):
+            response = self.client.get(self.url, {**params, 'format': 'columns'})
+            self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+    def test_errors_stay_json(self):
+        response = self.client.get(self.url, {'points': 5}, HTTP_ACCEPT=COLUMNS_BINARY)
+        self.assertEqual(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', response.json())
+
+    def test_encode_round_trip(self):
+        columns = {
+            'timestamp_unit': 'us',
+            'delta': False,
+            'ids': [1, 2**40],
+            'timestamps': [-5, 1_700_000_000_000_000],
+            'values': [None, -1.25],
+            'data': ['', 'café 温度 \U0001f321'],
+        }
+        self.assertDictEqual(decode_columns(encode_columns(columns)), columns)
+        with self.assertRaises(ValueError):
+            decode_columns(b'{"ids": []}')
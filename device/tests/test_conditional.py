@@ -0,0 +1,202 @@
+"""
+Tests for conditional GETs of devices and device data.
+"""
+
+from datetime import datetime, timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+
+from .. import archive, retention
+from ..heartbeat import heartbeats
+from ..ingest import write_readings
+from ..liveness import sweeper
+from ..models import Device, DeviceData, RetentionPolicy
+from ..ownership import device_access
+from .factories import DeviceFactory
+from .test_archive import ArchiveTestMixin
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+
+class ConditionalTestMixin:
+    def setUp(self):
+        super().setUp()
+        device_access.clear()
+        self.addCleanup(device_access.clear)
+        self.user = UserFactory()
+        self.device = DeviceFactory(owner=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertNotModified(self, url, etag, params=None, **headers):
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        return response
+
+    def assertModified(self, url, etag, params=None, **headers):
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+
+class DeviceDataConditionalTests(ConditionalTestMixin, ArchiveTestMixin, APITestCase):
+    """Tests for conditional GET /api/devices/{pk}/data/."""
+
+    def setUp(self):
+        super().setUp()
+        self.write(range(10))
+        self.url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+
+    def write(self, hours):
+        write_readings(
+            [
+                DeviceData(
+                    device=self.device,
+                    data=str(n),
+                    created_at=START + timedelta(hours=n),
+                )
+                for n in hours
+            ]
+        )
+
+    def test_unchanged_data_is_not_modified(self):
+        """
+        GET /api/devices/{pk}/data/ with If-None-Match of the current ETag
+        return 304 after a single query, without reading the data.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Accept', response['Vary'])
+        etag = response['ETag']
+
+        # The data version; the permission check is served from the cache
+        with self.assertNumQueries(1):
+            self.assertNotModified(self.url, etag)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"a", W/{etag}')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.write([20])
+
+        response = self.assertModified(self.url, etag)
+        self.assertEqual(len(response.data['results']), 11)
+
+    def test_retention_and_archive_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        archive.archive_before(START + timedelta(days=1))
+        etag = self.assertModified(self.url, etag)['ETag']
+
+        RetentionPolicy.objects.create(owner=self.user, data_days=1, log_days=1)
+        retention.purge_expired()
+        self.assertModified(self.url, etag)
+
+    def test_etag_depends_on_the_request(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.assertModified(self.url, etag, {'page_size': 5})
+        self.assertModified(self.url, etag, {'format': 'columns'})
+        self.assertModified(self.url, etag, {'bucket': '1h'})
+
+        other = DeviceFactory(owner=self.user)
+        other_url = reverse('device:device-data', kwargs={'pk': other.pk})
+        self.write([30])
+        etag = self.client.get(other_url)['ETag']
+        self.assertNotModified(other_url, etag)
+
+    def test_errors_have_no_etag(self):
+        response = self.client.get(self.url, {'bucket': '5x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('ETag', response)
+
+
+class DeviceConditionalTests(ConditionalTestMixin, APITestCase):
+    """Tests for conditional GET /api/devices/ and /api/devices/{pk}/."""
+
+    def setUp(self):
+        super().setUp()
+        self.list_url = reverse('device:device-list')
+        self.detail_url = reverse('device:device-detail', kwargs={'pk': self.device.pk})
+
+    def test_unchanged_devices_are_not_modified(self):
+        """
+        GET /api/devices/ with If-None-Match of the current ETag return 304.
+        """
+        DeviceFactory(owner=self.user)
+        etag = self.client.get(self.list_url)['ETag']
+
+        with self.assertNumQueries(1):
+            self.assertNotModified(self.list_url, etag)
+
+    def test_changes_to_devices_change_the_etag(self):
+        etag = self.client.get(self.list_url)['ETag']
+
+        # Status changes made with update() by the offline sweeper
+        Device.objects.filter(pk=self.device.pk).update(
+            last_seen=timezone.now() - timedelta(hours=1)
+        )
+        sweeper.schedule(self.device.pk, timezone.now() - timedelta(hours=1), 60)
+        sweeper.run_once()
+        etag = self.assertModified(self.list_url, etag)['ETag']
+
+        heartbeats.record(self.device.pk, timezone.now())
+        etag = self.assertModified(self.list_url, etag)['ETag']
+
+        self.client.patch(self.detail_url, {'name': 'renamed'}, format='json')
+        response = self.assertModified(self.list_url, etag)
+        self.assertEqual(response.data[0]['name'], 'renamed')
+        etag = response['ETag']
+
+        DeviceFactory(owner=self.user)
+        etag = self.assertModified(self.list_url, etag)['ETag']
+
+        self.device.delete()
+        self.assertModified(self.list_url, etag)
+
+    def test_moving_a_device_changes_both_lists(self):
+        other_user = UserFactory()
+        other_client = APIClient()
+        other_client.force_authenticate(other_user)
+        DeviceFactory(owner=other_user)
+        etag = self.client.get(self.list_url)['ETag']
+        other_etag = other_client.get(self.list_url)['ETag']
+
+        self.device.owner = other_user
+        self.device.save()
+
+        self.assertModified(self.list_url, etag)
+        response = other_client.get(self.list_url, HTTP_IF_NONE_MATCH=other_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get(self.list_url)['ETag']
+        self.client.force_authenticate(UserFactory())
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_device_detail(self):
+        """
+        GET /api/devices/{pk}/ with If-None-Match of the current ETag return
+        304 while the device is unchanged.
+        """
+        etag = self.client.get(self.detail_url)['ETag']
+        DeviceFactory(owner=self.user)
+        self.assertNotModified(self.detail_url, etag)
+
+        Device.objects.filter(pk=self.device.pk).update(
+            status=Device.DeviceStatus.ERROR
+        )
+        etag = self.assertModified(self.detail_url, etag)['ETag']
+
+        Device.objects.filter(pk=self.device.pk).update(name='renamed')
+        self.assertModified(self.detail_url, etag)
@@ -5,6 +5,7 @@ Tests for api endpoints about DeviceData.
 from datetime import datetime
 from unittest.mock import patch
 
+from django.test import override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
@@ -12,6 +13,7 @@ from rest_framework.test import APIClient, APITestCase
 
 from account.tests.factories import UserFactory
 
+from ..ingest import BufferFull
 from ..models import Device, DeviceData
 from .factories import DeviceDataFactory, DeviceFactory
 
@@ -50,9 +52,9 @@ class DeviceDataAPITests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Expect 3 records
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data['results']), 3)
         # Check timestamps sorted
-        timestamps = [item['created_at'] for item in response.data]
+        timestamps = [item['created_at'] for item in response.data['results']]
         self.assertListEqual(timestamps, sorted(timestamps))
 
     def test_get_data_with_time_interval(self):
@@ -65,8 +67,28 @@ class DeviceDataAPITests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Only data_2 (12:00) falls between 09:00 and 17:00
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['data'], '20')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['data'], '20')
+
+    def test_get_data_ordered_by_created_at(self):
+        """
+        Data is returned in created_at order even when inserted out of order.
+        """
+        earliest = DeviceDataFactory(
+            device=self.device,
+            data='5',
+            created_at=datetime(
+                2025, 4, 1, 6, 0, tzinfo=timezone.get_default_timezone()
+            ),
+        )
+        url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(
+            [item['id'] for item in response.data['results']],
+            [earliest.pk, self.data_1.pk, self.data_2.pk, self.data_3.pk],
+        )
 
     def test_get_data_with_invalid_time_interval(self):
         pass
@@ -89,7 +111,8 @@ class DeviceDataAPITests(APITestCase):
 
     def test_add_data_to_offline_or_error_device(self):
         """
-        POST /api/devices/{id}/data/ returns 409 if device is either OFFLINE or ERROR.
+        POST /api/devices/{id}/data/ returns 201 and brings the device back
+        online if it is OFFLINE; 409 if it is in ERROR.
         """
         # Suppose that device.status is OFFLINE
         offline_dev = DeviceFactory(status=Device.DeviceStatus.OFFLINE, owner=self.user)
@@ -97,11 +120,12 @@ class DeviceDataAPITests(APITestCase):
         url = reverse('device:device-data', kwargs={'pk': offline_dev.pk})
         response = self.client.post(url, new_data, format='json')
 
-        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
-        # Check if the data exists in the DB
-        self.assertFalse(
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(
             DeviceData.objects.filter(device=offline_dev.pk, data=new_data['data'])
         )
+        offline_dev.refresh_from_db()
+        self.assertEqual(offline_dev.status, Device.DeviceStatus.ONLINE)
 
         # Suppose that device.status is ERROR
         error_dev = DeviceFactory(status=Device.DeviceStatus.ERROR, owner=self.user)
@@ -115,6 +139,34 @@ class DeviceDataAPITests(APITestCase):
             DeviceData.objects.filter(device=error_dev.pk, data=new_data['data'])
         )
 
+    @override_settings(DEVICE_DATA_WRITE_BEHIND={'ENABLED': True})
+    def test_add_data_write_behind_returns_accepted(self):
+        """
+        POST /api/devices/{id}/data/ returns 202 when write-behind is enabled.
+        """
+        url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+        response = self.client.post(url, {'data': 'queued'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['data'], 'queued')
+        # Without a running writer thread the reading is written inline
+        self.assertTrue(
+            DeviceData.objects.filter(device=self.device, data='queued').exists()
+        )
+
+    @override_settings(DEVICE_DATA_WRITE_BEHIND={'ENABLED': True})
+    def test_add_data_write_behind_buffer_full(self):
+        """
+        POST /api/devices/{id}/data/ returns 503 + Retry-After when the buffer is full.
+        """
+        url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+        with patch('device.views.write_behind.submit', side_effect=BufferFull):
+            response = self.client.post(url, {'data': 'dropped'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+        self.assertFalse(DeviceData.objects.filter(data='dropped').exists())
+
 
 class DeviceDataAccessControlTests(APITestCase):
     """Ensure device-data API enforces object-level permissions on every endpoint."""
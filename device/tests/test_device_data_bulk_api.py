@@ -0,0 +1,373 @@
+"""
+Tests for bulk ingest endpoints about DeviceData.
+"""
+
+from datetime import timedelta
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+from alert_rule.evaluator import evaluator
+
+from ..liveness import OfflineSweeper, timeout_for
+from ..models import Device, DeviceData
+from ..ownership import device_access
+from .factories import DeviceFactory
+
+
+class DeviceDataBulkAPITests(APITestCase):
+    """Tests for POST /api/devices/{pk}/data/bulk/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.other_user = UserFactory()
+        cls.device = DeviceFactory(owner=cls.user)
+        cls.other_dev = DeviceFactory(owner=cls.other_user)
+
+    def setUp(self):
+        device_access.clear()
+        evaluator.clear()
+        self.addCleanup(device_access.clear)
+        self.addCleanup(evaluator.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device:device-data-bulk', kwargs={'pk': self.device.pk})
+
+    def test_bulk_create_all_valid(self):
+        """
+        A batch of valid readings is stored and returns 201 with per-item ids.
+        """
+        payload = [{'data': str(value)} for value in range(5)]
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(response.data['rejected'], 0)
+
+        ids = [result['id'] for result in response.data['results']]
+        stored = DeviceData.objects.filter(pk__in=ids).order_by('pk')
+        self.assertListEqual(
+            [row.data for row in stored], [item['data'] for item in payload]
+        )
+
+    def test_bulk_create_uses_constant_queries(self):
+        """
+        Ingest cost is per batch: the query count does not grow with batch size.
+        """
+        # Create the rollup buckets of the current minute up front
+        self.client.post(self.url, [{'data': '1'}], format='json')
+        # Savepoint, insert, rollup lookup, rollup update, data version bump,
+        # release; ownership and status come from the ownership cache, alert
+        # rules from the rule cache
+        with self.assertNumQueries(6):
+            self.client.post(self.url, [{'data': '1'}] * 10, format='json')
+        with self.assertNumQueries(6):
+            self.client.post(self.url, [{'data': '1'}] * 100, format='json')
+
+    def test_bulk_create_partial_failure(self):
+        """
+        Invalid items are rejected individually while valid ones are stored.
+        """
+        payload = [{'data': '10'}, {'data': ''}, 'oops', {'data': '30'}]
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            [201, 400, 400, 201],
+        )
+        self.assertIn('data', response.data['results'][1]['errors'])
+        self.assertEqual(DeviceData.objects.filter(device=self.device).count(), 2)
+
+    def test_bulk_create_all_invalid(self):
+        """
+        A batch where no item is valid returns 400 and stores nothing.
+        """
+        response = self.client.post(self.url, [{'data': ''}], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(DeviceData.objects.filter(device=self.device).exists())
+
+    def test_bulk_create_rejects_non_list_body(self):
+        """
+        The body must be a non-empty JSON array.
+        """
+        for payload in ({'data': '10'}, []):
+            response = self.client.post(self.url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(DEVICE_DATA_BULK_MAX_ITEMS=3)
+    def test_bulk_create_rejects_oversized_batch(self):
+        """
+        Batches above DEVICE_DATA_BULK_MAX_ITEMS are rejected as a whole.
+        """
+        response = self.client.post(self.url, [{'data': '1'}] * 4, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(DeviceData.objects.filter(device=self.device).exists())
+
+    def test_bulk_create_error_device(self):
+        """
+        The whole batch returns 409 if the device is in ERROR.
+        """
+        error_dev = DeviceFactory(status=Device.DeviceStatus.ERROR, owner=self.user)
+        url = reverse('device:device-data-bulk', kwargs={'pk': error_dev.pk})
+        response = self.client.post(url, [{'data': '1'}], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(DeviceData.objects.filter(device=error_dev).exists())
+
+    def test_bulk_create_object_level_authentication(self):
+        """
+        401 for anon; 403 for a device owned by someone else.
+        """
+        url = reverse('device:device-data-bulk', kwargs={'pk': self.other_dev.pk})
+        response = self.client.post(url, [{'data': '1'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(None)
+        response = self.client.post(self.url, [{'data': '1'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class GatewayDataAPITests(APITestCase):
+    """Tests for POST /api/devices/data/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.other_user = UserFactory()
+        cls.devices = DeviceFactory.create_batch(3, owner=cls.user)
+        cls.error_dev = DeviceFactory(status=Device.DeviceStatus.ERROR, owner=cls.user)
+        cls.offline_dev = DeviceFactory(
+            status=Device.DeviceStatus.OFFLINE, owner=cls.user
+        )
+        cls.other_dev = DeviceFactory(owner=cls.other_user)
+
+    def setUp(self):
+        device_access.clear()
+        evaluator.clear()
+        self.addCleanup(device_access.clear)
+        self.addCleanup(evaluator.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device:gateway-data')
+
+    def test_gateway_create_for_many_devices(self):
+        """
+        Readings for several owned devices are stored in one request.
+        """
+        payload = [
+            {'device': dev.pk, 'data': str(index)}
+            for index, dev in enumerate(self.devices * 2)
+        ]
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], len(payload))
+        for dev in self.devices:
+            self.assertEqual(DeviceData.objects.filter(device=dev).count(), 2)
+
+    def test_gateway_create_uses_constant_queries(self):
+        """
+        Ownership and status of all devices are resolved in a single query.
+        """
+        payload = [{'device': dev.pk, 'data': '1'} for dev in self.devices] * 20
+        # Device lookup, savepoint, insert, rollup lookup, savepoint, rollup
+        # insert, release, data version bump, release, loading the alert rule
+        # index
+        with self.assertNumQueries(10):
+            self.client.post(self.url, payload, format='json')
+
+    def test_gateway_rejects_only_offending_items(self):
+        """
+        Not owned, errored and invalid items are rejected; the rest is stored.
+        """
+        payload = [
+            {'device': self.devices[0].pk, 'data': '10'},
+            {'device': self.other_dev.pk, 'data': '20'},
+            {'device': self.error_dev.pk, 'data': '30'},
+            {'device': 999999, 'data': '40'},
+            {'data': '50'},
+            {'device': self.devices[1].pk, 'data': '60'},
+        ]
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            [201, 403, 409, 403, 400, 201],
+        )
+        self.assertFalse(DeviceData.objects.filter(device=self.other_dev).exists())
+        self.assertFalse(DeviceData.objects.filter(device=self.error_dev).exists())
+        self.assertEqual(
+            DeviceData.objects.filter(device__in=self.devices[:2]).count(), 2
+        )
+
+    def test_gateway_brings_offline_devices_online(self):
+        payload = [{'device': self.offline_dev.pk, 'data': '1'}]
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.offline_dev.refresh_from_db()
+        self.assertEqual(self.offline_dev.status, Device.DeviceStatus.ONLINE)
+
+    def test_gateway_requires_authentication(self):
+        """
+        POST /api/devices/data/ 401 for anon.
+        """
+        self.client.force_authenticate(None)
+        payload = [{'device': self.devices[0].pk, 'data': '1'}]
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class DeviceDataBackfillAPITests(APITestCase):
+    """Tests for POST /api/devices/{pk}/data/backfill/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.device = DeviceFactory(owner=cls.user)
+
+    def setUp(self):
+        device_access.clear()
+        evaluator.clear()
+        self.addCleanup(device_access.clear)
+        self.addCleanup(evaluator.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device:device-data-backfill', kwargs={'pk': self.device.pk})
+
+    def post_body(self, body, content_type):
+        return self.client.generic(
+            'POST', self.url, body.encode(), content_type=content_type
+        )
+
+    def test_backfill_ndjson_keeps_device_timestamps(self):
+        """
+        NDJSON readings are stored with the created_at they carry.
+        """
+        body = (
+            '{"data": "10", "created_at": "2025-04-01T08:00:00Z"}\n'
+            '\n'
+            '{"data": "20", "created_at": "2025-04-01T09:00:00Z"}\n'
+        )
+        response = self.post_body(body, 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        stored = DeviceData.objects.filter(device=self.device).order_by('created_at')
+        self.assertListEqual(
+            [row.created_at.isoformat() for row in stored],
+            ['2025-04-01T08:00:00+00:00', '2025-04-01T09:00:00+00:00'],
+        )
+
+    def test_backfill_csv(self):
+        """
+        CSV uploads with a header row are accepted.
+        """
+        body = (
+            'created_at,data\n'
+            '2025-04-01T08:00:00Z,10\n'
+            '2025-04-01T09:00:00Z,20\n'
+            '2025-04-01T10:00:00Z,30\n'
+        )
+        response = self.post_body(body, 'text/csv; charset=utf-8')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(DeviceData.objects.filter(device=self.device).count(), 3)
+
+    @override_settings(DEVICE_DATA_BACKFILL_CHUNK_SIZE=2)
+    def test_backfill_writes_in_chunks(self):
+        """
+        Readings are written in DEVICE_DATA_BACKFILL_CHUNK_SIZE batches.
+        """
+        body = ''.join(
+            f'{{"data": "{n}", "created_at": "2025-04-01T08:00:0{n}Z"}}\n'
+            for n in range(5)
+        )
+        with self.assertNumQueries(1 + 9 + 6 + 6):
+            # One device lookup shared by the permission check and the view,
+            # then savepoint, insert, rollup lookup, data version bump and
+            # release for each of the three chunks, plus creating
+            # the rollup buckets in a nested savepoint and loading the alert
+            # rules for the first chunk and updating the buckets for the other
+            # two
+            response = self.post_body(body, 'application/x-ndjson')
+
+        self.assertEqual(response.data['created'], 5)
+
+    def test_backfill_reports_rejected_lines(self):
+        """
+        Bad lines are reported by line number while good lines are stored.
+        """
+        body = (
+            '{"data": "10", "created_at": "2025-04-01T08:00:00Z"}\n'
+            'not json\n'
+            '{"data": "30"}\n'
+            '[1, 2]\n'
+        )
+        response = self.post_body(body, 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['rejected'], 3)
+        self.assertEqual(
+            [error['line'] for error in response.data['errors']], [2, 3, 4]
+        )
+        self.assertIn('created_at', response.data['errors'][1]['errors'])
+
+    def test_backfill_rejects_empty_body(self):
+        """
+        A body without readings returns 400, like an empty bulk payload.
+        """
+        for body, content_type in (
+            ('', 'application/x-ndjson'),
+            ('\n\n', 'application/x-ndjson'),
+            ('created_at,data\n', 'text/csv'),
+        ):
+            response = self.post_body(body, content_type)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_backfill_rejects_unknown_media_type(self):
+        """
+        Bodies that are neither NDJSON nor CSV return 415.
+        """
+        response = self.post_body('[]', 'application/xml')
+
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_backfill_error_device(self):
+        """
+        Backfill into a device in ERROR returns 409.
+        """
+        error_dev = DeviceFactory(status=Device.DeviceStatus.ERROR, owner=self.user)
+        self.url = reverse('device:device-data-backfill', kwargs={'pk': error_dev.pk})
+        body = '{"data": "10", "created_at": "2025-04-01T08:00:00Z"}\n'
+        response = self.post_body(body, 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_backfill_after_an_outage(self):
+        """
+        A device set offline by the sweeper can backfill what it missed and
+        is online again.
+        """
+        later = timezone.now() + timeout_for(None) + timedelta(seconds=1)
+        self.assertEqual(OfflineSweeper().run_once(now=later), 1)
+
+        body = '{"data": "10", "created_at": "2025-04-01T08:01:00Z"}\n'
+        response = self.post_body(body, 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.status, Device.DeviceStatus.ONLINE)
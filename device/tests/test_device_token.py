@@ -0,0 +1,168 @@
+"""
+Tests for device-scoped tokens.
+"""
+
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.authentication import token_cache
+from account.tests.factories import UserFactory
+
+from ..models import DeviceData, DeviceToken
+from ..ownership import device_access
+from .factories import DeviceFactory
+
+
+class DeviceTokenAuthenticationTests(APITestCase):
+    """Tests for DeviceTokenAuthentication."""
+
+    def setUp(self):
+        for cache in (token_cache, device_access):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        self.user = UserFactory()
+        self.device = DeviceFactory(owner=self.user)
+        self.sibling = DeviceFactory(owner=self.user)
+        self.token = DeviceToken.objects.create(device=self.device)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Device {self.token.key}')
+
+    def post_data(self, device):
+        url = reverse('device:device-data', kwargs={'pk': device.pk})
+        return self.client.post(url, {'data': '21.5 C'}, format='json')
+
+    def test_token_is_generated(self):
+        self.assertEqual(len(self.token.key), 40)
+
+    def test_device_token_posts_data_for_its_device(self):
+        """
+        POST /api/devices/{pk}/data/ returns 201 with the device's token.
+        """
+        self.assertEqual(
+            self.post_data(self.device).status_code, status.HTTP_201_CREATED
+        )
+        self.assertEqual(DeviceData.objects.filter(device=self.device).count(), 1)
+
+    def test_device_token_is_scoped_to_its_device(self):
+        """
+        Other devices of the same owner are rejected, on the gateway endpoint
+        item by item.
+        """
+        self.assertEqual(
+            self.post_data(self.sibling).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+        payload = [
+            {'device': self.device.pk, 'data': '1'},
+            {'device': self.sibling.pk, 'data': '2'},
+        ]
+        response = self.client.post(
+            reverse('device:gateway-data'), payload, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertListEqual(
+            [result['status'] for result in response.data['results']], [201, 403]
+        )
+
+    def test_device_token_does_not_manage_devices(self):
+        """
+        GET /api/devices/ does not accept device tokens.
+        """
+        response = self.client.get(reverse('device:device-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoked_token_and_new_owner_are_seen_at_once(self):
+        self.post_data(self.device)
+        self.device.owner = UserFactory()
+        self.device.save()
+        # The token now acts for the new owner, who owns the device
+        self.assertEqual(
+            self.post_data(self.device).status_code, status.HTTP_201_CREATED
+        )
+
+        self.token.delete()
+        self.assertEqual(
+            self.post_data(self.device).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_deactivated_owner_is_rejected(self):
+        self.post_data(self.device)
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(
+            self.post_data(self.device).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+
+class DeviceTokenAPITests(APITestCase):
+    """Tests for POST and DELETE /api/devices/{pk}/token/."""
+
+    def setUp(self):
+        for cache in (token_cache, device_access):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        self.device = DeviceFactory()
+        self.client = APIClient()
+        self.client.force_authenticate(self.device.owner)
+        self.url = reverse('device:device-token', kwargs={'pk': self.device.pk})
+
+    def device_client(self, key):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Device {key}')
+        return client
+
+    def post_data(self, key):
+        url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+        return self.device_client(key).post(url, {'data': '1'}, format='json')
+
+    def test_issue_token(self):
+        """
+        POST /api/devices/{pk}/token/ return 201 + a token that authenticates
+        the device; 403 if not owned; 401 if anon.
+        """
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['device'], self.device.pk)
+        key = response.data['key']
+        self.assertEqual(self.post_data(key).status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(UserFactory())
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(None)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_new_token_revokes_the_old_one(self):
+        old_key = self.client.post(self.url).data['key']
+        self.post_data(old_key)
+
+        new_key = self.client.post(self.url).data['key']
+        self.assertNotEqual(new_key, old_key)
+        self.assertEqual(
+            self.post_data(old_key).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        self.assertEqual(self.post_data(new_key).status_code, status.HTTP_201_CREATED)
+
+    def test_revoke_token(self):
+        """
+        DELETE /api/devices/{pk}/token/ return 204 and the token stops working
+        at once; 404 if the device has no token.
+        """
+        key = self.client.post(self.url).data['key']
+        self.post_data(key)
+
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.post_data(key).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_device_token_cannot_issue_tokens(self):
+        key = self.client.post(self.url).data['key']
+        response = self.device_client(key).post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
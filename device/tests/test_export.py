@@ -0,0 +1,134 @@
+"""
+Tests for the streaming export of device data.
+"""
+
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.db.models.query import QuerySet
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+
+from .. import archive
+from ..ingest import write_readings
+from ..models import DeviceData
+from .factories import DeviceFactory
+from .test_archive import ArchiveTestMixin
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+
+class DeviceDataExportTests(ArchiveTestMixin, APITestCase):
+    """Tests for GET /api/devices/{pk}/data/?export=."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserFactory()
+        self.device = DeviceFactory(owner=self.user)
+        write_readings(
+            [
+                DeviceData(
+                    device=self.device,
+                    data=f'{n}, "C"' if n % 5 == 0 else str(n),
+                    created_at=START + timedelta(hours=n),
+                )
+                for n in range(48)
+            ]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def listed(self, **params):
+        response = self.client.get(self.url, {'page_size': 1000, **params})
+        return response.json()['results']
+
+    def test_csv_export(self):
+        """
+        GET /api/devices/{pk}/data/?export=csv returns every reading as CSV.
+        """
+        response, body = self.export(export='csv')
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(
+            response['Content-Disposition'],
+            f'attachment; filename="device-{self.device.pk}-data.csv"',
+        )
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertListEqual(
+            rows,
+            [
+                {key: str(value) for key, value in item.items()}
+                for item in self.listed()
+            ],
+        )
+
+    def test_ndjson_export_of_a_range(self):
+        params = {'start': '2025-04-01T10:00:00Z', 'end': '2025-04-02T03:00:00Z'}
+        response, body = self.export(export='ndjson', **params)
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(len(lines), 18)
+        self.assertListEqual(lines, self.listed(**params))
+
+    def test_gzip_export(self):
+        response, body = self.export(export='ndjson', compress='gzip')
+        _, plain = self.export(export='ndjson')
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('data.ndjson.gz', response['Content-Disposition'])
+        self.assertEqual(gzip.decompress(body), plain)
+
+    def test_export_includes_archived_readings(self):
+        _, before = self.export(export='csv')
+        archive.archive_before(START + timedelta(days=1))
+        _, after = self.export(export='csv')
+
+        self.assertEqual(after, before)
+
+    @override_settings(DEVICE_DATA_EXPORT_CHUNK_SIZE=5)
+    def test_rows_are_streamed_not_materialized(self):
+        response = self.client.get(self.url, {'export': 'ndjson'})
+        with patch.object(
+            QuerySet, '_fetch_all', side_effect=AssertionError('queryset loaded')
+        ):
+            body = b''.join(response.streaming_content)
+        self.assertEqual(len(body.splitlines()), 48)
+
+    @override_settings(DEVICE_DATA_EXPORT_CHUNK_SIZE=5)
+    async def test_rows_are_streamed_over_asgi(self):
+        """
+        Served over ASGI the body is an async iterator, so the export is not
+        read into memory before it is sent.
+        """
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            self.url, {'export': 'ndjson', 'compress': 'gzip'}
+        )
+        self.assertTrue(response.is_async)
+        with patch.object(
+            QuerySet, '_fetch_all', side_effect=AssertionError('queryset loaded')
+        ):
+            body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(gzip.decompress(body).splitlines()), 48)
+
+    def test_invalid_export_options(self):
+        for params in ({'export': 'xml'}, {'export': 'csv', 'compress': 'zip'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,181 @@
+"""
+Tests for heartbeat recording.
+"""
+
+from datetime import datetime, timedelta
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+
+from ..heartbeat import HeartbeatRecorder
+from ..models import Device
+from ..ownership import device_access
+from ..signals import device_status_changed
+from .factories import DeviceFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+
+class HeartbeatRecorderTests(TransactionTestCase):
+    """Tests for HeartbeatRecorder."""
+
+    def setUp(self):
+        owner = UserFactory()
+        self.devices = [DeviceFactory(owner=owner) for _ in range(3)]
+        self.recorder = HeartbeatRecorder()
+
+    def tearDown(self):
+        self.recorder.stop()
+
+    def start_paused(self):
+        """Start the worker with a thread that never flushes on its own."""
+        self.recorder._run = self.recorder._stopping.wait
+        self.recorder.start()
+
+    def last_seen(self):
+        return [Device.objects.get(pk=device.pk).last_seen for device in self.devices]
+
+    def test_record_without_worker_writes_inline(self):
+        self.recorder.record(self.devices[0].pk, START)
+
+        self.assertEqual(self.recorder.pending, 0)
+        self.assertEqual(self.last_seen()[0], START)
+
+    def test_heartbeats_are_coalesced_per_device(self):
+        """
+        Many heartbeats cost one row per device and one UPDATE of last_seen
+        per flush, plus one bringing offline devices back online and one of
+        the device list versions of their owners.
+        """
+        Device.objects.filter(pk=self.devices[2].pk).update(
+            status=Device.DeviceStatus.OFFLINE
+        )
+        self.start_paused()
+        for second in range(100):
+            for device in self.devices:
+                self.recorder.record(device.pk, START + timedelta(seconds=second))
+        # An out-of-order heartbeat does not move last_seen back
+        self.recorder.record(self.devices[0].pk, START)
+        self.assertEqual(self.recorder.pending, 3)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.recorder.run_once(), 3)
+
+        updates = [
+            query['sql'] for query in queries if query['sql'].startswith('UPDATE')
+        ]
+        self.assertEqual(len(updates), 3)
+        self.assertRegex(updates[0], r'^UPDATE "device_device" SET "last_seen" = CASE ')
+        self.assertNotIn('"name"', updates[0])
+        self.assertRegex(updates[1], r'^UPDATE "device_device" SET "status" = ')
+        self.assertRegex(
+            updates[2], r'^UPDATE "device_devicelistversion" SET "version" = '
+        )
+        self.assertListEqual(self.last_seen(), [START + timedelta(seconds=99)] * 3)
+
+    def test_heartbeat_brings_offline_device_online(self):
+        Device.objects.filter(pk=self.devices[0].pk).update(
+            status=Device.DeviceStatus.OFFLINE
+        )
+        Device.objects.filter(pk=self.devices[1].pk).update(
+            status=Device.DeviceStatus.ERROR
+        )
+        changes = []
+
+        def collect(sender, device_ids, status, **kwargs):
+            changes.append((sorted(device_ids), status))
+
+        device_status_changed.connect(collect)
+        self.addCleanup(device_status_changed.disconnect, collect)
+        self.start_paused()
+        for device in self.devices:
+            self.recorder.record(device.pk, START)
+        self.recorder.run_once()
+
+        statuses = Device.objects.order_by('pk').values_list('status', flat=True)
+        self.assertListEqual(
+            list(statuses),
+            [
+                Device.DeviceStatus.ONLINE,
+                Device.DeviceStatus.ERROR,
+                Device.DeviceStatus.ONLINE,
+            ],
+        )
+        # Only the device that was offline is announced; ERROR stays
+        self.assertListEqual(
+            changes, [([self.devices[0].pk], Device.DeviceStatus.ONLINE)]
+        )
+
+    def test_stop_flushes_pending_heartbeats(self):
+        self.start_paused()
+        self.recorder.record(self.devices[1].pk, START)
+        self.recorder.stop()
+
+        self.assertEqual(self.last_seen()[1], START)
+
+
+class DeviceHeartbeatAPITests(APITestCase):
+    """Tests for POST /api/devices/{pk}/heartbeat/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.device = DeviceFactory(owner=cls.user)
+        cls.other_device = DeviceFactory()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_heartbeat_updates_last_seen(self):
+        """
+        POST /api/devices/{pk}/heartbeat/ returns 202 and moves last_seen.
+        """
+        Device.objects.filter(pk=self.device.pk).update(last_seen=START)
+        url = reverse('device:device-heartbeat', kwargs={'pk': self.device.pk})
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['device'], self.device.pk)
+        self.device.refresh_from_db()
+        self.assertGreater(self.device.last_seen, START)
+
+    def test_heartbeat_object_level_permission(self):
+        """
+        POST /api/devices/{pk}/heartbeat/ 403 for other; 401 for anon.
+        """
+        url = reverse('device:device-heartbeat', kwargs={'pk': self.other_device.pk})
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(
+            self.client.post(url).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_data_messages_write_only_stale_last_seen(self):
+        """
+        Data from a device seen within DATA_MAX_LAG leaves last_seen alone;
+        data from a device seen longer ago moves it.
+        """
+        device_access.clear()
+        self.addCleanup(device_access.clear)
+        url = reverse('device:device-data-bulk', kwargs={'pk': self.device.pk})
+
+        Device.objects.filter(pk=self.device.pk).update(last_seen=START)
+        self.client.post(url, [{'data': '1'}], format='json')
+        self.device.refresh_from_db()
+        self.assertGreater(self.device.last_seen, START)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, [{'data': '2'}], format='json')
+        updates = [
+            query['sql'] for query in queries if query['sql'].startswith('UPDATE')
+        ]
+        self.assertFalse([sql for sql in updates if '"last_seen"' in sql])
@@ -0,0 +1,111 @@
+"""
+Tests for the write-behind ingest buffer.
+"""
+
+import time
+
+from django.test import TransactionTestCase, override_settings
+
+from account.tests.factories import UserFactory
+
+from ..ingest import BufferFull, WriteBehindBuffer
+from ..models import Device, DeviceData
+from .factories import DeviceFactory
+
+WRITE_BEHIND = {
+    'ENABLED': True,
+    # Long interval so nothing is flushed unless a test asks for it
+    'FLUSH_INTERVAL': 60,
+    'FLUSH_MAX_ROWS': 3,
+    'MAX_PENDING': 5,
+    'SUBMIT_TIMEOUT': 0,
+}
+
+
+@override_settings(DEVICE_DATA_WRITE_BEHIND=WRITE_BEHIND)
+class WriteBehindBufferTests(TransactionTestCase):
+    """Tests for WriteBehindBuffer."""
+
+    def setUp(self):
+        self.device = DeviceFactory(owner=UserFactory())
+        self.buffer = WriteBehindBuffer()
+
+    def tearDown(self):
+        self.buffer.stop()
+
+    def start_paused(self):
+        """Start the worker with a thread that never flushes on its own."""
+        self.buffer._run = self.buffer._stopping.wait
+        self.buffer.start()
+
+    def readings(self, count):
+        return [DeviceData(device=self.device, data=str(n)) for n in range(count)]
+
+    def test_submit_without_worker_writes_synchronously(self):
+        """
+        Readings are written inline while the worker thread is not running.
+        """
+        self.buffer.submit(self.readings(2))
+
+        self.assertEqual(self.buffer.pending, 0)
+        self.assertEqual(DeviceData.objects.count(), 2)
+
+    def test_submit_queues_until_flushed(self):
+        """
+        Readings stay queued until FLUSH_MAX_ROWS are pending, which wakes
+        the worker thread to write them.
+        """
+        self.buffer.start()
+        self.buffer.submit(self.readings(2))
+        self.assertEqual(self.buffer.pending, 2)
+        self.assertEqual(DeviceData.objects.count(), 0)
+
+        self.buffer.submit(self.readings(1))
+        deadline = time.monotonic() + 5
+        while DeviceData.objects.count() < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(DeviceData.objects.count(), 3)
+        self.assertEqual(self.buffer.pending, 0)
+
+    def test_backpressure_when_buffer_is_full(self):
+        """
+        Submitting beyond MAX_PENDING raises BufferFull and queues nothing.
+        """
+        self.start_paused()
+        self.buffer.submit(self.readings(2))
+        self.buffer.submit(self.readings(2))
+
+        with self.assertRaises(BufferFull):
+            self.buffer.submit(self.readings(2))
+        self.assertEqual(self.buffer.pending, 4)
+
+    def test_stop_drains_pending_readings(self):
+        """
+        Stopping the worker writes every accepted reading.
+        """
+        self.start_paused()
+        self.buffer.submit(self.readings(5))
+        self.buffer.stop()
+
+        self.assertEqual(self.buffer.pending, 0)
+        self.assertEqual(
+            sorted(DeviceData.objects.values_list('data', flat=True)),
+            [str(n) for n in range(5)],
+        )
+
+    def test_flush_skips_readings_of_deleted_devices(self):
+        """
+        Readings of a device deleted after they were queued are dropped alone.
+        """
+        doomed = DeviceFactory(owner=self.device.owner)
+        self.start_paused()
+        self.buffer.submit(self.readings(1))
+        self.buffer.submit([DeviceData(device=doomed, data='lost')])
+        Device.objects.filter(pk=doomed.pk).delete()
+        with self.assertLogs('device.ingest', 'WARNING') as logs:
+            self.buffer.stop()
+
+        self.assertIn(f'deleted devices [{doomed.pk}]', logs.output[0])
+        self.assertListEqual(
+            list(DeviceData.objects.values_list('data', flat=True)), ['0']
+        )
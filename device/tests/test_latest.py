@@ -0,0 +1,187 @@
+"""
+Tests for the latest-reading store and endpoints.
+"""
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+
+from ..cache import MISSING, LRUCache
+from ..ingest import write_readings
+from ..latest import LatestReadingStore, latest_readings
+from ..models import DeviceData
+from .factories import DeviceDataFactory, DeviceFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+SHARED_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'latest': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'latest-readings',
+    },
+}
+
+
+def reading(device, data, minutes=0):
+    return DeviceData(
+        device=device, data=data, created_at=START + timedelta(minutes=minutes)
+    )
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_entries_expire_after_ttl(self):
+        cache = LRUCache(max_entries=2, ttl=5)
+        with patch('device.cache.time.monotonic', return_value=100):
+            cache.set('a', None)
+        with patch('device.cache.time.monotonic', return_value=104):
+            self.assertIsNone(cache.get('a'))
+        with patch('device.cache.time.monotonic', return_value=105):
+            self.assertIs(cache.get('a'), MISSING)
+
+
+class LatestReadingStoreTests(TestCase):
+    """Tests for LatestReadingStore."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = DeviceFactory()
+        cls.other_device = DeviceFactory()
+
+    def setUp(self):
+        latest_readings.clear()
+        self.addCleanup(latest_readings.clear)
+
+    def test_miss_is_loaded_from_database_once(self):
+        DeviceDataFactory(device=self.device, data='1', created_at=START)
+        newest = DeviceDataFactory(
+            device=self.device, data='2', created_at=START + timedelta(hours=1)
+        )
+
+        with self.assertNumQueries(2):
+            entries = latest_readings.get_many([self.device.pk, self.other_device.pk])
+        self.assertEqual(entries[self.device.pk]['id'], newest.pk)
+        self.assertIsNone(entries[self.other_device.pk])
+
+        with self.assertNumQueries(0):
+            latest_readings.get_many([self.device.pk, self.other_device.pk])
+
+    def test_ingest_updates_known_devices(self):
+        latest_readings.get_many([self.device.pk, self.other_device.pk])
+        write_readings(
+            [
+                reading(self.device, '1', minutes=5),
+                reading(self.device, '2', minutes=10),
+                reading(self.other_device, '3'),
+            ]
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(latest_readings.get(self.device.pk)['data'], '2')
+            self.assertEqual(latest_readings.get(self.other_device.pk)['data'], '3')
+
+    def test_backfilled_readings_do_not_replace_newer_ones(self):
+        write_readings([reading(self.device, 'new', minutes=10)])
+        latest_readings.get(self.device.pk)
+        write_readings([reading(self.device, 'old', minutes=-10)])
+
+        self.assertEqual(latest_readings.get(self.device.pk)['data'], 'new')
+
+    @override_settings(CACHES=SHARED_CACHE, DEVICE_LATEST_READING={'CACHE': 'latest'})
+    def test_shared_backend_is_seen_by_other_processes(self):
+        """
+        An entry stored by one process is read by another from the shared cache.
+        """
+        other_process = LatestReadingStore()
+        self.addCleanup(other_process.clear)
+        latest_readings.get(self.device.pk)
+        write_readings([reading(self.device, '42')])
+
+        with self.assertNumQueries(0):
+            entry = other_process.get(self.device.pk)
+        self.assertEqual(entry['data'], '42')
+
+
+class LatestDataAPITests(APITestCase):
+    """Tests for GET /api/devices/latest/ and /api/devices/{pk}/data/latest/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.device = DeviceFactory(owner=cls.user)
+        cls.quiet_device = DeviceFactory(owner=cls.user)
+        cls.other_device = DeviceFactory()
+        write_readings(
+            [reading(cls.device, '21.5 C'), reading(cls.device, '22 C', minutes=1)]
+        )
+
+    def setUp(self):
+        latest_readings.clear()
+        self.addCleanup(latest_readings.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_latest_reading_of_one_device(self):
+        """
+        GET /api/devices/{pk}/data/latest/ returns the newest reading.
+        """
+        url = reverse('device:device-data-latest', kwargs={'pk': self.device.pk})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data'], '22 C')
+        self.assertEqual(response.data['value'], 22.0)
+        self.assertEqual(response.data['created_at'], '2025-04-01T08:01:00Z')
+
+    def test_latest_reading_without_readings_or_access(self):
+        url = reverse('device:device-data-latest', kwargs={'pk': self.quiet_device.pk})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+        url = reverse('device:device-data-latest', kwargs={'pk': self.other_device.pk})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_latest_readings_of_all_devices(self):
+        """
+        GET /api/devices/latest/ answers for every owned device without
+        touching DeviceData once the store is warm.
+        """
+        url = reverse('device:latest-data')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertListEqual(
+            [result['device'] for result in results],
+            [self.device.pk, self.quiet_device.pk],
+        )
+        self.assertEqual(results[0]['reading']['data'], '22 C')
+        self.assertIsNone(results[1]['reading'])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('device_devicedata', queries[0]['sql'])
+
+    def test_latest_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.get(reverse('device:latest-data'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
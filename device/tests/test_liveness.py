@@ -0,0 +1,104 @@
+"""
+Tests for offline detection.
+"""
+
+from datetime import datetime, timedelta
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from account.tests.factories import UserFactory
+
+from ..heartbeat import heartbeats
+from ..liveness import OfflineSweeper
+from ..models import Device
+from .factories import DeviceFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+
+@override_settings(DEVICE_LIVENESS={'DEFAULT_INTERVAL': 60, 'MISSED_BEATS': 3})
+class OfflineSweeperTests(TestCase):
+    """Tests for OfflineSweeper."""
+
+    def setUp(self):
+        owner = UserFactory()
+        # Offline after 3 minutes of silence, then after 30 seconds
+        self.slow = DeviceFactory(owner=owner)
+        self.fast = DeviceFactory(owner=owner, heartbeat_interval=10)
+        Device.objects.update(last_seen=START)
+        self.sweeper = OfflineSweeper()
+
+    def statuses(self):
+        return list(Device.objects.order_by('pk').values_list('status', flat=True))
+
+    def test_devices_go_offline_after_missed_heartbeats(self):
+        self.assertEqual(self.sweeper.run_once(now=START + timedelta(seconds=29)), 0)
+        self.assertEqual(self.sweeper.run_once(now=START + timedelta(seconds=30)), 1)
+        self.assertListEqual(
+            self.statuses(),
+            [Device.DeviceStatus.ONLINE, Device.DeviceStatus.OFFLINE],
+        )
+
+        self.assertEqual(self.sweeper.run_once(now=START + timedelta(minutes=3)), 1)
+        self.assertListEqual(self.statuses(), [Device.DeviceStatus.OFFLINE] * 2)
+        self.assertEqual(self.sweeper.tracked, 0)
+
+    def test_tick_touches_only_expired_devices(self):
+        """
+        A tick without expired deadlines runs no query; one with expired
+        deadlines verifies and updates them in one statement each, plus one
+        for the device list versions of their owners.
+        """
+        self.sweeper.run_once(now=START)
+
+        with self.assertNumQueries(0):
+            self.sweeper.run_once(now=START + timedelta(seconds=10))
+        with CaptureQueriesContext(connection) as queries:
+            self.sweeper.run_once(now=START + timedelta(minutes=5))
+
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(queries[1]['sql'].startswith('UPDATE "device_device"'))
+        self.assertTrue(
+            queries[2]['sql'].startswith('UPDATE "device_devicelistversion"')
+        )
+
+    def test_newer_message_moves_the_deadline(self):
+        self.sweeper.run_once(now=START)
+        self.sweeper.schedule(self.fast.pk, START + timedelta(seconds=20))
+        # An older message does not move the deadline back
+        self.sweeper.schedule(self.fast.pk, START)
+
+        self.sweeper.run_once(now=START + timedelta(seconds=40))
+        self.assertEqual(self.statuses()[1], Device.DeviceStatus.ONLINE)
+        # The replaced deadline was skipped, not counted as a second device
+        self.assertEqual(self.sweeper.tracked, 2)
+
+    def test_messages_seen_by_other_processes_are_respected(self):
+        self.sweeper.run_once(now=START)
+        Device.objects.filter(pk=self.fast.pk).update(
+            last_seen=START + timedelta(seconds=25)
+        )
+
+        self.assertEqual(self.sweeper.run_once(now=START + timedelta(seconds=30)), 0)
+        self.assertEqual(self.sweeper.run_once(now=START + timedelta(seconds=55)), 1)
+
+    def test_devices_not_online_are_left_alone(self):
+        Device.objects.filter(pk=self.fast.pk).update(status=Device.DeviceStatus.ERROR)
+        self.sweeper.run_once(now=START + timedelta(minutes=5))
+
+        self.assertListEqual(
+            self.statuses(),
+            [Device.DeviceStatus.OFFLINE, Device.DeviceStatus.ERROR],
+        )
+
+    def test_offline_device_comes_back_with_next_heartbeat(self):
+        self.sweeper.run_once(now=START + timedelta(minutes=5))
+        heartbeats.record(self.fast.pk, START + timedelta(minutes=6))
+
+        self.assertListEqual(
+            self.statuses(),
+            [Device.DeviceStatus.OFFLINE, Device.DeviceStatus.ONLINE],
+        )
@@ -5,12 +5,13 @@ Test for models in device.
 from datetime import datetime
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from django.utils import timezone
 
 from account.tests.factories import UserFactory
 
-from ..models import DeviceData, DeviceLog
+from ..ingest import write_readings
+from ..models import DeviceData, DeviceLog, parse_reading
 from .factories import DeviceDataFactory, DeviceFactory, DeviceLogFactory
 
 
@@ -126,3 +127,59 @@ class DeviceDataTests(TestCase):
         data = DeviceDataFactory(device=self.device)
         self.device.delete()
         self.assertFalse(DeviceData.objects.filter(pk=data.pk).exists())
+
+    def test_save_parses_typed_value(self):
+        """
+        Saving a reading fills value, unit and metric from the data string.
+        """
+        device_data = DeviceDataFactory(device=self.device, data='temp=21.5C')
+        device_data.refresh_from_db()
+
+        self.assertEqual(device_data.value, 21.5)
+        self.assertEqual(device_data.unit, 'C')
+        self.assertEqual(device_data.metric, 'temp')
+
+    def test_bulk_write_parses_typed_value(self):
+        """
+        Readings written in bulk get their typed value too.
+        """
+        write_readings(
+            [
+                DeviceData(device=self.device, data='42'),
+                DeviceData(device=self.device, data='door open'),
+            ]
+        )
+
+        self.assertListEqual(
+            list(
+                DeviceData.objects.filter(device=self.device)
+                .order_by('id')
+                .values_list('value', flat=True)
+            ),
+            [42.0, None],
+        )
+
+
+class ParseReadingTests(SimpleTestCase):
+    """Tests for parse_reading."""
+
+    def test_numeric_readings(self):
+        cases = {
+            '21.5': (21.5, '', ''),
+            ' -3 ': (-3.0, '', ''),
+            '1e3': (1000.0, '', ''),
+            '.5': (0.5, '', ''),
+            '21.5 C': (21.5, 'C', ''),
+            '80%': (80.0, '%', ''),
+            '12.1 kWh': (12.1, 'kWh', ''),
+            'humidity=40 %': (40.0, '%', 'humidity'),
+            'temp: 21.5C': (21.5, 'C', 'temp'),
+        }
+        for raw, expected in cases.items():
+            with self.subTest(raw=raw):
+                self.assertEqual(parse_reading(raw), expected)
+
+    def test_non_numeric_readings(self):
+        for raw in ('', 'door open', 'ABC123', '1 2', 'nan', '1e999', '12 degrees C'):
+            with self.subTest(raw=raw):
+                self.assertEqual(parse_reading(raw), (None, '', ''))
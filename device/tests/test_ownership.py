@@ -0,0 +1,88 @@
+"""
+Tests for the device ownership cache.
+"""
+
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+
+from ..liveness import OfflineSweeper, timeout_for
+from ..models import Device
+from ..ownership import device_access
+from .factories import DeviceFactory
+
+
+class OwnershipCacheTests(APITestCase):
+    """Tests for ownership checks on the ingest endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.other_user = UserFactory()
+
+    def setUp(self):
+        device_access.clear()
+        self.addCleanup(device_access.clear)
+        self.device = DeviceFactory(owner=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device:device-data-bulk', kwargs={'pk': self.device.pk})
+
+    def post(self):
+        return self.client.post(self.url, [{'data': '1'}], format='json')
+
+    def device_lookups(self, queries):
+        return [
+            query['sql']
+            for query in queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "device_device"' in query['sql']
+        ]
+
+    def test_permission_and_view_share_one_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.post().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self.device_lookups(queries)), 1)
+
+    def test_hot_ingest_path_skips_ownership_queries(self):
+        self.post()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.post().status_code, status.HTTP_201_CREATED)
+        self.assertListEqual(self.device_lookups(queries), [])
+
+    def test_status_change_is_seen_at_once(self):
+        self.post()
+        self.device.status = Device.DeviceStatus.ERROR
+        self.device.save()
+
+        self.assertEqual(self.post().status_code, status.HTTP_409_CONFLICT)
+
+    def test_ownership_change_is_seen_at_once(self):
+        self.post()
+        self.device.owner = self.other_user
+        self.device.save()
+
+        self.assertEqual(self.post().status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_deleted_device_is_seen_at_once(self):
+        self.post()
+        self.device.delete()
+
+        self.assertEqual(self.post().status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_devices_set_offline_by_the_sweeper_are_seen_at_once(self):
+        self.post()
+        later = timezone.now() + timeout_for(None) + timedelta(seconds=1)
+        self.assertEqual(OfflineSweeper().run_once(now=later), 1)
+
+        # Data from a device that was set offline brings it back online
+        self.assertEqual(self.post().status_code, status.HTTP_201_CREATED)
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.status, Device.DeviceStatus.ONLINE)
@@ -0,0 +1,117 @@
+"""
+Tests for keyset pagination of the device data endpoint.
+"""
+
+from datetime import datetime, timedelta
+from itertools import chain
+from unittest.mock import patch
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+
+from ..models import DeviceData
+from ..ownership import device_access
+from ..pagination import KeysetPagination
+from .factories import DeviceFactory
+
+
+class KeysetPaginationTests(APITestCase):
+    """Tests for KeysetPagination on GET /api/devices/{pk}/data/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.device = DeviceFactory(owner=cls.user)
+        start = datetime(2025, 4, 1, tzinfo=timezone.get_default_timezone())
+        # Pairs of readings share a timestamp so ties are broken by id
+        DeviceData.objects.bulk_create(
+            DeviceData(
+                device=cls.device,
+                data=str(n),
+                created_at=start + timedelta(minutes=n // 2),
+            )
+            for n in range(25)
+        )
+        cls.expected = list(
+            DeviceData.objects.order_by('created_at', 'id').values_list(
+                'data', flat=True
+            )
+        )
+
+    def setUp(self):
+        device_access.clear()
+        self.addCleanup(device_access.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+
+    def values(self, response):
+        return [item['data'] for item in response.data['results']]
+
+    def test_first_page(self):
+        """
+        The first page has no previous link and a next link.
+        """
+        response = self.client.get(self.url, {'page_size': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(self.values(response), self.expected[:10])
+        self.assertIsNone(response.data['previous'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_walk_forward_and_backward(self):
+        """
+        Following next links visits every row once; previous links walk back.
+        """
+        pages = []
+        response = self.client.get(self.url, {'page_size': 10})
+        pages.append(self.values(response))
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append(self.values(response))
+
+        self.assertListEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertListEqual(list(chain.from_iterable(pages)), self.expected)
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(response.data['previous'])
+        self.assertListEqual(self.values(response), pages[1])
+        response = self.client.get(response.data['previous'])
+        self.assertListEqual(self.values(response), pages[0])
+        self.assertIsNone(response.data['previous'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_page_query_count_does_not_grow_with_depth(self):
+        """
+        A deep page costs the same queries as the first one.
+        """
+        response = self.client.get(self.url, {'page_size': 5})
+        # The permission check is served from the ownership cache, then the
+        # data version is read for the ETag and the page is fetched
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'page_size': 5})
+        for _ in range(3):
+            response = self.client.get(response.data['next'])
+        with self.assertNumQueries(2):
+            self.client.get(response.data['next'])
+
+    def test_page_size_is_capped(self):
+        """
+        page_size above max_page_size falls back to the cap.
+        """
+        with patch.object(KeysetPagination, 'max_page_size', 7):
+            response = self.client.get(self.url, {'page_size': 100})
+
+        self.assertListEqual(self.values(response), self.expected[:7])
+
+    def test_invalid_cursor(self):
+        """
+        A malformed cursor returns 404.
+        """
+        for cursor in ('garbage', 'Zm9vfGJhcnwx'):
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,101 @@
+"""
+Tests for the fast JSON path of DeviceData listings.
+"""
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+
+from .. import renderers
+from ..ingest import write_readings
+from ..models import DeviceData
+from ..renderers import dumps
+from ..views import DeviceDataSerializer
+from .factories import DeviceFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+SAMPLES = [
+    '21.5 C',
+    'humidity: 40%',
+    'say "hi"\\n',
+    'line\nbreak\ttab',
+    'café 温度 \U0001f321',
+    'js \u2028 \u2029 separators',
+    '\x00\x1f control',
+]
+
+
+class FastJSONListTests(APITestCase):
+    """Tests for GET /api/devices/{pk}/data/ through the fast JSON path."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.device = DeviceFactory(owner=cls.user)
+        write_readings(
+            [
+                DeviceData(
+                    device=cls.device,
+                    data=SAMPLES[n % len(SAMPLES)],
+                    created_at=START + timedelta(seconds=n, microseconds=n * 7),
+                )
+                for n in range(30)
+            ]
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+
+    def get_both(self, url, params=None, **headers):
+        fast = self.client.get(url, params, **headers)
+        with override_settings(DEVICE_DATA_FAST_JSON=False):
+            slow = self.client.get(url, params, **headers)
+        return fast, slow
+
+    def test_output_is_byte_identical(self):
+        url, params = self.url, {'page_size': 8}
+        pages = 0
+        while url:
+            fast, slow = self.get_both(url, params)
+            self.assertEqual(fast.content, slow.content)
+            self.assertEqual(fast['Content-Type'], slow['Content-Type'])
+            url, params = fast.data['next'], None
+            pages += 1
+        self.assertEqual(pages, 4)
+
+        fast, slow = self.get_both(
+            self.url,
+            {'start': '2025-04-01T08:00:05Z', 'end': '2025-04-01T08:00:20Z'},
+        )
+        self.assertEqual(fast.content, slow.content)
+
+    def test_fast_path_skips_the_serializer(self):
+        with patch.object(
+            DeviceDataSerializer,
+            'to_representation',
+            side_effect=AssertionError('serializer used'),
+        ):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 30)
+
+    def test_indented_json_uses_the_renderer(self):
+        fast, slow = self.get_both(self.url, HTTP_ACCEPT='application/json; indent=2')
+        self.assertIn(b'\n  ', fast.content)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_dumps_matches_json_renderer(self):
+        data = {'results': [{'id': 1, 'data': sample, 'x': None} for sample in SAMPLES]}
+        self.assertEqual(dumps(data), JSONRenderer().render(data))
+        # Without orjson installed
+        with patch.object(renderers, 'orjson', None):
+            self.assertEqual(dumps(data), JSONRenderer().render(data))
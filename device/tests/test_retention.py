@@ -0,0 +1,189 @@
+"""
+Tests for retention policies and the purge job.
+"""
+
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+from django.utils import timezone
+
+from account.tests.factories import UserFactory
+
+from ..latest import latest_readings
+from ..models import DeviceData, DeviceDataRollup, DeviceLog, RetentionPolicy
+from ..retention import RetentionPurger, expiry_cutoffs, purge_expired, purge_rows
+from ..rollups import aggregate_series, rebuild_rollups
+from ..timeseries import aggregate_buckets
+from .factories import DeviceDataFactory, DeviceFactory
+
+NOW = datetime(2025, 4, 30, 12, 0, tzinfo=timezone.get_default_timezone())
+
+
+class RetentionTests(TestCase):
+    """Tests for purge_expired() and the purge_device_data command."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.device = DeviceFactory(owner=cls.user)
+        cls.other_device = DeviceFactory(owner=cls.user)
+        cls.unmanaged_device = DeviceFactory()
+
+        for device in (cls.device, cls.other_device, cls.unmanaged_device):
+            for days in (1, 5, 10, 20, 40):
+                DeviceDataFactory(
+                    device=device,
+                    data=str(days),
+                    created_at=NOW - timedelta(days=days),
+                )
+        for days in (1, 10):
+            log = DeviceLog.objects.create(device=cls.device, message=f'{days}d')
+            # created_at is auto_now, so backdate with an update
+            DeviceLog.objects.filter(pk=log.pk).update(
+                created_at=NOW - timedelta(days=days)
+            )
+
+        RetentionPolicy.objects.create(owner=cls.user, data_days=15, log_days=7)
+        # Device policies take precedence over the owner's
+        RetentionPolicy.objects.create(device=cls.other_device, data_days=7)
+
+    def setUp(self):
+        latest_readings.clear()
+        self.addCleanup(latest_readings.clear)
+
+    def kept_days(self, device):
+        return sorted(
+            int(data)
+            for data in DeviceData.objects.filter(device=device).values_list(
+                'data', flat=True
+            )
+        )
+
+    def test_policy_must_target_owner_or_device(self):
+        with self.assertRaises(IntegrityError):
+            RetentionPolicy.objects.create(data_days=1)
+
+    def test_expiry_cutoffs(self):
+        cutoffs = {
+            device_id: (data_cutoff, log_cutoff)
+            for device_id, data_cutoff, log_cutoff in expiry_cutoffs(NOW)
+        }
+        self.assertDictEqual(
+            cutoffs,
+            {
+                self.device.pk: (NOW - timedelta(days=15), NOW - timedelta(days=7)),
+                self.other_device.pk: (NOW - timedelta(days=7), None),
+            },
+        )
+
+    def test_purge_expired(self):
+        """
+        Only rows older than the effective policy are deleted.
+        """
+        stats = purge_expired(now=NOW, pause=0)
+
+        self.assertEqual(stats['data'], 2 + 3)
+        self.assertEqual(stats['logs'], 1)
+        # The test database is created with incremental auto_vacuum
+        self.assertIsNotNone(stats['pages'])
+        self.assertListEqual(self.kept_days(self.device), [1, 5, 10])
+        self.assertListEqual(self.kept_days(self.other_device), [1, 5])
+        self.assertListEqual(self.kept_days(self.unmanaged_device), [1, 5, 10, 20, 40])
+        self.assertListEqual(
+            list(DeviceLog.objects.values_list('message', flat=True)), ['1d']
+        )
+
+    def test_purge_expires_rollups(self):
+        """
+        Bucketed queries served from rollups no longer see purged readings,
+        and the buckets around the cutoff only count the readings left.
+        """
+        cutoff = NOW - timedelta(days=15)
+        for offset in (-1, 1):
+            DeviceDataFactory(
+                device=self.device,
+                data='100',
+                created_at=cutoff + timedelta(minutes=offset),
+            )
+        rebuild_rollups(self.device.pk)
+
+        purge_expired(now=NOW, pause=0)
+
+        self.assertFalse(
+            DeviceDataRollup.objects.filter(
+                device=self.device, bucket_start__lt=cutoff - timedelta(days=1)
+            ).exists()
+        )
+        readings = DeviceData.objects.filter(device=self.device)
+        for seconds in (60, 3600, 86400):
+            with self.subTest(seconds=seconds):
+                self.assertListEqual(
+                    aggregate_series(
+                        readings.filter(created_at__lt=cutoff),
+                        self.device.pk,
+                        seconds,
+                        ['count'],
+                        end=cutoff - timedelta(microseconds=1),
+                    ),
+                    [],
+                )
+                self.assertListEqual(
+                    aggregate_series(
+                        readings, self.device.pk, seconds, ['count', 'sum']
+                    ),
+                    aggregate_buckets(readings, seconds, ['count', 'sum']),
+                )
+
+    def test_purge_drops_purged_latest_readings(self):
+        """
+        The latest reading of a device whose readings all expired is not
+        served from the latest-value store after the purge.
+        """
+        DeviceData.objects.filter(
+            device=self.other_device, created_at__gt=NOW - timedelta(days=7)
+        ).delete()
+        self.assertEqual(latest_readings.get(self.other_device.pk)['data'], '10')
+
+        purge_expired(now=NOW, pause=0)
+
+        self.assertIsNone(latest_readings.get(self.other_device.pk))
+
+    def test_purge_rows_in_batches(self):
+        """
+        Each batch is one primary key lookup and one ranged delete.
+        """
+        expired = DeviceData.objects.filter(device=self.unmanaged_device)
+        with self.assertNumQueries(3 * 2):
+            deleted = purge_rows(expired, batch_size=2)
+
+        self.assertEqual(deleted, 5)
+        self.assertFalse(expired.exists())
+
+    def test_purge_rows_stops_when_asked(self):
+        expired = DeviceData.objects.filter(device=self.unmanaged_device)
+        deleted = purge_rows(expired, batch_size=2, should_stop=lambda: True)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(expired.count(), 3)
+
+    def test_command_reports_throughput(self):
+        out = StringIO()
+        with patch('django.utils.timezone.now', return_value=NOW):
+            call_command('purge_device_data', '--pause', '0', stdout=out)
+
+        self.assertIn('Deleted 5 readings and 1 logs', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertListEqual(self.kept_days(self.other_device), [1, 5])
+
+    def test_purger_does_not_run_on_stop(self):
+        """
+        Stopping the purge worker does not start a purge pass at shutdown.
+        """
+        purger = RetentionPurger()
+        with patch('device.retention.purge_expired') as purge:
+            purger.stop()
+        purge.assert_not_called()
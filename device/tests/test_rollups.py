@@ -0,0 +1,224 @@
+"""
+Tests for the DeviceData rollups maintained at ingest.
+"""
+
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+
+from ..ingest import write_readings
+from ..models import DeviceData, DeviceDataRollup
+from ..rollups import aggregate_series, pick_resolution
+from ..timeseries import aggregate_buckets
+from .factories import DeviceDataFactory, DeviceFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+Resolution = DeviceDataRollup.Resolution
+
+
+def readings(device, values, step=timedelta(minutes=1), start=START):
+    return [
+        DeviceData(device=device, data=str(value), created_at=start + step * n)
+        for n, value in enumerate(values)
+    ]
+
+
+def rollup_rows(device):
+    return list(
+        DeviceDataRollup.objects.filter(device=device)
+        .order_by('resolution', 'bucket_start')
+        .values_list('resolution', 'bucket_start', 'count', 'sum', 'min', 'max')
+    )
+
+
+class PickResolutionTests(SimpleTestCase):
+    def test_coarsest_dividing_resolution(self):
+        self.assertEqual(pick_resolution(60), Resolution.MINUTE)
+        self.assertEqual(pick_resolution(900), Resolution.MINUTE)
+        self.assertEqual(pick_resolution(7200), Resolution.HOUR)
+        self.assertEqual(pick_resolution(7 * 86400), Resolution.DAY)
+        self.assertIsNone(pick_resolution(30))
+        self.assertIsNone(pick_resolution(90))
+
+
+class RollupMaintenanceTests(TestCase):
+    """Tests for incremental maintenance and rebuilding of rollups."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = DeviceFactory()
+
+    def test_write_updates_every_resolution(self):
+        """
+        Numeric readings are folded into the minute, hour and day buckets.
+        """
+        write_readings(
+            readings(self.device, [1, 5, 'door open'], step=timedelta(seconds=20))
+            + readings(self.device, [-2], start=START + timedelta(hours=1))
+        )
+
+        day = START.replace(hour=0)
+        self.assertListEqual(
+            rollup_rows(self.device),
+            [
+                (60, START, 2, 6.0, 1.0, 5.0),
+                (60, START + timedelta(hours=1), 1, -2.0, -2.0, -2.0),
+                (3600, START, 2, 6.0, 1.0, 5.0),
+                (3600, START + timedelta(hours=1), 1, -2.0, -2.0, -2.0),
+                (86400, day, 3, 4.0, -2.0, 5.0),
+            ],
+        )
+
+    def test_later_writes_merge_into_existing_buckets(self):
+        write_readings(readings(self.device, [3, 4]))
+        write_readings(readings(self.device, [10, -1]))
+
+        minute = DeviceDataRollup.objects.get(
+            device=self.device, resolution=Resolution.MINUTE, bucket_start=START
+        )
+        self.assertEqual(
+            (minute.count, minute.sum, minute.min, minute.max), (2, 13.0, 3.0, 10.0)
+        )
+        day = DeviceDataRollup.objects.get(
+            device=self.device, resolution=Resolution.DAY
+        )
+        self.assertEqual((day.count, day.sum, day.min, day.max), (4, 16.0, -1.0, 10.0))
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        """
+        rebuild_rollups recreates the incremental rollups and picks up
+        readings that bypassed the ingest path.
+        """
+        write_readings(readings(self.device, range(100), step=timedelta(minutes=7)))
+        expected = rollup_rows(self.device)
+
+        DeviceDataRollup.objects.all().delete()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertListEqual(rollup_rows(self.device), expected)
+
+        DeviceDataFactory(device=self.device, data='1000', created_at=START)
+        out = StringIO()
+        call_command('rebuild_rollups', device=[self.device.pk], stdout=out)
+        day = DeviceDataRollup.objects.get(
+            device=self.device, resolution=Resolution.DAY
+        )
+        self.assertEqual(day.max, 1000.0)
+        self.assertIn('Wrote', out.getvalue())
+
+
+class RollupAggregationTests(TestCase):
+    """aggregate_series must agree with aggregating the raw readings."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.device = DeviceFactory()
+        # A reading every 7 minutes over about three days
+        write_readings(
+            readings(
+                cls.device,
+                [(n * 37) % 101 - 50 for n in range(600)],
+                step=timedelta(minutes=7),
+            )
+        )
+
+    def assertSameAsRaw(self, seconds, start=None, end=None):
+        queryset = DeviceData.objects.filter(device=self.device)
+        if start or end:
+            queryset = queryset.filter(created_at__range=(start, end))
+        aggregates = ['count', 'sum', 'min', 'max', 'avg']
+        expected = aggregate_buckets(queryset, seconds, aggregates)
+        actual = aggregate_series(
+            queryset, self.device.pk, seconds, aggregates, start=start, end=end
+        )
+
+        self.assertEqual(len(actual), len(expected))
+        for got, want in zip(actual, expected, strict=True):
+            self.assertEqual(got['start'], want['start'])
+            self.assertEqual(got['count'], want['count'])
+            self.assertEqual(got['min'], want['min'])
+            self.assertEqual(got['max'], want['max'])
+            self.assertAlmostEqual(got['sum'], want['sum'])
+            self.assertAlmostEqual(got['avg'], want['avg'])
+
+    def test_whole_series(self):
+        for seconds in (60, 900, 3600, 6 * 3600, 86400, 30, 90):
+            with self.subTest(seconds=seconds):
+                self.assertSameAsRaw(seconds)
+
+    def test_unaligned_range(self):
+        start = START + timedelta(hours=5, minutes=13, seconds=7)
+        end = START + timedelta(days=2, hours=3, minutes=41)
+        for seconds in (60, 3600, 86400):
+            with self.subTest(seconds=seconds):
+                self.assertSameAsRaw(seconds, start, end)
+
+    def test_range_inside_one_rollup_bucket(self):
+        start = START + timedelta(hours=1, minutes=10)
+        end = START + timedelta(hours=1, minutes=50)
+        self.assertSameAsRaw(3600, start, end)
+
+
+class RollupAggregationAPITests(APITestCase):
+    """Tests for GET /api/devices/{pk}/data/?bucket= served from rollups."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.device = DeviceFactory(owner=cls.user)
+        write_readings(readings(cls.device, range(48), step=timedelta(hours=1)))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+
+    def test_daily_buckets_read_rollups_only(self):
+        """
+        Aligned buckets are answered from the day rollup, not the raw rows.
+        """
+        DeviceData.objects.filter(device=self.device).delete()
+
+        # Permission check, data version, rollups
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                self.url, {'bucket': '1d', 'agg': 'count,min,max'}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(
+            response.data['results'],
+            [
+                {'start': '2025-04-01T00:00:00Z', 'count': 16, 'min': 0, 'max': 15},
+                {'start': '2025-04-02T00:00:00Z', 'count': 24, 'min': 16, 'max': 39},
+                {'start': '2025-04-03T00:00:00Z', 'count': 8, 'min': 40, 'max': 47},
+            ],
+        )
+
+    def test_partial_edges_read_raw_rows(self):
+        """
+        Readings in partial rollup buckets at the range edges come from raw rows.
+        """
+        params = {
+            'bucket': '1d',
+            'agg': 'count,sum',
+            'start': '2025-04-01T20:30:00Z',
+            'end': '2025-04-02T02:00:00Z',
+        }
+        response = self.client.get(self.url, params)
+
+        self.assertListEqual(
+            response.data['results'],
+            [
+                {'start': '2025-04-01T00:00:00Z', 'count': 3, 'sum': 13 + 14 + 15},
+                {'start': '2025-04-02T00:00:00Z', 'count': 3, 'sum': 16 + 17 + 18},
+            ],
+        )
@@ -0,0 +1,172 @@
+"""
+Tests for time-bucket aggregation and downsampling of DeviceData.
+"""
+
+import math
+from datetime import datetime, timedelta
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from account.tests.factories import UserFactory
+
+from ..ingest import write_readings
+from ..models import DeviceData
+from ..ownership import device_access
+from ..timeseries import lttb, parse_aggregates, parse_bucket
+from .factories import DeviceFactory
+
+START = datetime(2025, 4, 1, 8, 0, tzinfo=timezone.get_default_timezone())
+
+
+class ParseTests(SimpleTestCase):
+    """Tests for the query parameter parsers."""
+
+    def test_parse_bucket(self):
+        """
+        Bucket specs are converted to seconds.
+        """
+        self.assertEqual(parse_bucket('30s'), 30)
+        self.assertEqual(parse_bucket('5m'), 300)
+        self.assertEqual(parse_bucket('2h'), 7200)
+        self.assertEqual(parse_bucket('1d'), 86400)
+        for value in ('0m', '5', 'm', '5y', '-1h'):
+            with self.assertRaises(ValueError):
+                parse_bucket(value)
+
+    def test_parse_aggregates(self):
+        """
+        Aggregate specs are split and validated.
+        """
+        self.assertEqual(parse_aggregates('avg, MAX'), ['avg', 'max'])
+        for value in ('', 'median', 'avg,p99'):
+            with self.assertRaises(ValueError):
+                parse_aggregates(value)
+
+
+class LTTBTests(SimpleTestCase):
+    """Tests for the LTTB downsampling algorithm."""
+
+    def test_short_series_is_returned_unchanged(self):
+        points = [(0, 1), (1, 2), (2, 3)]
+        self.assertListEqual(lttb(points, 10), points)
+
+    def test_downsample_keeps_endpoints_and_extremes(self):
+        """
+        The first and last points and the spike of a series are kept.
+        """
+        points = [(x, math.sin(x / 10)) for x in range(1000)]
+        points[500] = (500, 50.0)
+        sampled = lttb(points, 50)
+
+        self.assertEqual(len(sampled), 50)
+        self.assertEqual(sampled[0], points[0])
+        self.assertEqual(sampled[-1], points[-1])
+        self.assertIn(points[500], sampled)
+        self.assertListEqual(sampled, sorted(sampled))
+
+
+class DeviceDataAggregationAPITests(APITestCase):
+    """Tests for GET /api/devices/{pk}/data/?bucket= and ?points=."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.device = DeviceFactory(owner=cls.user)
+        # One reading per minute for an hour with values 0..59, plus noise
+        # that is not a number and must be ignored
+        write_readings(
+            [
+                DeviceData(
+                    device=cls.device,
+                    data=str(n),
+                    created_at=START + timedelta(minutes=n),
+                )
+                for n in range(60)
+            ]
+            + [DeviceData(device=cls.device, data='door open', created_at=START)]
+        )
+
+    def setUp(self):
+        device_access.clear()
+        self.addCleanup(device_access.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('device:device-data', kwargs={'pk': self.device.pk})
+
+    def test_bucket_aggregates(self):
+        """
+        ?bucket=15m returns one row per bucket with the requested aggregates.
+        """
+        response = self.client.get(
+            self.url, {'bucket': '15m', 'agg': 'avg,min,max,count'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['bucket'], 900)
+        rows = response.data['results']
+        self.assertListEqual(
+            [row['start'] for row in rows],
+            [
+                '2025-04-01T08:00:00Z',
+                '2025-04-01T08:15:00Z',
+                '2025-04-01T08:30:00Z',
+                '2025-04-01T08:45:00Z',
+            ],
+        )
+        self.assertListEqual([row['count'] for row in rows], [15, 15, 15, 15])
+        self.assertListEqual([row['min'] for row in rows], [0, 15, 30, 45])
+        self.assertListEqual([row['max'] for row in rows], [14, 29, 44, 59])
+        self.assertAlmostEqual(rows[0]['avg'], 7.0)
+
+    def test_bucket_respects_time_interval(self):
+        """
+        Aggregation only covers the ?start=&end= range.
+        """
+        params = {
+            'bucket': '1h',
+            'agg': 'sum,count',
+            'start': '2025-04-01T08:10:00Z',
+            'end': '2025-04-01T08:19:00Z',
+        }
+        response = self.client.get(self.url, params)
+
+        self.assertListEqual(
+            response.data['results'],
+            [{'start': '2025-04-01T08:00:00Z', 'sum': sum(range(10, 20)), 'count': 10}],
+        )
+
+    def test_bucket_is_a_single_query(self):
+        """
+        Bucketing runs in SQL: one query besides the permission check and the
+        data version read for the ETag.
+        """
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'bucket': '1m'})
+
+    def test_invalid_bucket_or_aggregate(self):
+        for params in ({'bucket': '5x'}, {'bucket': '5m', 'agg': 'median'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_downsample_points(self):
+        """
+        ?points=N returns at most N numeric readings including both ends.
+        """
+        response = self.client.get(self.url, {'points': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(len(results), 10)
+        self.assertEqual(
+            results[0], {'created_at': '2025-04-01T08:00:00Z', 'value': 0.0}
+        )
+        self.assertEqual(results[-1]['value'], 59.0)
+
+    def test_invalid_points(self):
+        for points in ('abc', '2'):
+            response = self.client.get(self.url, {'points': points})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,138 @@
+"""
+Time-bucket aggregation and downsampling of DeviceData.
+"""
+
+import re
+from datetime import UTC, datetime
+
+from django.db.models import Avg, BigIntegerField, Count, F, Func, Max, Min, Sum
+
+BUCKET_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+BUCKET_RE = re.compile(r'^(\d+)([smhdw])$')
+
+AGGREGATES = {
+    'avg': Avg,
+    'min': Min,
+    'max': Max,
+    'sum': Sum,
+    'count': Count,
+}
+
+
+def parse_bucket(value):
+    """Return the width in seconds of a bucket spec such as '30s' or '5m'."""
+    match = BUCKET_RE.match(value.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f'Invalid bucket {value!r}; expected e.g. 30s, 5m, 1h, 1d.')
+    return int(match.group(1)) * BUCKET_UNITS[match.group(2)]
+
+
+def parse_aggregates(value):
+    """Return the list of aggregate names in a spec such as 'avg,max'."""
+    names = [name.strip().lower() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in AGGREGATES]
+    if not names or unknown:
+        raise ValueError(
+            f'Invalid aggregate {", ".join(unknown) or value!r}; '
+            f'choose from {", ".join(AGGREGATES)}.'
+        )
+    return names
+
+
+class TimeBucket(Func):
+    """
+    Start of the epoch-aligned bucket of ``seconds`` width that a datetime
+    expression falls in, as an integer number of seconds since the epoch.
+    """
+
+    output_field = BigIntegerField()
+
+    def __init__(self, expression, seconds, **extra):
+        self.seconds = int(seconds)
+        super().__init__(expression, **extra)
+
+    def _as_sql(self, compiler, connection, epoch_template, integer_type):
+        sql, params = compiler.compile(self.source_expressions[0])
+        epoch = epoch_template % sql
+        bucket = f'FLOOR({epoch} / {self.seconds}) * {self.seconds}'
+        return f'CAST({bucket} AS {integer_type})', params
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return self._as_sql(compiler, connection, 'EXTRACT(EPOCH FROM %s)', 'BIGINT')
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self._as_sql(compiler, connection, 'UNIX_TIMESTAMP(%s)', 'SIGNED')
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Integer division floors the (non-negative) epoch seconds
+        sql, params = compiler.compile(self.source_expressions[0])
+        epoch = f"CAST(strftime('%%s', {sql}) AS INTEGER)"
+        return f'(({epoch} / {self.seconds}) * {self.seconds})', params
+
+
+def numeric_readings(queryset):
+    """Restrict ``queryset`` to readings with a numeric value."""
+    return queryset.filter(value__isnull=False)
+
+
+def aggregate_buckets(queryset, seconds, aggregates):
+    """
+    Group numeric readings of ``queryset`` into ``seconds``-wide buckets and
+    return one dict per non-empty bucket: its start as an aware datetime plus
+    the requested aggregates of the reading values.
+    """
+    rows = (
+        numeric_readings(queryset)
+        .order_by()
+        .annotate(bucket=TimeBucket('created_at', seconds))
+        .values('bucket')
+        .annotate(**{name: AGGREGATES[name](F('value')) for name in aggregates})
+        .order_by('bucket')
+    )
+    return [
+        {
+            'start': datetime.fromtimestamp(row.pop('bucket'), tz=UTC),
+            **row,
+        }
+        for row in rows
+    ]
+
+
+def lttb(points, threshold):
+    """
+    Downsample ``points`` (a list of (x, y, ...) tuples sorted by x) to
+    ``threshold`` points with the Largest-Triangle-Three-Buckets algorithm,
+    which keeps the visual shape of the series.
+    """
+    size = len(points)
+    if threshold >= size or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    # Bucket width for the points between the fixed first and last ones
+    every = (size - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average point of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, size)
+        next_bucket = points[next_start:next_end]
+        avg_x = sum(point[0] for point in next_bucket) / len(next_bucket)
+        avg_y = sum(point[1] for point in next_bucket) / len(next_bucket)
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = points[a][0], points[a][1]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            x, y = points[j][0], points[j][1]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
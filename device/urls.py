@@ -1,15 +1,45 @@
 from django.urls import path
 
 from .views import (
+    DeviceDataBackfillAPIView,
+    DeviceDataBulkCreateAPIView,
     DeviceDataListCreateAPIView,
     DeviceGetUpdateDropAPIView,
+    DeviceHeartbeatAPIView,
+    DeviceLatestDataAPIView,
     DeviceListCreateAPIView,
+    DeviceTokenAPIView,
+    GatewayDataCreateAPIView,
+    LatestDataListAPIView,
 )
 
 app_name = 'device'
 
 urlpatterns = [
     path('', DeviceListCreateAPIView.as_view(), name='device-list'),
+    path('data', GatewayDataCreateAPIView.as_view(), name='gateway-data'),
+    path('latest', LatestDataListAPIView.as_view(), name='latest-data'),
     path('<int:pk>', DeviceGetUpdateDropAPIView.as_view(), name='device-detail'),
+    path(
+        '<int:pk>/heartbeat',
+        DeviceHeartbeatAPIView.as_view(),
+        name='device-heartbeat',
+    ),
+    path('<int:pk>/token', DeviceTokenAPIView.as_view(), name='device-token'),
     path('<int:pk>/data', DeviceDataListCreateAPIView.as_view(), name='device-data'),
+    path(
+        '<int:pk>/data/bulk',
+        DeviceDataBulkCreateAPIView.as_view(),
+        name='device-data-bulk',
+    ),
+    path(
+        '<int:pk>/data/latest',
+        DeviceLatestDataAPIView.as_view(),
+        name='device-data-latest',
+    ),
+    path(
+        '<int:pk>/data/backfill',
+        DeviceDataBackfillAPIView.as_view(),
+        name='device-data-backfill',
+    ),
 ]
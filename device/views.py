@@ -2,14 +2,71 @@
 View functions in device.
 """
 
-from django.shortcuts import get_object_or_404
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from rest_framework import generics, serializers, status
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import (
+    APIException,
+    NotAcceptable,
+    NotFound,
+    UnsupportedMediaType,
+    ValidationError,
+)
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from .models import Device, DeviceData
+from .archive import archived_values, read_archive
+from .authentication import DEVICE_AUTHENTICATION_CLASSES
+from .conditional import ConditionalGetMixin, device_list_validators
+from .export import (
+    ENCODERS,
+    EXPORT_COMPRESSIONS,
+    EXPORT_FORMATS,
+    export_rows,
+    gzip_stream,
+    iterate_async,
+)
+from .heartbeat import heartbeats, revive
+from .ingest import (
+    CSV_MEDIA_TYPES,
+    NDJSON_MEDIA_TYPES,
+    BufferFull,
+    get_write_behind_settings,
+    read_csv,
+    read_ndjson,
+    write_behind,
+    write_readings,
+)
+from .latest import latest_readings
+from .models import Device, DeviceData, DeviceToken
+from .ownership import owned_device_status, owned_device_statuses
+from .pagination import KeysetPagination
 from .permissions import IsDataOwner, IsOwner
+from .renderers import (
+    COLUMNAR_COLUMNS,
+    DEVICE_DATA_COLUMNS,
+    ColumnarBinaryRenderer,
+    ColumnarJSONRenderer,
+    columnar_representation,
+    device_data_representation,
+    dumps,
+    renders_plain_json,
+)
+from .rollups import aggregate_series
+from .timeseries import (
+    lttb,
+    numeric_readings,
+    parse_aggregates,
+    parse_bucket,
+)
 
 
 class DeviceSerializer(serializers.ModelSerializer):
@@ -27,6 +84,13 @@ class DeviceSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'owner']
 
 
+class DeviceTokenSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeviceToken
+        fields = ['key', 'device', 'created']
+        read_only_fields = ['key', 'device', 'created']
+
+
 class DeviceDataSerializer(serializers.ModelSerializer):
     class Meta:
         model = DeviceData
@@ -34,15 +98,111 @@ class DeviceDataSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'device', 'created_at']
 
 
+class GatewayDataSerializer(DeviceDataSerializer):
+    device = serializers.IntegerField(min_value=1)
+
+    class Meta(DeviceDataSerializer.Meta):
+        read_only_fields = ['id', 'created_at']
+
+
+class BackfillDataSerializer(DeviceDataSerializer):
+    class Meta(DeviceDataSerializer.Meta):
+        read_only_fields = ['id', 'device']
+        extra_kwargs = {'created_at': {'required': True}}
+
+
+class LatestReadingSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    device = serializers.IntegerField()
+    data = serializers.CharField()
+    created_at = serializers.DateTimeField()
+    value = serializers.FloatField(allow_null=True)
+
+
 class DeviceStatusConflict(APIException):
     status_code = status.HTTP_409_CONFLICT
-    default_detail = 'Cannot add data: device is offline or in error state.'
-    default_code = 'device_offline_conflict'
+    default_detail = 'Cannot add data: device is in error state.'
+    default_code = 'device_error_conflict'
+
+
+def get_ingest_device_id(request, pk):
+    """
+    Return ``pk`` if the user owns that device and it is not in error state;
+    raise 404 or 409 otherwise. An offline device is brought back online, as
+    its data shows it is alive. Uses the lookup already made by the permission
+    check.
+    """
+    device_status = owned_device_status(request, pk)
+    if device_status is None:
+        raise Http404
+    if device_status == Device.DeviceStatus.ERROR:
+        raise DeviceStatusConflict()
+    if device_status == Device.DeviceStatus.OFFLINE:
+        revive([pk])
+    return pk
+
 
+class IngestBufferFull(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Ingest buffer is full, retry later.'
+    default_code = 'ingest_buffer_full'
+    # Sent back as the Retry-After header
+    wait = 1
 
-class DeviceListCreateAPIView(generics.ListCreateAPIView):
+
+class BulkIngestMixin:
+    """
+    Shared helpers for endpoints that accept an array of readings.
+    """
+
+    def get_max_batch_size(self):
+        return getattr(settings, 'DEVICE_DATA_BULK_MAX_ITEMS', 1000)
+
+    def get_items(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError('Expected a non-empty list of readings.')
+        max_items = self.get_max_batch_size()
+        if len(items) > max_items:
+            raise ValidationError(f'Too many readings in one batch (max {max_items}).')
+        return items
+
+    def validate_item(self, serializer, item):
+        """Return (validated_data, None) or (None, errors) for one reading."""
+        if not isinstance(item, dict):
+            return None, {'non_field_errors': ['Expected an object.']}
+        try:
+            return serializer.run_validation(item), None
+        except ValidationError as exc:
+            return None, exc.detail
+
+    def perform_bulk_create(self, readings, results):
+        """Store the accepted readings and attach their ids to the results."""
+        created = iter(write_readings(readings))
+        for result in results:
+            if result['status'] == 201:
+                result['id'] = next(created).pk
+
+    def build_response(self, results):
+        created = sum(1 for result in results if result['status'] == 201)
+        if created == len(results):
+            status_code = status.HTTP_201_CREATED
+        elif created:
+            status_code = status.HTTP_207_MULTI_STATUS
+        else:
+            status_code = status.HTTP_400_BAD_REQUEST
+        payload = {
+            'created': created,
+            'rejected': len(results) - created,
+            'results': results,
+        }
+        return Response(payload, status=status_code)
+
+
+class DeviceListCreateAPIView(ConditionalGetMixin, generics.ListCreateAPIView):
     """
     GET /api/devices/  return 200 + all-devices owned by user if auth; 401 otherwise.
+        Sends an ETag; return 304 if If-None-Match holds it and no device changed.
     POST /api/devices/ return 201 if auth and created; 401 otherwise.
     """
 
@@ -54,14 +214,20 @@ class DeviceListCreateAPIView(generics.ListCreateAPIView):
         # Only return devices owned by the authenticated user
         return Device.objects.filter(owner=self.request.user)
 
+    def get_validators(self, request):
+        return device_list_validators(request.user)
+
     def perform_create(self, serializer):
         # Ensure that new devices are created with the current user as owner
         serializer.save(owner=self.request.user)
 
 
-class DeviceGetUpdateDropAPIView(generics.RetrieveUpdateDestroyAPIView):
+class DeviceGetUpdateDropAPIView(
+    ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView
+):
     """
     GET /api/devices/{pk}/    return 200 + device if owned by user; 404 if not owned; 401 if anon.
+        Sends an ETag; return 304 if If-None-Match holds it and the device is unchanged.
     PUT /api/devices/{pk}/    return 200 if owned and updated; 404 if not owned; 401 if anon.
     DELETE /api/devices/{pk}/ return 204 if owned and deleted; 404 if not owned; 401 if anon.
     """
@@ -73,19 +239,66 @@ class DeviceGetUpdateDropAPIView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return super().get_queryset().filter(owner=self.request.user)
 
+    def get_validators(self, request):
+        # The serialized fields themselves, read from the one row
+        return tuple(
+            self.get_queryset()
+            .filter(pk=self.kwargs['pk'])
+            .values_list(*self.get_serializer_class().Meta.fields)
+        )
+
     def perform_update(self, serializer):
         serializer.save(owner=self.request.user)
 
 
-class DeviceDataListCreateAPIView(generics.ListCreateAPIView):
+class DeviceDataListCreateAPIView(ConditionalGetMixin, generics.ListCreateAPIView):
     """
     GET /api/devices/{pk}/data/?start=<ISO>&end=<ISO> return 200 + device-data if valid; 404 if not owned; 401 if anon.
+        Results are paginated by (created_at, id): follow the next/previous
+        links, and use ?page_size= to change the page size (max 1000).
+        Readings moved to the cold-tier archive are included transparently.
+    GET /api/devices/{pk}/data/?bucket=5m&agg=avg,min,max,count return 200 + one
+        row per time bucket with the aggregates of the numeric readings,
+        read from the 1m/1h/1d rollups whenever the bucket is a multiple of one.
+    GET /api/devices/{pk}/data/?points=<N> return 200 + at most N numeric
+        readings chosen by LTTB downsampling, for chart rendering.
+    GET /api/devices/{pk}/data/?export=csv|ndjson[&compress=gzip] return 200 +
+        every reading in the range, archived ones included, streamed as a
+        file download while it is read.
+    GET with Accept: application/vnd.iot.columns+json or ?format=columns (JSON),
+        or application/vnd.iot.columns or ?format=columns-bin (binary), return
+        a page of readings as parallel arrays; ?delta=1 delta-encodes the
+        timestamps. See device/renderers.py for both layouts.
+    Every GET sends an ETag of the device's data version; return 304 if
+        If-None-Match holds it and no reading was written or deleted since.
     POST /api/devices/{pk}/data/ return 201 if valid; 404 if not owned; 401 if anon.
+        With DEVICE_DATA_WRITE_BEHIND enabled return 202 once the reading is
+        queued; 503 if the write-behind buffer is full.
     """
 
     queryset = DeviceData.objects.all()
     serializer_class = DeviceDataSerializer
+    authentication_classes = DEVICE_AUTHENTICATION_CLASSES
     permission_classes = [IsAuthenticated, IsDataOwner]
+    pagination_class = KeysetPagination
+    renderer_classes = [
+        *api_settings.DEFAULT_RENDERER_CLASSES,
+        ColumnarJSONRenderer,
+        ColumnarBinaryRenderer,
+    ]
+
+    def get_time_range(self):
+        """Return the (start, end) datetimes of ?start=&end=, or (None, None)."""
+        start_iso = self.request.GET.get('start', None)
+        end_iso = self.request.GET.get('end', None)
+
+        if not (start_iso or end_iso):
+            return None, None
+        if not start_iso:
+            start_iso = '1980-01-01T00:00:00Z'
+        if not end_iso:
+            end_iso = '2050-12-31T00:00:00Z'
+        return parse_datetime(start_iso), parse_datetime(end_iso)
 
     def get_queryset(self):
         # if there is no start_iso and end_iso
@@ -94,25 +307,443 @@ class DeviceDataListCreateAPIView(generics.ListCreateAPIView):
         )
 
         # time-interval filter
-        start_iso = self.request.GET.get('start', None)
-        end_iso = self.request.GET.get('end', None)
+        start_dt, end_dt = self.get_time_range()
+        if start_dt or end_dt:
+            qs = qs.filter(created_at__range=(start_dt, end_dt))
+        # Served in order by the (device, created_at) index, without a sort
+        return qs.order_by('created_at', 'id')
 
-        if start_iso or end_iso:
-            if not start_iso:
-                start_iso = '1980-01-01T00:00:00Z'
-            if not end_iso:
-                end_iso = '2050-12-31T00:00:00Z'
-            start_dt = parse_datetime(start_iso)
-            end_dt = parse_datetime(end_iso)
+    def get_validators(self, request):
+        return tuple(
+            Device.objects.filter(pk=self.kwargs['pk']).values_list(
+                'data_version', flat=True
+            )
+        )
 
-            qs = qs.filter(created_at__range=(start_dt, end_dt))
-        return qs
+    def list(self, request, *args, **kwargs):
+        if 'export' in request.query_params:
+            return self.export(request)
+        columnar = isinstance(
+            request.accepted_renderer, (ColumnarJSONRenderer, ColumnarBinaryRenderer)
+        )
+        if columnar and request.query_params.keys() & {'bucket', 'points'}:
+            raise NotAcceptable('Columnar layouts are only available for readings.')
+        if columnar:
+            return self.list_columns(request)
+        if 'bucket' in request.query_params:
+            return self.list_buckets(request)
+        if 'points' in request.query_params:
+            return self.list_downsampled(request)
+        if settings.DEVICE_DATA_FAST_JSON and renders_plain_json(request):
+            return self.list_plain_json(request)
+        return super().list(request, *args, **kwargs)
+
+    def list_plain_json(self, request):
+        """
+        Same response as list(), built from tuples and encoded straight to
+        JSON bytes instead of through DeviceDataSerializer and JSONRenderer.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).values_list(
+            *DEVICE_DATA_COLUMNS, named=True
+        )
+        page = self.paginate_queryset(queryset)
+        response = self.get_paginated_response(device_data_representation(page))
+        # Setting the content marks the response as rendered
+        response.content = dumps(response.data)
+        response['Content-Type'] = request.accepted_renderer.media_type
+        return response
+
+    def list_columns(self, request):
+        """The page of readings as parallel arrays, see device/renderers.py."""
+        queryset = self.filter_queryset(self.get_queryset()).values_list(
+            *COLUMNAR_COLUMNS, named=True
+        )
+        page = self.paginate_queryset(queryset)
+        delta = request.query_params.get('delta', '').lower() in ('1', 'true')
+        links = {
+            'next': self.paginator.get_next_link(),
+            'previous': self.paginator.get_previous_link(),
+        }
+        response = Response({**links, **columnar_representation(page, delta)})
+        link_header = ', '.join(
+            f'<{url}>; rel="{rel}"' for rel, url in links.items() if url
+        )
+        if link_header:
+            response['Link'] = link_header
+        return response
+
+    def export(self, request):
+        export_format = request.query_params['export']
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError(f'export must be one of {", ".join(EXPORT_FORMATS)}.')
+        compress = request.query_params.get('compress')
+        if compress is not None and compress not in EXPORT_COMPRESSIONS:
+            raise ValidationError(
+                f'compress must be one of {", ".join(EXPORT_COMPRESSIONS)}.'
+            )
+
+        start_dt, end_dt = self.get_time_range()
+        rows = export_rows(
+            self.get_queryset(),
+            self.kwargs['pk'],
+            start_dt,
+            end_dt and end_dt + timedelta(microseconds=1),
+            chunk_size=settings.DEVICE_DATA_EXPORT_CHUNK_SIZE,
+        )
+        content_type, extension = EXPORT_FORMATS[export_format]
+        body = ENCODERS[export_format](rows)
+        filename = f'device-{self.kwargs["pk"]}-data.{extension}'
+        if compress == 'gzip':
+            body = gzip_stream(body)
+            content_type, filename = 'application/gzip', f'{filename}.gz'
+        if isinstance(request._request, ASGIRequest):
+            body = iterate_async(body)
+        response = StreamingHttpResponse(body, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def list_buckets(self, request):
+        try:
+            seconds = parse_bucket(request.query_params['bucket'])
+            aggregates = parse_aggregates(
+                request.query_params.get('agg', 'avg,min,max,count')
+            )
+        except ValueError as exc:
+            raise ValidationError(str(exc))
+
+        start_dt, end_dt = self.get_time_range()
+        device_id = self.kwargs['pk']
+        # Served from the coarsest rollup that fits the bucket
+        rows = aggregate_series(
+            self.get_queryset(),
+            device_id,
+            seconds,
+            aggregates,
+            start=start_dt,
+            end=end_dt,
+            archived=lambda start, end: archived_values(device_id, start, end),
+        )
+        timestamp = serializers.DateTimeField()
+        for row in rows:
+            row['start'] = timestamp.to_representation(row['start'])
+        return Response({'bucket': seconds, 'results': rows})
+
+    def list_downsampled(self, request):
+        try:
+            points = int(request.query_params['points'])
+        except ValueError:
+            points = 0
+        if points < 3:
+            raise ValidationError('points must be an integer of at least 3.')
+
+        start_dt, end_dt = self.get_time_range()
+        readings = numeric_readings(self.get_queryset()).values_list(
+            'created_at', 'value'
+        )
+        archived = archived_values(
+            self.kwargs['pk'], start_dt, end_dt and end_dt + timedelta(microseconds=1)
+        )
+        series = [
+            (created_at.timestamp(), value, created_at)
+            for created_at, value in heapq.merge(archived, readings)
+        ]
+        timestamp = serializers.DateTimeField()
+        results = [
+            {'created_at': timestamp.to_representation(created_at), 'value': value}
+            for _, value, created_at in lttb(series, points)
+        ]
+        return Response({'points': points, 'results': results})
+
+    def read_archive(self, after=None, reverse=False, limit=None):
+        """Archived readings in the requested range, merged in by the paginator."""
+        start_dt, end_dt = self.get_time_range()
+        return read_archive(
+            self.kwargs['pk'],
+            start_dt,
+            end_dt and end_dt + timedelta(microseconds=1),
+            after=after,
+            reverse=reverse,
+            limit=limit,
+        )
+
+    def create(self, request, *args, **kwargs):
+        if not get_write_behind_settings()['ENABLED']:
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        reading = DeviceData(
+            device_id=get_ingest_device_id(request, self.kwargs['pk']),
+            **serializer.validated_data,
+        )
+        try:
+            write_behind.submit([reading])
+        except BufferFull:
+            raise IngestBufferFull()
+        return Response(
+            self.get_serializer(reading).data, status=status.HTTP_202_ACCEPTED
+        )
 
     def perform_create(self, serializer):
-        device = get_object_or_404(
-            Device, pk=self.kwargs['pk'], owner=self.request.user
+        # Stored through the ingest path so the rollups stay up to date
+        reading = DeviceData(
+            device_id=get_ingest_device_id(self.request, self.kwargs['pk']),
+            **serializer.validated_data,
+        )
+        serializer.instance = write_readings([reading])[0]
+
+
+class DeviceLatestDataAPIView(generics.GenericAPIView):
+    """
+    GET /api/devices/{pk}/data/latest/ return 200 + the latest reading of the
+        device; 404 if it has no readings yet; 403 if not owned; 401 if anon.
+        Served from the latest-value store, not from DeviceData.
+    """
+
+    serializer_class = LatestReadingSerializer
+    permission_classes = [IsAuthenticated, IsDataOwner]
+
+    def get(self, request, *args, **kwargs):
+        entry = latest_readings.get(self.kwargs['pk'])
+        if entry is None:
+            raise NotFound('Device has no readings yet.')
+        return Response(self.get_serializer(entry).data)
+
+
+class LatestDataListAPIView(generics.GenericAPIView):
+    """
+    GET /api/devices/latest/ return 200 + the latest reading of every device
+        owned by user, null for devices without readings; 401 if anon.
+    """
+
+    serializer_class = LatestReadingSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        device_ids = list(
+            Device.objects.filter(owner=request.user)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        latest = latest_readings.get_many(device_ids)
+        results = [
+            {
+                'device': device_id,
+                'reading': (
+                    None
+                    if latest[device_id] is None
+                    else self.get_serializer(latest[device_id]).data
+                ),
+            }
+            for device_id in device_ids
+        ]
+        return Response({'results': results})
+
+
+class DeviceHeartbeatAPIView(generics.GenericAPIView):
+    """
+    POST /api/devices/{pk}/heartbeat/ return 202 once the heartbeat is
+        recorded; 403 if not owned; 401 if anon. last_seen is written in
+        coalesced batches, so it may lag by up to DEVICE_HEARTBEAT['FLUSH_INTERVAL'].
+    """
+
+    authentication_classes = DEVICE_AUTHENTICATION_CLASSES
+    permission_classes = [IsAuthenticated, IsDataOwner]
+
+    def post(self, request, *args, **kwargs):
+        seen_at = timezone.now()
+        heartbeats.record(self.kwargs['pk'], seen_at)
+        return Response(
+            {
+                'device': self.kwargs['pk'],
+                'last_seen': serializers.DateTimeField().to_representation(seen_at),
+            },
+            status=status.HTTP_202_ACCEPTED,
         )
-        if device.status != Device.DeviceStatus.ONLINE:
-            # Raise a 409 Conflict if the device is not online
-            raise DeviceStatusConflict()
-        serializer.save(device=device)
+
+
+class DeviceTokenAPIView(generics.GenericAPIView):
+    """
+    POST /api/devices/{pk}/token/   return 201 + a new token for the device,
+        revoking the one it had; 403 if not owned; 401 if anon.
+    DELETE /api/devices/{pk}/token/ return 204 once the token of the device is
+        revoked; 404 if it has none; 403 if not owned; 401 if anon.
+    """
+
+    serializer_class = DeviceTokenSerializer
+    permission_classes = [IsAuthenticated, IsOwner]
+
+    def post(self, request, *args, **kwargs):
+        with transaction.atomic():
+            # Deleting drops the old key from the token cache at once
+            DeviceToken.objects.filter(device_id=self.kwargs['pk']).delete()
+            token = DeviceToken.objects.create(device_id=self.kwargs['pk'])
+        return Response(self.get_serializer(token).data, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, *args, **kwargs):
+        deleted, _ = DeviceToken.objects.filter(device_id=self.kwargs['pk']).delete()
+        if not deleted:
+            raise NotFound('Device has no token.')
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DeviceDataBulkCreateAPIView(BulkIngestMixin, generics.GenericAPIView):
+    """
+    POST /api/devices/{pk}/data/bulk/ return 201 if all readings are stored;
+        207 if only some are; 400 if none are; 409 if the device is in error state;
+        404 if not owned; 401 if anon.
+    """
+
+    serializer_class = DeviceDataSerializer
+    authentication_classes = DEVICE_AUTHENTICATION_CLASSES
+    permission_classes = [IsAuthenticated, IsDataOwner]
+
+    def post(self, request, *args, **kwargs):
+        items = self.get_items(request)
+        device_id = get_ingest_device_id(request, self.kwargs['pk'])
+
+        serializer = self.get_serializer()
+        results = []
+        readings = []
+        for index, item in enumerate(items):
+            validated, errors = self.validate_item(serializer, item)
+            if errors is not None:
+                results.append({'index': index, 'status': 400, 'errors': errors})
+                continue
+            results.append({'index': index, 'status': 201})
+            readings.append(DeviceData(device_id=device_id, **validated))
+
+        self.perform_bulk_create(readings, results)
+        return self.build_response(results)
+
+
+class GatewayDataCreateAPIView(BulkIngestMixin, generics.GenericAPIView):
+    """
+    POST /api/devices/data/ return 201 if all readings are stored; 207 if only
+        some are; 400 if none are; 401 if anon. Items for devices that are not
+        owned are rejected with 403, items for devices in error state with 409.
+        Offline devices are brought back online.
+    """
+
+    serializer_class = GatewayDataSerializer
+    authentication_classes = DEVICE_AUTHENTICATION_CLASSES
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        items = self.get_items(request)
+
+        serializer = self.get_serializer()
+        validated = []
+        for item in items:
+            validated.append(self.validate_item(serializer, item))
+
+        # Resolve ownership and status of every referenced device at once
+        device_ids = {data['device'] for data, errors in validated if errors is None}
+        statuses = owned_device_statuses(request, list(device_ids))
+
+        results = []
+        readings = []
+        for index, (data, errors) in enumerate(validated):
+            if errors is not None:
+                results.append({'index': index, 'status': 400, 'errors': errors})
+                continue
+            device_id = data.pop('device')
+            device_status = statuses.get(device_id)
+            if device_status is None:
+                results.append(
+                    {
+                        'index': index,
+                        'status': 403,
+                        'errors': {'device': ['Device not found or not owned.']},
+                    }
+                )
+            elif device_status == Device.DeviceStatus.ERROR:
+                results.append(
+                    {
+                        'index': index,
+                        'status': 409,
+                        'errors': {'device': [DeviceStatusConflict.default_detail]},
+                    }
+                )
+            else:
+                results.append({'index': index, 'status': 201})
+                readings.append(DeviceData(device_id=device_id, **data))
+
+        offline = {
+            reading.device_id
+            for reading in readings
+            if statuses[reading.device_id] == Device.DeviceStatus.OFFLINE
+        }
+        if offline:
+            revive(list(offline))
+        self.perform_bulk_create(readings, results)
+        return self.build_response(results)
+
+
+class DeviceDataBackfillAPIView(generics.GenericAPIView):
+    """
+    POST /api/devices/{pk}/data/backfill/ stream NDJSON or CSV readings that
+        carry their own created_at; return 201 if all are stored; 207 if only
+        some are; 400 if none are or the body holds none; 409 if the device is in error state; 415 for
+        other content types; 404 if not owned; 401 if anon.
+    """
+
+    serializer_class = BackfillDataSerializer
+    authentication_classes = DEVICE_AUTHENTICATION_CLASSES
+    permission_classes = [IsAuthenticated, IsDataOwner]
+    # Number of rejected lines reported back in detail
+    max_reported_errors = 100
+
+    def get_chunk_size(self):
+        return getattr(settings, 'DEVICE_DATA_BACKFILL_CHUNK_SIZE', 1000)
+
+    def get_records(self, request):
+        media_type = request.content_type.split(';')[0].strip().lower()
+        if media_type in NDJSON_MEDIA_TYPES:
+            reader = read_ndjson
+        elif media_type in CSV_MEDIA_TYPES:
+            reader = read_csv
+        else:
+            raise UnsupportedMediaType(media_type)
+        if request.stream is None:
+            raise ValidationError('Request body is empty.')
+        return reader(request.stream)
+
+    def post(self, request, *args, **kwargs):
+        records = self.get_records(request)
+        device_id = get_ingest_device_id(request, self.kwargs['pk'])
+
+        serializer = self.get_serializer()
+        chunk_size = self.get_chunk_size()
+        created = 0
+        rejected = 0
+        errors = []
+        chunk = []
+        # Only one chunk of readings is held in memory at any time
+        for line_no, record, record_errors in records:
+            if record_errors is None:
+                try:
+                    validated = serializer.run_validation(record)
+                except ValidationError as exc:
+                    record_errors = exc.detail
+            if record_errors is not None:
+                rejected += 1
+                if len(errors) < self.max_reported_errors:
+                    errors.append({'line': line_no, 'errors': record_errors})
+                continue
+            chunk.append(DeviceData(device_id=device_id, **validated))
+            if len(chunk) >= chunk_size:
+                created += len(write_readings(chunk))
+                chunk = []
+        created += len(write_readings(chunk))
+        if not (created or rejected):
+            raise ValidationError('Expected at least one reading.')
+
+        if not rejected:
+            status_code = status.HTTP_201_CREATED
+        elif created:
+            status_code = status.HTTP_207_MULTI_STATUS
+        else:
+            status_code = status.HTTP_400_BAD_REQUEST
+        payload = {'created': created, 'rejected': rejected, 'errors': errors}
+        return Response(payload, status=status_code)
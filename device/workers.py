@@ -0,0 +1,114 @@
+"""
+Background threads that periodically flush in-process buffers or run
+maintenance jobs.
+"""
+
+import atexit
+import logging
+import threading
+
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+_registry = []
+_atexit_registered = False
+
+
+class BackgroundWorker:
+    """
+    Call ``run_once()`` on a daemon thread every ``interval`` seconds.
+
+    Workers are idle until ``start()`` is called by the server entry points
+    (see app/wsgi.py and app/asgi.py). While idle, owners of a worker are
+    expected to do the work inline, which keeps management commands and
+    tests synchronous.
+    """
+
+    name = 'background-worker'
+    interval = 1.0
+    # Whether stop() runs a final pass, for workers that hold buffered work
+    drain_on_stop = True
+
+    def __init__(self):
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    @property
+    def enabled(self):
+        return True
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        """Run the next pass now instead of waiting for the interval."""
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        """Stop the thread, then run a final pass so buffered work is not lost."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join(timeout)
+            self._thread = None
+        if self.drain_on_stop:
+            self.run_once()
+
+    @property
+    def stopping(self):
+        """True once stop() was called; long passes should check it and return."""
+        return self._stopping.is_set()
+
+    def run_once(self):
+        raise NotImplementedError
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+                if self._stopping.is_set():
+                    break
+                try:
+                    self.run_once()
+                except Exception:
+                    logger.exception('%s pass failed', self.name)
+                finally:
+                    close_old_connections()
+        finally:
+            connection.close()
+
+
+def register(worker):
+    """Add ``worker`` to the set started by ``start_workers()``."""
+    _registry.append(worker)
+    return worker
+
+
+def start_workers():
+    """Start every enabled worker and drain them all at interpreter exit."""
+    global _atexit_registered
+    for worker in _registry:
+        if worker.enabled:
+            worker.start()
+    if not _atexit_registered:
+        atexit.register(stop_workers)
+        _atexit_registered = True
+
+
+def stop_workers(timeout=None):
+    for worker in reversed(_registry):
+        try:
+            worker.stop(timeout)
+        except Exception:
+            logger.exception('Failed to stop %s', worker.name)